@@ -0,0 +1,92 @@
+"""
+计数校正基准
+生成 讨论数 × 每个讨论的回复数 的回复表，随机打乱 1% 讨论的回复计数，
+测量 services.reconcile 全量检查并校正讨论回复数的耗时，以及无偏差时再次检查的耗时
+
+运行: cd backend && python -m benchmarks.bench_reconcile [讨论数] [每个讨论的回复数]
+使用临时数据库文件，不影响 app.db
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+from datetime import datetime  # noqa: E402
+
+from sqlalchemy import insert, update  # noqa: E402
+
+from database import SessionLocal, engine, init_db  # noqa: E402
+from models import Discussion, Reply, generate_uuid  # noqa: E402
+from services.reconcile import TARGETS, reconcile_target  # noqa: E402
+
+BATCH_SIZE = 10_000
+DRIFT_RATIO = 0.01
+
+
+def _populate(discussions: int, replies_per: int) -> list[int]:
+    now = datetime.utcnow()
+    # 空库，主键直接按顺序指定
+    pks = list(range(1, discussions + 1))
+    with engine.begin() as conn:
+        for start in range(0, discussions, BATCH_SIZE):
+            conn.execute(insert(Discussion), [
+                {"pk": pk, "id": generate_uuid(), "title": "bench", "content": "bench", "author_name": "bench",
+                 "replies_count": replies_per, "created_at": now, "updated_at": now}
+                for pk in pks[start:start + BATCH_SIZE]
+            ])
+    rows = ({"id": generate_uuid(), "discussion_pk": pk, "content": "r", "author_name": "bench", "created_at": now}
+            for pk in pks for _ in range(replies_per))
+    batch = []
+    with engine.begin() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                conn.execute(insert(Reply), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Reply), batch)
+    return pks
+
+
+def _run(label: str, target):
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        report = reconcile_target(db, target)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:6} | {elapsed:6.2f}s | 检查 {report.checked} 行，不一致 {report.drifted}，"
+        f"校正 {report.fixed}，偏差 {report.drift}"
+    )
+
+
+def main():
+    discussions = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    replies_per = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    init_db()
+
+    start = time.perf_counter()
+    pks = _populate(discussions, replies_per)
+    print(f"生成 {discussions} 个讨论、{discussions * replies_per} 条回复 ({time.perf_counter() - start:.1f}s)")
+
+    with engine.begin() as conn:
+        for pk in random.sample(pks, int(discussions * DRIFT_RATIO)):
+            conn.execute(
+                update(Discussion).where(Discussion.pk == pk)
+                .values(replies_count=replies_per + random.choice((-3, -1, 1, 2)))
+            )
+
+    target = next(t for t in TARGETS if t.name == "discussion_replies")
+    _run("drift", target)
+    _run("clean", target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+SSE 空闲订阅者容量基准
+估算单个 worker 能承载多少空闲订阅连接：每个订阅者的内存开销与一次事件扇出的耗时
+统计的是广播器、队列与流式协程本身的开销，不含 socket 与 uvicorn 的连接缓冲
+
+运行: cd backend && python -m benchmarks.bench_sse_subscribers [订阅者数量 ...]
+"""
+
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+from routers.events import _event_stream
+from services.event_broker import EventBroker
+import routers.events
+
+
+class _IdleRequest:
+    """模拟一个从不断开的客户端"""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+async def _consume(stream, received: list):
+    async for frame in stream:
+        if frame.startswith("event:"):
+            received.append(frame)
+
+
+async def run(count: int):
+    broker = EventBroker(max_queue=100)
+    routers.events.broker = broker  # 让 _event_stream 退订时操作同一个广播器
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    received: list = []
+    tasks = []
+    for i in range(count):
+        subscriber = broker.subscribe(["discussions", f"discussion:{i % 100}"])
+        tasks.append(asyncio.create_task(_consume(_event_stream(_IdleRequest(), subscriber), received)))
+    await asyncio.sleep(0)  # 让所有连接进入空闲等待
+
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_subscriber = (after - before) / count
+
+    start = time.perf_counter()
+    broker.publish(["discussions"], "discussion.updated", {"id": "x", "likesCount": 1})
+    publish_ms = (time.perf_counter() - start) * 1000
+    while len(received) < count:
+        await asyncio.sleep(0)
+    deliver_ms = (time.perf_counter() - start) * 1000
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    budget = 512 * 1024 * 1024
+    print(
+        f"{count:>8} 订阅者 | 每订阅者 {per_subscriber / 1024:6.2f} KiB"
+        f" | 扇出入队 {publish_ms:8.2f} ms | 全部送达 {deliver_ms:8.2f} ms"
+        f" | 512 MiB 可承载约 {budget // max(per_subscriber, 1):,.0f} 个"
+    )
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    for count in counts:
+        asyncio.run(run(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+启动耗时基准
+每轮启动一个全新的 Python 进程，分别统计：
+- import:   导入 main 模块（含 FastAPI、SQLAlchemy 等依赖）的耗时，及耗时最多的顶层模块
+- lifespan: 应用生命周期启动阶段的逐项耗时 (app.state.startup_timings)
+首轮为空数据库（冷启动），其后各轮复用同一数据库（热启动）
+
+运行: cd backend && python -m benchmarks.bench_startup [热启动轮数]
+使用临时数据库文件，不影响 app.db
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+
+async def run():
+    start = time.perf_counter()
+    async with main.lifespan(main.app):
+        lifespan_ms = (time.perf_counter() - start) * 1000
+    return lifespan_ms
+
+lifespan_ms = asyncio.run(run())
+openai_loaded = "openai" in sys.modules
+start = time.perf_counter()
+import openai
+openai_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    "import": import_ms,
+    "lifespan": lifespan_ms,
+    "phases": main.app.state.startup_timings,
+    "openai_loaded": openai_loaded,
+    "openai_deferred": openai_ms,
+}))
+"""
+
+
+def _top_imports(stderr: str, limit: int = 6) -> list[tuple[str, float]]:
+    """解析 -X importtime 输出，返回 main 直接导入的模块中累计耗时最多的几个 (模块名, 毫秒)"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # 缩进表示导入层级：" main" 为顶层，"   fastapi" 为 main 的直接依赖；子模块先于父模块输出
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 0:
+            if name.strip() == "main":
+                break
+            modules.clear()
+        elif depth == 1:
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda m: m[1], reverse=True)[:limit]
+
+
+def _run(env: dict) -> tuple[dict, list[tuple[str, float]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        env=env, capture_output=True, text=True, check=True
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report, _top_imports(result.stderr)
+
+
+def _print(label: str, report: dict):
+    phases = "，".join(f"{name} {ms:.1f}" for name, ms in report["phases"].items())
+    print(
+        f"{label:5} | import {report['import']:7.1f}ms | lifespan {report['lifespan']:7.1f}ms ({phases})"
+    )
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tmpdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+        "ARCHIVE_DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'archive.db')}",
+    }
+
+    cold, top = _run(env)
+    _print("cold", cold)
+    warm = [_run(env)[0] for _ in range(rounds)]
+    for report in warm:
+        _print("warm", report)
+
+    print(
+        f"\n热启动中位数 ({rounds} 轮): import {statistics.median(r['import'] for r in warm):.1f}ms，"
+        f"lifespan {statistics.median(r['lifespan'] for r in warm):.1f}ms"
+    )
+    print(
+        f"启动时是否已加载 openai: {'是' if cold['openai_loaded'] else '否'}"
+        f"（首次 AI 请求时再导入，约 {statistics.median(r['openai_deferred'] for r in warm):.1f}ms）"
+    )
+    print("main 直接导入的模块中耗时最多的:")
+    for name, ms in top:
+        print(f"  {name:30} {ms:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+流式列表响应基准
+生成指定数量的项目，分别以默认模式与 stream=true 请求 GET /api/projects，
+测量首字节时间 (TTFB)、总耗时与服务进程 RSS 峰值相对空闲时的增长。
+每种情况启动一个全新的 uvicorn 进程，RSS 峰值互不影响；客户端逐块读取并丢弃响应体。
+
+运行: cd backend && python -m benchmarks.bench_streaming [项目数 ...]
+使用临时数据库文件，不影响 app.db；RSS 读取 /proc/<pid>/status，仅支持 Linux
+"""
+
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BATCH_SIZE = 5_000
+READ_SIZE = 64 * 1024
+
+
+def _populate(count: int):
+    from sqlalchemy import insert
+    from database import engine, init_db
+    from models import Project, generate_uuid
+
+    init_db()
+    now = datetime.utcnow()
+    text = "基准测试项目描述，" * 20
+    with engine.begin() as conn:
+        for start in range(0, count, BATCH_SIZE):
+            conn.execute(insert(Project), [
+                {"id": generate_uuid(), "title": f"bench {i}", "category": "Web App",
+                 "short_description": text, "full_description": text * 5, "background_story": text,
+                 "usage_instructions": text, "thumbnail_url": "https://example.com/t.png",
+                 "banner_url": "https://example.com/b.png", "external_link": "https://example.com",
+                 "tags": ["bench", "python"], "created_at": now, "updated_at": now}
+                for i in range(start, min(start + BATCH_SIZE, count))
+            ])
+
+
+def _rss_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("服务未能启动")
+
+
+def _measure(env: dict, path: str) -> dict:
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--lifespan", "off", "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_ready(port)
+        baseline = _rss_kb(server.pid, "VmRSS")
+
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        start = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        size = len(response.read1(READ_SIZE))
+        ttfb = time.perf_counter() - start
+        while chunk := response.read1(READ_SIZE):
+            size += len(chunk)
+        total = time.perf_counter() - start
+        conn.close()
+        return {
+            "ttfb_ms": ttfb * 1000, "total_ms": total * 1000, "bytes": size,
+            "rss_growth_mb": (_rss_kb(server.pid, "VmHWM") - baseline) / 1024
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    print(f"{'项目数':>8} | {'模式':6} | {'TTFB':>9} | {'总耗时':>9} | {'响应大小':>9} | {'RSS 增长':>9}")
+    for count in counts:
+        tmpdir = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+            ARCHIVE_DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'archive.db')}",
+            RATE_LIMIT_ENABLED="false"
+        )
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_streaming", "--populate", str(count)], env=env, check=True)
+        for mode, path in (("list", "/api/projects"), ("stream", "/api/projects?stream=true")):
+            result = _measure(env, path)
+            print(
+                f"{count:>8} | {mode:6} | {result['ttfb_ms']:7.1f}ms | {result['total_ms']:7.1f}ms | "
+                f"{result['bytes'] / 1024 / 1024:7.1f}MB | {result['rss_growth_mb']:7.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--populate":
+        _populate(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,124 @@
+"""
+整数代理主键基准
+对比回复表两种布局的插入吞吐与表/索引体积：
+- uuid:      旧布局，String(36) 随机 UUID 主键，外键与点赞表主键同样是 UUID 字符串
+- surrogate: 当前模型，整数主键 (rowid) + 按时间有序的字符串 id 唯一索引，外键列指向整数主键，点赞表只有整数主键
+外键索引（回复按讨论、点赞按回复）在当前模型中只保存整数，体积差异主要来自这里
+
+运行: cd backend && python -m benchmarks.bench_surrogate_keys [回复数]
+使用临时数据库文件，不影响 app.db；体积统计依赖 SQLite 的 dbstat 虚拟表
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+    create_engine, text
+)
+
+from models import Base, generate_uuid
+
+BATCH_SIZE = 1000
+
+# 旧布局：与改造前的模型一致
+legacy = MetaData()
+Table(
+    "discussions", legacy,
+    Column("id", String(36), primary_key=True),
+)
+Table(
+    "replies", legacy,
+    Column("id", String(36), primary_key=True),
+    Column("discussion_id", String(36), ForeignKey("discussions.id"), nullable=False, index=True),
+    Column("content", Text, nullable=False),
+    Column("author_name", String(100), nullable=False),
+    Column("likes_count", Integer, default=0),
+    Column("created_at", DateTime),
+    Index("ix_replies_discussion_created", "discussion_id", "created_at"),
+)
+Table(
+    "reply_likes", legacy,
+    Column("id", String(36), primary_key=True),
+    Column("reply_id", String(36), ForeignKey("replies.id"), nullable=False),
+    Column("user_identifier", String(100), nullable=False),
+    Column("created_at", DateTime),
+    Index("uq_reply_likes_reply_user", "reply_id", "user_identifier", unique=True),
+)
+
+
+def _run(layout: str, metadata: MetaData, new_id, total: int):
+    path = os.path.join(tempfile.mkdtemp(), f"{layout}.db")
+    engine = create_engine(f"sqlite:///{path}")
+    metadata.create_all(engine, tables=[
+        metadata.tables[name] for name in ("discussions", "replies", "reply_likes")
+    ])
+    replies = metadata.tables["replies"]
+    reply_likes = metadata.tables["reply_likes"]
+    discussion_ids = [generate_uuid() for _ in range(100)]
+    surrogate = layout == "surrogate"
+
+    with engine.begin() as conn:
+        if surrogate:
+            # 空库，主键直接按顺序指定，外键列引用这些整数
+            conn.execute(metadata.tables["discussions"].insert(), [
+                {"pk": pk, "id": did, "title": "bench", "content": "bench", "author_name": "bench"}
+                for pk, did in enumerate(discussion_ids, 1)
+            ])
+        else:
+            conn.execute(metadata.tables["discussions"].insert(), [{"id": did} for did in discussion_ids])
+
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    for offset in range(0, total, BATCH_SIZE):
+        batch = [
+            {
+                "id": new_id(),
+                "content": f"reply {i}",
+                "author_name": "bench",
+                "likes_count": 0,
+                "created_at": now,
+            }
+            for i in range(offset, min(offset + BATCH_SIZE, total))
+        ]
+        likes = [{"user_identifier": f"user-{i % 50}", "created_at": now} for i in range(len(batch))]
+        for i, (row, like) in enumerate(zip(batch, likes), offset):
+            if surrogate:
+                row["pk"] = i + 1
+                row["discussion_pk"] = i % len(discussion_ids) + 1
+                like["reply_pk"] = row["pk"]
+            else:
+                row["discussion_id"] = discussion_ids[i % len(discussion_ids)]
+                like["reply_id"] = row["id"]
+                like["id"] = str(uuid.uuid4())
+        with engine.begin() as conn:
+            conn.execute(replies.insert(), batch)
+            conn.execute(reply_likes.insert(), likes)
+    elapsed = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        sizes = conn.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name LIKE '%replies%' OR name LIKE '%reply_likes%' GROUP BY name ORDER BY name"
+        )).all()
+    engine.dispose()
+
+    total_bytes = sum(size for _, size in sizes)
+    print(f"{layout:9} | {total * 2 / elapsed:8.0f} 行/秒 | 合计 {total_bytes / 1024 / 1024:7.2f} MiB")
+    for name, size in sizes:
+        print(f"{'':9} |   {name:40} {size / 1024:10.0f} KiB")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"插入 {total} 条回复及 {total} 条点赞记录，每批 {BATCH_SIZE} 条")
+    _run("uuid", legacy, lambda: str(uuid.uuid4()), total)
+    _run("surrogate", Base.metadata, generate_uuid, total)
+
+
+if __name__ == "__main__":
+    main()
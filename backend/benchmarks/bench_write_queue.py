@@ -0,0 +1,96 @@
+"""
+组提交写队列吞吐基准
+对比两种方式在 SQLite 上持续插入回复的吞吐：
+- direct: 多个线程各自开事务、提交（每次写入一次 fsync，写者之间争抢数据库锁）
+- queue:  并发协程通过 WriteQueue 提交，由单写线程按批次组提交
+
+运行: cd backend && python -m benchmarks.bench_write_queue [写入总数] [并发数]
+使用临时数据库文件，不影响 app.db
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from database import SessionLocal, init_db  # noqa: E402
+from models import Discussion, Reply  # noqa: E402
+from services.write_queue import WriteQueue  # noqa: E402
+
+
+def _setup() -> int:
+    init_db()
+    db = SessionLocal()
+    discussion = Discussion(title="bench", content="bench", author_name="bench")
+    db.add(discussion)
+    db.commit()
+    discussion_pk = discussion.pk
+    db.close()
+    return discussion_pk
+
+
+def _add_reply(db, discussion_pk: int, i: int):
+    db.add(Reply(discussion_pk=discussion_pk, content=f"reply {i}", author_name="bench"))
+    discussion = db.query(Discussion).filter(Discussion.pk == discussion_pk).one()
+    discussion.replies_count += 1
+
+
+def run_direct(discussion_pk: int, total: int, concurrency: int):
+    errors = 0
+
+    def one(i: int):
+        nonlocal errors
+        db = SessionLocal()
+        try:
+            _add_reply(db, discussion_pk, i)
+            db.commit()
+        except OperationalError:
+            errors += 1
+            db.rollback()
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"direct | {total / elapsed:8.0f} 写/秒 | 耗时 {elapsed:6.2f}s | 失败 {errors}")
+
+
+async def run_queue(discussion_pk: int, total: int, concurrency: int):
+    queue = WriteQueue(window_ms=5, max_batch=200)
+    queue.start()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await queue.submit(lambda db: _add_reply(db, discussion_pk, i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    await queue.stop()
+    print(
+        f"queue  | {total / elapsed:8.0f} 写/秒 | 耗时 {elapsed:6.2f}s | 失败 0"
+        f" | 批次 {queue.batches}，平均每批 {queue.writes / queue.batches:.1f} 条"
+    )
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    discussion_pk = _setup()
+    print(f"{total} 次写入，并发 {concurrency}")
+    run_direct(discussion_pk, total, concurrency)
+    asyncio.run(run_queue(discussion_pk, total, concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,117 @@ class Settings(BaseSettings):
     debug: bool = False
     cors_origins: str = "http://localhost:5173"
     
+    # 性能剖析配置
+    profiling_enabled: bool = False
+    profiling_token: str = ""  # 受信任客户端通过 X-Profile-Token 头或 profile_token 参数携带
+    profiling_sample_rate: float = 0.0  # 全局随机剖析比例 (0~1)，用于持续低开销剖析
+    profiling_interval_ms: float = 5.0  # 栈采样间隔
+    profiling_output_dir: str = "./profiles"
+    
+    # 点赞成员过滤器配置 (布隆过滤器)
+    like_filter_capacity: int = 1_000_000
+    like_filter_error_rate: float = 0.01
+    like_filter_refresh_seconds: int = 300  # 定期在后台全量重建，清除已取消点赞造成的误报
+    
+    # 实时推送 (SSE) 配置
+    events_queue_size: int = 100  # 每个订阅者的待发送事件上限，超出后要求客户端重新同步
+    events_keepalive_seconds: int = 15
+    events_max_topics: int = 20
+    
+    # 热度排行配置
+    trending_half_life_hours: float = 24.0  # 热度半衰期
+    trending_weight_create: float = 3.0
+    trending_weight_like: float = 1.0
+    trending_weight_reply: float = 2.0  # 讨论的回复 / 项目的评论
+    trending_weight_view: float = 0.1
+    
+    # 独立访客估计配置
+    viewer_sketch_cache_size: int = 10000  # 每个 worker 缓存的 HyperLogLog 草图数
+    
+    # 组提交写队列配置 (适用于 SQLite 突发写入)
+    write_queue_enabled: bool = False
+    write_queue_window_ms: float = 5.0  # 收集同一批写入的最长等待时间
+    write_queue_max_batch: int = 100
+    
+    # 删除清理配置
+    purge_batch_size: int = 1000  # 软删除讨论的回复每批清理条数
+    
+    # 相关项目配置
+    related_top_k: int = 6  # 每个项目预先计算的相关项目数
+    
+    # 定时任务配置 (计划为 "@every 10m" 形式的间隔或 5 段 cron 表达式 (UTC)，留空表示不执行)
+    scheduler_enabled: bool = True
+    scheduler_jitter_seconds: float = 30.0  # 每次执行随机推迟的最长时间，避免多个任务同时启动
+    scheduler_lease_seconds: float = 300.0  # 租约时长，执行期间定期续约
+    scheduler_drain_seconds: float = 30.0  # 关闭时等待执行中任务结束的最长时间
+    schedule_rescale_trending: str = "@every 6h"
+    schedule_purge_deleted: str = "@every 10m"
+    schedule_archive: str = "0 3 * * *"
+    schedule_rebuild_related: str = "30 3 * * *"
+    schedule_prune_jobs: str = "@every 1h"
+    schedule_reconcile_counts: str = "@every 1h"
+    
+    # 计数校正配置
+    reconcile_batch_size: int = 5000  # 每批检查的父表行数
+    
+    # AI 用量与提示词预算配置
+    ai_insight_input_tokens: int = 600  # 项目点评中项目信息的 token 预算
+    ai_max_prompt_tokens: int = 3000  # 单次调用提示词的 token 上限，超出时截断最后一条用户消息
+    ai_price_prompt_per_million: float = 2.0  # 每百万输入 token 的价格（元），用于估算费用
+    ai_price_completion_per_million: float = 3.0  # 每百万输出 token 的价格（元）
+    
+    # AI 任务队列配置 (任务持久化在数据库中，重启后继续执行)
+    job_workers: int = 3  # 每个进程的任务协程数
+    job_interactive_workers: int = 1  # 其中只处理交互式任务的协程数，保证交互式任务不被批量任务占满
+    job_max_attempts: int = 3
+    job_timeout_seconds: float = 120.0  # 单个任务的执行超时，运行超过该时间的任务视为中断并重新排队
+    job_poll_seconds: float = 2.0  # 空闲时检查其他进程提交的任务的间隔
+    job_result_ttl_seconds: int = 600  # 相同任务键在该时间内重复提交时直接返回已完成的结果
+    job_retention_days: int = 7  # 已结束任务的保留天数
+    
+    # 讨论摘要配置 (每次刷新只把上次摘要与新增回复发给模型)
+    summary_max_replies: int = 100  # 每次刷新最多纳入的新回复数，其余留待下次
+    summary_max_delta_chars: int = 6000  # 每次刷新新增回复的总字数上限
+    summary_reply_chars: int = 500  # 单条回复截断长度
+    summary_max_tokens: int = 400
+    
+    # 活跃度统计配置
+    analytics_max_buckets: int = 2000  # 单次查询最多返回的时间桶数
+    
+    # 重复内容检测配置 (SimHash，按 16 位分段索引)
+    duplicate_action: str = "reject"  # reject 拒绝 / merge 同一讨论或项目下返回已有内容 / off 关闭
+    duplicate_max_distance: int = 3  # 视为重复的最大汉明距离，须小于分段数 4 才能保证查到
+    duplicate_min_chars: int = 20  # 去掉空白与标点后短于此长度的内容不检测
+    duplicate_cross_scope: bool = False  # 回复与评论是否也与其他讨论或项目下的内容比较（默认只查同一讨论或项目）
+    
+    # 进程内缓存配置 (多 worker 之间通过 cache_versions 表失效)
+    cache_max_entries: int = 256  # 每个缓存的最大条目数
+    cache_max_age_seconds: float = 60.0  # 浏览量等不触发失效的字段最多滞后的时间
+    
+    # 准入控制与限流配置 (按 X-User-Identifier 或客户端 IP 的令牌桶，按路由类别限制并发)
+    rate_limit_enabled: bool = True
+    rate_limit_ai_per_minute: float = 10  # /api/ai/*
+    rate_limit_ai_burst: int = 3
+    rate_limit_likes_per_minute: float = 60  # 点赞接口
+    rate_limit_likes_burst: int = 20
+    rate_limit_writes_per_minute: float = 60  # 其他写接口
+    rate_limit_writes_burst: int = 20
+    rate_limit_reads_per_minute: float = 1200
+    rate_limit_reads_burst: int = 200
+    rate_limit_max_clients: int = 10000  # 令牌桶 LRU 上限，超出后淘汰最久未访问的客户端
+    concurrency_ai: int = 4  # 各路由类别同时处理的请求上限，0 表示不限制
+    concurrency_writes: int = 32
+    concurrency_reads: int = 256
+    
+    # 管理接口配置
+    admin_token: str = ""  # 数据导出等管理接口通过 X-Admin-Token 头校验，未配置时接口关闭
+    
+    # 冷数据归档配置
+    archive_database_url: str = "sqlite:///./archive.db"  # 归档库，与热数据分开存放
+    archive_after_days: int = 90  # 超过该天数无新回复的讨论归档
+    archive_closed_after_days: int = 7  # 已关闭的讨论在最后活跃该天数后归档
+    archive_batch_size: int = 100  # 每批迁移的讨论数
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -2,8 +2,13 @@
 数据库连接与会话管理
 """
 
-from sqlalchemy import create_engine
+import hashlib
+from typing import Optional
+
+from sqlalchemy import Integer, create_engine, inspect, select, delete, func, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.schema import CreateTable
 from config import get_settings
 
 settings = get_settings()
@@ -34,6 +39,197 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """初始化数据库表"""
+def dialect_insert(model, bind=engine):
+    """
+    返回当前数据库方言的 insert 构造
+    SQLite / PostgreSQL 的 insert 均支持 on_conflict_do_nothing / on_conflict_do_update，
+    用于单语句 upsert
+    """
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def read_app_meta(bind=engine) -> dict[str, str]:
+    """一次查询读取全部应用元数据；表尚不存在（全新数据库）时返回空字典"""
+    try:
+        with bind.connect() as conn:
+            return dict(conn.execute(text("SELECT key, value FROM app_meta")).all())
+    except DBAPIError:
+        return {}
+
+
+def write_app_meta(meta: dict[str, str], bind=engine, metadata=Base.metadata, **values: str):
+    """写入应用元数据，并同步更新调用方持有的 meta；bind / metadata 指定写入哪个库"""
+    table = metadata.tables["app_meta"]
+    stmt = dialect_insert(table, bind)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.key], set_={"value": stmt.excluded.value})
+    with bind.begin() as conn:
+        conn.execute(stmt, [{"key": key, "value": value} for key, value in values.items()])
+    meta.update(values)
+
+
+def schema_fingerprint(metadata=Base.metadata, bind=engine) -> str:
+    """
+    按模型的表、列、外键与索引定义计算结构指纹，模型的任何结构变化都会改变指纹
+    各部分排序后再计算，不受集合迭代顺序影响
+    """
+    parts = []
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(
+                f"  {column.name} {column.type.compile(dialect=bind.dialect)}"
+                f" pk={column.primary_key} null={column.nullable}"
+            )
+        parts.extend(sorted(
+            f"  fk {fk.parent.name} -> {fk.target_fullname} {fk.ondelete}" for fk in table.foreign_keys
+        ))
+        parts.extend(sorted(
+            f"  index {ix.name} ({','.join(c.name for c in ix.columns)}) unique={ix.unique}"
+            f" where={ix.dialect_options['sqlite'].get('where')}"
+            for ix in table.indexes
+        ))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def init_db(meta: Optional[dict[str, str]] = None) -> bool:
+    """
+    初始化数据库表，返回是否执行了初始化
+    已记录的结构指纹与当前模型一致时直接跳过建表、补列与补索引
+    """
+    meta = read_app_meta() if meta is None else meta
+    fingerprint = schema_fingerprint()
+    if meta.get("schema_version") == fingerprint:
+        return False
+
     Base.metadata.create_all(bind=engine)
+    _rebuild_primary_keys()
+    _ensure_columns()
+    _ensure_indexes()
+    write_app_meta(meta, schema_version=fingerprint)
+    return True
+
+
+# 由字符串外键改为整数外键的列：新列 -> (旧列, 父表)，旧表重建时按父表的公开 id 换算为父表的 pk
+LEGACY_FOREIGN_KEYS = {
+    "comments": {"project_pk": ("project_id", "projects")},
+    "likes": {"project_pk": ("project_id", "projects")},
+    "thread_summaries": {"discussion_pk": ("discussion_id", "discussions")},
+    "replies": {"discussion_pk": ("discussion_id", "discussions"), "reply_to_pk": ("reply_to_id", "replies")},
+    "discussion_likes": {"discussion_pk": ("discussion_id", "discussions")},
+    "reply_likes": {"reply_pk": ("reply_id", "replies")},
+    "project_vectors": {"project_pk": ("project_id", "projects")},
+    "project_neighbors": {"project_pk": ("project_id", "projects"), "neighbor_pk": ("neighbor_id", "projects")},
+}
+
+
+def _rebuild_primary_keys(bind=engine, metadata=Base.metadata):
+    """
+    将主键或外键与模型不一致的旧表重建：字符串 UUID 主键改为整数主键，字符串外键改为指向父表 pk 的整数外键
+    SQLite 无法修改主键和列类型，按官方建议的步骤：建新表、按创建时间复制数据、删旧表、改名，
+    新分配的整数主键因此按时间顺序排列；已有整数主键的表保留原值。
+    父表先于子表处理，外键按父表的公开 id 换算，父记录已不存在的孤儿行不再保留；索引随后由 _ensure_indexes 补建
+    """
+    if bind.dialect.name != "sqlite":
+        return
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        pk_columns = list(table.primary_key.columns)
+        if table.name not in tables or len(pk_columns) != 1 or not isinstance(pk_columns[0].type, Integer):
+            continue
+        pk = pk_columns[0]
+        existing = {col["name"]: col for col in inspector.get_columns(table.name)}
+        old_pk = inspector.get_pk_constraint(table.name)["constrained_columns"]
+        keep_pk = old_pk == [pk.name] and "INT" in str(existing[pk.name]["type"]).upper()
+        legacy = {
+            new: spec for new, spec in LEGACY_FOREIGN_KEYS.get(table.name, {}).items()
+            if new not in existing and spec[0] in existing
+        }
+        if keep_pk and not legacy:
+            continue
+
+        # 旧主键若与新主键同名（如点赞表的 id）且不是整数，其字符串值不再保留
+        columns = [c.name for c in table.columns if c.name in existing and (keep_pk or c.name != pk.name)]
+        targets, sources, required = list(columns), [f"o.{name}" for name in columns], []
+        for new, (old, parent) in legacy.items():
+            if parent == table.name:
+                continue  # 自引用在新表建好后再换算
+            source = f"(SELECT p.pk FROM {parent} p WHERE p.id = o.{old})"
+            targets.append(new)
+            sources.append(source)
+            if not table.c[new].nullable:
+                required.append(f"{source} IS NOT NULL")
+        where = f" WHERE {' AND '.join(required)}" if required else ""
+        order_by = "o.created_at, o.rowid" if "created_at" in existing else "o.rowid"
+        create_sql = str(CreateTable(table).compile(bind)).replace(
+            f"CREATE TABLE {table.name} (", f"CREATE TABLE {table.name}__new (", 1
+        )
+        with bind.begin() as conn:
+            conn.exec_driver_sql("BEGIN")
+            conn.exec_driver_sql(create_sql)
+            copied = conn.exec_driver_sql(
+                f"INSERT INTO {table.name}__new ({', '.join(targets)}) "
+                f"SELECT {', '.join(sources)} FROM {table.name} o{where} ORDER BY {order_by}"
+            ).rowcount
+            for new, (old, parent) in legacy.items():
+                if parent == table.name:
+                    conn.exec_driver_sql(
+                        f"UPDATE {table.name}__new SET {new} = ("
+                        f"SELECT q.pk FROM {table.name}__new q JOIN {table.name} o ON q.id = o.{old} "
+                        f"WHERE o.id = {table.name}__new.id)"
+                    )
+            total = conn.exec_driver_sql(f"SELECT count(*) FROM {table.name}").scalar()
+            conn.exec_driver_sql(f"DROP TABLE {table.name}")
+            conn.exec_driver_sql(f"ALTER TABLE {table.name}__new RENAME TO {table.name}")
+        print(f"🔧 已重建 {table.name} 表的整数主键与外键" + (f"，丢弃了 {total - copied} 条孤儿行" if total > copied else ""))
+
+
+def _ensure_columns(bind=engine, metadata=Base.metadata):
+    """
+    为已存在的表补齐模型中新增的列
+    新增列一律以可空列添加，由各自的回填逻辑负责填充历史数据
+    """
+    inspector = inspect(bind)
+    for table in metadata.sorted_tables:
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+
+
+# 模型中已被取代的索引，已有数据库启动时删除；保留会让查询规划器选错索引
+OBSOLETE_INDEXES = {
+    "discussions": ("ix_discussions_trending", "ix_discussions_deleted_at"),
+}
+
+
+def _ensure_indexes(bind=engine, metadata=Base.metadata):
+    """
+    为已存在的表补建模型中新增的索引，并删除已被取代的旧索引
+    create_all 只会在建表时创建索引；新增唯一索引前先清理重复行，保留最早的一条，并输出删除的行数
+    """
+    inspector = inspect(bind)
+    for table in metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing:
+                with bind.begin() as conn:
+                    conn.exec_driver_sql(f"DROP INDEX {name}")
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            with bind.begin() as conn:
+                if index.unique:
+                    pk = list(table.primary_key.columns)[0]
+                    keep = select(func.min(pk)).group_by(*index.columns)
+                    removed = conn.execute(delete(table).where(pk.not_in(keep))).rowcount
+                    if removed:
+                        print(f"🔧 建立唯一索引 {index.name} 前删除了 {table.name} 表中 {removed} 条重复行")
+                index.create(bind=conn)
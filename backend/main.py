@@ -3,28 +3,85 @@ AI Dev Journey Portal - 后端 API 入口
 FastAPI 应用主文件
 """
 
-from contextlib import asynccontextmanager
+import time
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
-from database import init_db
-from routers import projects, comments, ai, discussions
+from database import init_db, read_app_meta, SessionLocal
+from routers import projects, comments, ai, discussions, likes, events, changes, profiling, admin, jobs, analytics
 from seed_data import seed_database
+from services.profiler import ProfilingMiddleware
+from services.rate_limit import RateLimitMiddleware
+from services.ranking import backfill_trending
+from services.duplicates import backfill_fingerprints
+from services.archive import init_archive
+from services.write_queue import write_queue
+from services.job_queue import job_queue
+from services.scheduler import scheduler, register_default_tasks
 
 settings = get_settings()
 
 
+@contextmanager
+def startup_phase(timings: dict[str, float], name: str):
+    """记录启动阶段耗时（毫秒）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    # 启动时初始化数据库
+    # 启动时初始化数据库；已初始化的库读一次元数据后跳过各步骤
     print("🚀 正在启动 AI Dev Journey Portal 后端...")
-    init_db()
-    seed_database()
-    print("✅ 数据库初始化完成")
+    timings: dict[str, float] = {}
+    app.state.startup_timings = timings
+    with startup_phase(timings, "read_meta"):
+        meta = read_app_meta()
+    with startup_phase(timings, "init_db"):
+        changed = init_db(meta)
+    with startup_phase(timings, "init_archive"):
+        changed = init_archive() or changed
+    with startup_phase(timings, "seed"):
+        changed = seed_database(meta) or changed
+    if changed:
+        with startup_phase(timings, "backfill_trending"):
+            db = SessionLocal()
+            try:
+                backfill_trending(db)
+            finally:
+                db.close()
+        with startup_phase(timings, "related"):
+            from services.related import ensure_related
+            db = SessionLocal()
+            try:
+                ensure_related(db)
+            finally:
+                db.close()
+        with startup_phase(timings, "fingerprints"):
+            db = SessionLocal()
+            try:
+                backfill_fingerprints(db)
+            finally:
+                db.close()
+    summary = "，".join(f"{name} {ms:.1f}ms" for name, ms in timings.items())
+    print(f"✅ 数据库初始化完成 ({summary})")
+    if settings.write_queue_enabled:
+        write_queue.start()
+    job_queue.start()
+    if settings.scheduler_enabled:
+        register_default_tasks()
+        scheduler.start()
     yield
-    # 关闭时清理资源
+    # 关闭时清理资源：等待执行中的定时任务与 AI 任务结束，未领取的任务留在队列中下次启动继续
+    await scheduler.stop()
+    await job_queue.stop()
+    await write_queue.stop()
     print("👋 后端服务已关闭")
 
 
@@ -39,6 +96,12 @@ app = FastAPI(
     openapi_url="/api/openapi.json"
 )
 
+# 配置按需剖析中间件 (需位于 CORS 之内，使剖析响应同样带有 CORS 头)
+app.add_middleware(ProfilingMiddleware)
+
+# 配置准入控制中间件 (位于 CORS 之内、剖析之外，被拒绝的请求同样带有 CORS 头且不会被剖析)
+app.add_middleware(RateLimitMiddleware)
+
 # 配置 CORS 中间件
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +109,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 回复分页游标，跨域客户端需要读取
 )
 
 # 注册路由
@@ -53,6 +117,13 @@ app.include_router(projects.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
 app.include_router(ai.router, prefix="/api")
 app.include_router(discussions.router, prefix="/api")
+app.include_router(likes.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+app.include_router(changes.router, prefix="/api")
+app.include_router(profiling.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
 
 
 @app.get("/")
@@ -4,23 +4,45 @@ SQLAlchemy ORM 数据模型
 """
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, String, Integer, BigInteger, Float, Text, DateTime, ForeignKey, JSON, Index, LargeBinary, select, text
+)
+from sqlalchemy.orm import aliased, column_property, relationship
 from database import Base
+import os
+import time
 import uuid
 
 
 def generate_uuid():
-    """生成 UUID 字符串"""
-    return str(uuid.uuid4())
+    """
+    生成按时间有序的 UUID 字符串（UUIDv7 布局：48 位毫秒时间戳 + 随机位）
+    新 id 总是追加在唯一索引末尾，不再随机分散到整棵 B 树
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) | 0x7 << 76  # 版本号 7
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 变体
+    return str(uuid.UUID(int=value))
+
+
+def public_id():
+    """
+    对外暴露的字符串 id，API 与变更日志以它定位记录；行的存储顺序由整数主键 pk (SQLite rowid) 决定，
+    外键（*_pk 列）与连接都使用 pk，子表不再保存 36 字符的字符串
+    """
+    return Column(String(36), unique=True, index=True, nullable=False, default=generate_uuid)
 
 
 class Project(Base):
     """项目模型"""
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_trending", "trending_score"),
+    )
     
     # 基础标识
-    id = Column(String(36), primary_key=True, default=generate_uuid)
+    pk = Column(Integer, primary_key=True)
+    id = public_id()
     title = Column(String(200), nullable=False, index=True)
     category = Column(String(50), nullable=False, default="Other")  # Web, AI Tool, Mobile, Other
     
@@ -42,12 +64,20 @@ class Project(Base):
     likes_count = Column(Integer, default=0)
     comments_count = Column(Integer, default=0)
     
+    # 热度分（按时间指数衰减，由 services/ranking.py 增量维护）
+    trending_score = Column(Float, nullable=True)
+    
+    # 独立访客估计（HyperLogLog 草图及其估计值，由 services/viewer_stats.py 维护）
+    viewers_sketch = Column(LargeBinary, nullable=True)
+    unique_viewers = Column(Integer, nullable=True)
+    
     # 时间戳
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关联关系
-    comments = relationship("Comment", back_populates="project", cascade="all, delete-orphan")
+    # passive_deletes: 删除时不把子记录加载进会话，由数据库级联或批量 DELETE 处理
+    comments = relationship("Comment", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<Project(id={self.id}, title={self.title})>"
@@ -57,8 +87,11 @@ class Comment(Base):
     """评论模型"""
     __tablename__ = "comments"
     
-    id = Column(String(36), primary_key=True, default=generate_uuid)
-    project_id = Column(String(36), ForeignKey("projects.id"), nullable=False, index=True)
+    pk = Column(Integer, primary_key=True)
+    id = public_id()
+    project_pk = Column(Integer, ForeignKey("projects.pk", ondelete="CASCADE"), nullable=False, index=True)
+    # 所属项目的公开 id，只读，随查询按主键取出，用于响应
+    project_id = column_property(select(Project.id).where(Project.pk == project_pk).scalar_subquery())
     
     # 评论者信息
     author_name = Column(String(100), nullable=False)
@@ -80,21 +113,37 @@ class Comment(Base):
 class Like(Base):
     """点赞记录模型 - 用于防止重复点赞"""
     __tablename__ = "likes"
+    __table_args__ = (
+        Index("uq_likes_project_user", "project_pk", "user_identifier", unique=True),
+    )
     
-    id = Column(String(36), primary_key=True, default=generate_uuid)
-    project_id = Column(String(36), ForeignKey("projects.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)  # 点赞记录不对外暴露，只需整数主键
+    project_pk = Column(Integer, ForeignKey("projects.pk", ondelete="CASCADE"), nullable=False, index=True)
     user_identifier = Column(String(100), nullable=False)  # 可以是 IP、session ID 或用户 ID
     created_at = Column(DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f"<Like(project_id={self.project_id}, user={self.user_identifier})>"
+        return f"<Like(project_pk={self.project_pk}, user={self.user_identifier})>"
 
 
 class Discussion(Base):
     """社区讨论帖子模型"""
     __tablename__ = "discussions"
-    
-    id = Column(String(36), primary_key=True, default=generate_uuid)
+    __table_args__ = (
+        # 列表查询都带 deleted_at IS NULL，部分索引使热度排序仍可直接按索引顺序读取，不必再排序
+        Index(
+            "ix_discussions_live_trending", "is_pinned", "trending_score",
+            sqlite_where=text("deleted_at IS NULL"), postgresql_where=text("deleted_at IS NULL")
+        ),
+        # 只索引已软删除、待清理的少量讨论，供后台清理任务查找
+        Index(
+            "ix_discussions_deleted", "deleted_at",
+            sqlite_where=text("deleted_at IS NOT NULL"), postgresql_where=text("deleted_at IS NOT NULL")
+        ),
+    )
+    
+    pk = Column(Integer, primary_key=True)
+    id = public_id()
     title = Column(String(300), nullable=False, index=True)
     content = Column(Text, nullable=False)
     
@@ -110,6 +159,13 @@ class Discussion(Base):
     likes_count = Column(Integer, default=0)
     replies_count = Column(Integer, default=0)
     
+    # 热度分（按时间指数衰减，由 services/ranking.py 增量维护）
+    trending_score = Column(Float, nullable=True)
+    
+    # 独立访客估计（HyperLogLog 草图及其估计值，由 services/viewer_stats.py 维护）
+    viewers_sketch = Column(LargeBinary, nullable=True)
+    unique_viewers = Column(Integer, nullable=True)
+    
     # 状态
     is_pinned = Column(Integer, default=0)  # 是否置顶
     is_closed = Column(Integer, default=0)  # 是否关闭讨论
@@ -118,20 +174,96 @@ class Discussion(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_reply_at = Column(DateTime, default=datetime.utcnow)
+    deleted_at = Column(DateTime, nullable=True)  # 软删除时间，回复由后台分批清理
     
     # 关联关系
-    replies = relationship("Reply", back_populates="discussion", cascade="all, delete-orphan")
+    replies = relationship("Reply", back_populates="discussion", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<Discussion(id={self.id}, title={self.title})>"
 
 
+class AIUsage(Base):
+    """AI 用量 - 按天 (UTC)、按调用路由汇总的 token 数与耗时"""
+    __tablename__ = "ai_usage"
+    __table_args__ = (
+        Index("uq_ai_usage_day_route", "day", "route", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(String(10), nullable=False)  # YYYY-MM-DD
+    route = Column(String(100), nullable=False)  # 调用路由，如 project_insight、thread_summary
+    calls = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    truncated = Column(Integer, nullable=False, default=0)  # 提示词因超出预算被截断的调用数
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms_total = Column(Float, nullable=False, default=0)
+    latency_ms_max = Column(Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<AIUsage(day={self.day}, route={self.route}, calls={self.calls})>"
+
+
+class Job(Base):
+    """AI 任务 - 持久化的后台任务队列，按优先级与提交顺序执行"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "priority", "pk"),
+    )
+    
+    pk = Column(Integer, primary_key=True)
+    id = public_id()
+    kind = Column(String(50), nullable=False)
+    job_key = Column(String(64), nullable=False, index=True)  # 去重键，相同的键在排队或执行中时不重复提交
+    priority = Column(Integer, nullable=False, default=0)  # 越小越优先：0 交互式，10 后台
+    
+    # 状态：queued(排队), running(执行中), done(完成), failed(失败)
+    status = Column(String(20), nullable=False, default="queued")
+    payload = Column(JSON, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True, index=True)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status})>"
+
+
+class ThreadSummary(Base):
+    """讨论摘要 - 滚动更新的 AI 摘要及其已覆盖到的最后一条回复 (按 created_at, id 排序)"""
+    __tablename__ = "thread_summaries"
+    
+    pk = Column(Integer, primary_key=True)
+    discussion_pk = Column(Integer, ForeignKey("discussions.pk", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    summary = Column(Text, nullable=False, default="")
+    
+    # 游标：摘要已覆盖的最后一条回复，新回复只需从其后读取
+    last_reply_id = Column(String(36), nullable=True)
+    last_reply_at = Column(DateTime, nullable=True)
+    replies_covered = Column(Integer, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ThreadSummary(discussion_pk={self.discussion_pk}, replies_covered={self.replies_covered})>"
+
+
 class Reply(Base):
     """讨论回复模型"""
     __tablename__ = "replies"
+    __table_args__ = (
+        Index("ix_replies_discussion_created", "discussion_pk", "created_at"),
+    )
     
-    id = Column(String(36), primary_key=True, default=generate_uuid)
-    discussion_id = Column(String(36), ForeignKey("discussions.id"), nullable=False, index=True)
+    pk = Column(Integer, primary_key=True)
+    id = public_id()
+    discussion_pk = Column(Integer, ForeignKey("discussions.pk", ondelete="CASCADE"), nullable=False, index=True)
+    # 所属讨论的公开 id，只读，随查询按主键取出，用于响应
+    discussion_id = column_property(select(Discussion.id).where(Discussion.pk == discussion_pk).scalar_subquery())
     
     # 回复内容
     content = Column(Text, nullable=False)
@@ -144,7 +276,7 @@ class Reply(Base):
     likes_count = Column(Integer, default=0)
     
     # 引用回复（可选）
-    reply_to_id = Column(String(36), ForeignKey("replies.id"), nullable=True)
+    reply_to_pk = Column(Integer, ForeignKey("replies.pk", ondelete="SET NULL"), nullable=True)
     
     # 时间戳
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -154,3 +286,186 @@ class Reply(Base):
     
     def __repr__(self):
         return f"<Reply(id={self.id}, author={self.author_name})>"
+
+
+# 被引用回复的公开 id，只读；自引用需要别名，在类定义之后添加
+_quoted_reply = aliased(Reply)
+Reply.reply_to_id = column_property(
+    select(_quoted_reply.id).where(_quoted_reply.pk == Reply.reply_to_pk).scalar_subquery()
+)
+
+
+class DiscussionLike(Base):
+    """讨论点赞记录模型 - 每个用户对每个讨论只记一次"""
+    __tablename__ = "discussion_likes"
+    __table_args__ = (
+        Index("uq_discussion_likes_discussion_user", "discussion_pk", "user_identifier", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)  # 点赞记录不对外暴露，只需整数主键
+    discussion_pk = Column(Integer, ForeignKey("discussions.pk", ondelete="CASCADE"), nullable=False)
+    user_identifier = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DiscussionLike(discussion_pk={self.discussion_pk}, user={self.user_identifier})>"
+
+
+class ReplyLike(Base):
+    """回复点赞记录模型 - 每个用户对每条回复只记一次"""
+    __tablename__ = "reply_likes"
+    __table_args__ = (
+        Index("uq_reply_likes_reply_user", "reply_pk", "user_identifier", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)  # 点赞记录不对外暴露，只需整数主键
+    reply_pk = Column(Integer, ForeignKey("replies.pk", ondelete="CASCADE"), nullable=False)
+    user_identifier = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ReplyLike(reply_pk={self.reply_pk}, user={self.user_identifier})>"
+
+
+class ChangeLog(Base):
+    """
+    变更日志 - 供增量同步使用
+    每个实体只保留最近一次变更（新变更会替换旧记录并获得新的递增 id），
+    删除以墓碑 (op="delete") 的形式保留
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("uq_change_log_entity", "entity_type", "entity_id", unique=True),
+        {"sqlite_autoincrement": True},  # 保证 id 不被复用，游标严格单调
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String(20), nullable=False)  # project, discussion, reply, comment
+    entity_id = Column(String(36), nullable=False)
+    op = Column(String(10), nullable=False)  # create, update, delete
+    changed_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ChangeLog(id={self.id}, {self.op} {self.entity_type}:{self.entity_id})>"
+
+
+class RankingState(Base):
+    """排行榜状态 - 记录热度分当前所基于的时间基准点"""
+    __tablename__ = "ranking_state"
+    
+    name = Column(String(50), primary_key=True)
+    epoch = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<RankingState(name={self.name}, epoch={self.epoch})>"
+
+
+class SchedulerLease(Base):
+    """定时任务租约 - 多个 worker 进程之间保证同一任务同时只有一个实例执行，并记录最近一次执行"""
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(100), nullable=True)  # 持有租约的进程
+    expires_at = Column(DateTime, nullable=True)
+    last_started_at = Column(DateTime, nullable=True)
+    last_finished_at = Column(DateTime, nullable=True)
+    last_duration_ms = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+    runs = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<SchedulerLease(name={self.name}, owner={self.owner})>"
+
+
+class ProjectVector(Base):
+    """项目文本特征向量 - 标题、完整描述与标签的哈希词频（稀疏存储），用于计算相关项目"""
+    __tablename__ = "project_vectors"
+    
+    pk = Column(Integer, primary_key=True)
+    project_pk = Column(Integer, ForeignKey("projects.pk", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    features = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ProjectVector(project_pk={self.project_pk})>"
+
+
+class ProjectNeighbor(Base):
+    """相关项目 - 预先计算的每个项目最相似的 top-k 项目，按 rank 取出即可"""
+    __tablename__ = "project_neighbors"
+    __table_args__ = (
+        Index("uq_project_neighbors_pair", "project_pk", "neighbor_pk", unique=True),
+        Index("ix_project_neighbors_rank", "project_pk", "rank"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    project_pk = Column(Integer, ForeignKey("projects.pk", ondelete="CASCADE"), nullable=False)
+    neighbor_pk = Column(Integer, ForeignKey("projects.pk", ondelete="CASCADE"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<ProjectNeighbor({self.project_pk} -> {self.neighbor_pk}, score={self.score:.3f})>"
+
+
+class ActivityRollup(Base):
+    """活跃度汇总 - 已结束时间桶内各类活动按分类的计数，由 services/analytics.py 写入后不再变化"""
+    __tablename__ = "activity_rollups"
+    __table_args__ = (
+        Index("uq_activity_rollups_bucket", "granularity", "bucket", "series", "category", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)  # hour / day
+    bucket = Column(String(20), nullable=False)  # 桶的起始时间 (UTC)，如 2024-01-01 或 2024-01-01T08:00
+    series = Column(String(20), nullable=False)  # discussions / replies / comments / likes
+    category = Column(String(50), nullable=False)
+    count = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<ActivityRollup({self.granularity} {self.bucket} {self.series}/{self.category}={self.count})>"
+
+
+class ContentFingerprint(Base):
+    """内容指纹 - 讨论、回复与评论正文的 64 位 SimHash，按 16 位分段每段一行，按段值查找近似重复的候选"""
+    __tablename__ = "content_fingerprints"
+    __table_args__ = (
+        Index("ix_content_fingerprints_band", "kind", "band", "band_value"),
+        Index("ix_content_fingerprints_scope_band", "kind", "scope_id", "band", "band_value"),
+        Index("ix_content_fingerprints_entity", "kind", "entity_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # discussion / reply / comment
+    entity_id = Column(String(36), nullable=False)
+    scope_id = Column(String(36), nullable=True)  # 回复所属讨论、评论所属项目
+    band = Column(Integer, nullable=False)  # 段号 0~3
+    band_value = Column(Integer, nullable=False)
+    simhash = Column(BigInteger, nullable=False)  # 完整指纹（有符号存储）
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ContentFingerprint({self.kind} {self.entity_id} band{self.band}={self.band_value})>"
+
+
+class CacheVersion(Base):
+    """缓存版本 - 每类实体一个递增版本号，写入时在同一事务内递增，各 worker 据此判断进程内缓存是否失效"""
+    __tablename__ = "cache_versions"
+    
+    entity_type = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<CacheVersion({self.entity_type}={self.version})>"
+
+
+class AppMeta(Base):
+    """应用元数据 - 记录已初始化的表结构与种子数据版本，启动时一次查询即可判断能否跳过初始化"""
+    __tablename__ = "app_meta"
+    
+    key = Column(String(50), primary_key=True)
+    value = Column(String(100), nullable=False)
+    
+    def __repr__(self):
+        return f"<AppMeta({self.key}={self.value})>"
@@ -0,0 +1,93 @@
+"""
+管理 API 路由
+数据导出等运维接口，仅对持有管理令牌的客户端开放
+"""
+
+import secrets
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from schemas import AIUsageReport, AIUsageRow
+from services.ai_usage import estimated_cost, usage_rows
+from services.data_transfer import EXPORT_TYPES, iter_export
+from services.scheduler import scheduler
+
+settings = get_settings()
+
+router = APIRouter(prefix="/admin", tags=["管理"])
+
+
+def get_db():
+    """数据库会话依赖"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def require_admin(token: Optional[str]):
+    """校验管理令牌，未配置令牌时管理接口整体关闭"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="管理接口未启用")
+    if not token or not secrets.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="无权访问管理接口")
+
+
+@router.get("/export")
+async def export_data(
+    types: Optional[str] = Query(None, description=f"逗号分隔的导出类型: {','.join(EXPORT_TYPES)}"),
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")
+):
+    """以 NDJSON 流式导出门户数据，可用 python -m services.data_transfer import 导入"""
+    require_admin(x_admin_token)
+
+    type_list = [t for t in types.split(",") if t] if types else None
+    unknown = [t for t in type_list or [] if t not in EXPORT_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的导出类型: {','.join(unknown)}")
+
+    filename = f"portal-{datetime.utcnow():%Y%m%d%H%M%S}.ndjson"
+    return StreamingResponse(
+        iter_export(type_list),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/ai-usage", response_model=AIUsageReport)
+async def get_ai_usage(
+    days: int = Query(7, ge=1, le=90),
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    db: Session = Depends(get_db)
+):
+    """按天、按调用路由汇总的 AI 调用次数、token 数、延迟与估算费用"""
+    require_admin(x_admin_token)
+
+    rows = [
+        AIUsageRow.from_orm_model(usage, estimated_cost(usage.prompt_tokens, usage.completion_tokens))
+        for usage in usage_rows(db, days)
+    ]
+    prompt_tokens = sum(row.promptTokens for row in rows)
+    completion_tokens = sum(row.completionTokens for row in rows)
+    return AIUsageReport(
+        days=days,
+        rows=rows,
+        totalCalls=sum(row.calls for row in rows),
+        totalPromptTokens=prompt_tokens,
+        totalCompletionTokens=completion_tokens,
+        totalEstimatedCost=estimated_cost(prompt_tokens, completion_tokens)
+    )
+
+
+@router.get("/scheduler", response_model=dict)
+async def get_scheduler_status(x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")):
+    """定时任务的计划与运行指标"""
+    require_admin(x_admin_token)
+    return {"owner": scheduler.owner, "running": scheduler.running, "tasks": scheduler.metrics()}
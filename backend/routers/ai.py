@@ -3,14 +3,28 @@ AI 相关 API 路由
 提供 DeepSeek AI 驱动的智能功能
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 
-from schemas import AIInsightRequest, AIInsightResponse
+from database import SessionLocal
+from models import Discussion
+from schemas import AIInsightRequest, AIInsightResponse, ThreadSummaryResponse
 from services.deepseek_service import generate_project_insight
+from services.thread_summary import refresh_summary
+from services.archive import archive_session
 
 router = APIRouter(prefix="/ai", tags=["AI 服务"])
 
 
+def get_db():
+    """数据库会话依赖"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 @router.post("/insights", response_model=AIInsightResponse)
 async def get_ai_insight(request: AIInsightRequest):
     """
@@ -30,3 +44,26 @@ async def get_ai_insight(request: AIInsightRequest):
             status_code=500,
             detail=f"AI 服务暂时不可用: {str(e)}"
         )
+
+
+@router.post("/discussions/{discussion_id}/summary", response_model=ThreadSummaryResponse)
+async def refresh_thread_summary(discussion_id: str, db: Session = Depends(get_db)):
+    """
+    刷新讨论摘要
+    只把上次摘要与其后的新回复发给模型，没有新回复时直接返回已存摘要，不调用模型
+    """
+    discussion = db.query(Discussion).filter(
+        Discussion.id == discussion_id,
+        Discussion.deleted_at.is_(None)
+    ).first()
+    if not discussion:
+        with archive_session() as cold:
+            if cold.query(Discussion.id).filter(Discussion.id == discussion_id).first():
+                raise HTTPException(status_code=400, detail="该讨论已归档，摘要不再更新")
+        raise HTTPException(status_code=404, detail="讨论不存在")
+    
+    try:
+        summary = await refresh_summary(db, discussion)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI 服务暂时不可用: {str(e)}")
+    return ThreadSummaryResponse.from_orm_model(discussion, summary)
@@ -0,0 +1,73 @@
+"""
+统计分析 API 路由
+按小时或按天的讨论、回复、评论与点赞数量，用于活跃度看板
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from services.analytics import GRANULARITIES, activity
+
+settings = get_settings()
+
+router = APIRouter(prefix="/analytics", tags=["统计分析"])
+
+# 未指定起始时间时默认统计的范围
+DEFAULT_SPANS = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+
+
+def _to_utc(value: datetime) -> datetime:
+    """带时区的时间换算为 UTC 后去掉时区，与库中的 naive UTC 时间比较；不带时区的视为 UTC"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def get_db():
+    """数据库会话依赖"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/activity", response_model=dict)
+async def get_activity(
+    granularity: Literal["hour", "day"] = Query("day"),
+    start: Optional[datetime] = Query(None, alias="from", description="起始时间 (UTC)，默认按粒度取最近 48 小时或 30 天"),
+    end: Optional[datetime] = Query(None, alias="to", description="结束时间 (UTC)，默认当前时间"),
+    db: Session = Depends(get_db)
+):
+    """
+    活跃度时间序列
+
+    返回 buckets（各时间桶起点，UTC）与 series：每类活动 (discussions / replies / comments / likes)
+    按所属讨论或项目的分类给出与 buckets 等长的计数数组，以及 total 合计
+    """
+    now = datetime.utcnow()
+    end = _to_utc(end) if end else now
+    start = _to_utc(start) if start else end - DEFAULT_SPANS[granularity]
+    if start > end:
+        raise HTTPException(status_code=400, detail="起始时间不能晚于结束时间")
+    step = GRANULARITIES[granularity][0]
+    if (end - start) / step >= settings.analytics_max_buckets:
+        raise HTTPException(status_code=400, detail=f"时间范围过大，最多 {settings.analytics_max_buckets} 个时间桶")
+
+    buckets, series = activity(db, granularity, start, end, now)
+    return {
+        "granularity": granularity,
+        "buckets": buckets,
+        "series": {
+            name: {
+                "total": [sum(values) for values in zip(*categories.values())] if categories else [0] * len(buckets),
+                "byCategory": categories,
+            }
+            for name, categories in series.items()
+        },
+    }
@@ -0,0 +1,89 @@
+"""
+增量同步 API 路由
+客户端携带上次的游标，只拉取此后新增、更新和删除的实体
+"""
+
+from collections import defaultdict
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from database import get_db
+from models import Project, Discussion, Reply, Comment, ChangeLog
+from schemas import (
+    ProjectResponse, DiscussionResponse, ReplyResponse, CommentResponse,
+    ChangeSet, DeletedSet, ChangeFeedResponse
+)
+from services.change_feed import latest_cursor
+
+router = APIRouter(prefix="/changes", tags=["增量同步"])
+
+# 实体类型 -> (ORM 模型, 响应模型, ChangeSet 字段名)
+ENTITIES = {
+    "project": (Project, ProjectResponse, "projects"),
+    "discussion": (Discussion, DiscussionResponse, "discussions"),
+    "reply": (Reply, ReplyResponse, "replies"),
+    "comment": (Comment, CommentResponse, "comments"),
+}
+
+
+@router.get("", response_model=ChangeFeedResponse)
+async def get_changes(
+    since: Optional[int] = Query(None, ge=0, description="上次返回的 cursor；省略时只返回当前游标"),
+    limit: int = Query(500, ge=1, le=2000),
+    db: Session = Depends(get_db)
+):
+    """
+    获取自 since 以来的变更
+
+    首次同步时先不带 since 取得当前游标，再通过列表接口拉取全量数据，之后用该游标增量同步。
+    created 与 updated 都应按 upsert 处理；删除项目或讨论时，其下的评论或回复不再单独产生墓碑。
+    hasMore 为 true 时应立即以新的 cursor 继续拉取。
+    """
+    if since is None:
+        return ChangeFeedResponse(
+            cursor=latest_cursor(db), hasMore=False,
+            created=ChangeSet(), updated=ChangeSet(), deleted=DeletedSet()
+        )
+
+    entries = (
+        db.query(ChangeLog)
+        .filter(ChangeLog.id > since)
+        .order_by(ChangeLog.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # 每种实体一次批量查询
+    wanted: dict[str, list[str]] = defaultdict(list)
+    deleted = DeletedSet()
+    for entry in entries:
+        if entry.op == "delete":
+            getattr(deleted, ENTITIES[entry.entity_type][2]).append(entry.entity_id)
+        else:
+            wanted[entry.entity_type].append(entry.entity_id)
+
+    loaded = {}
+    for entity_type, ids in wanted.items():
+        model = ENTITIES[entity_type][0]
+        for obj in db.query(model).filter(model.id.in_(ids)).all():
+            loaded[(entity_type, obj.id)] = obj
+
+    created, updated = ChangeSet(), ChangeSet()
+    for entry in entries:
+        obj = loaded.get((entry.entity_type, entry.entity_id))
+        if entry.op == "delete" or obj is None:
+            continue
+        _, response_model, field = ENTITIES[entry.entity_type]
+        target = created if entry.op == "create" else updated
+        getattr(target, field).append(response_model.from_orm_model(obj))
+
+    return ChangeFeedResponse(
+        cursor=entries[-1].id if entries else since,
+        hasMore=has_more,
+        created=created,
+        updated=updated,
+        deleted=deleted
+    )
@@ -2,29 +2,56 @@
 评论相关 API 路由
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import Project, Comment
 from schemas import CommentCreate, CommentResponse, MessageResponse
+from services.event_broker import broker
+from services.change_feed import record_change
+from services.ranking import bump_trending
+from services.write_queue import run_write
+from services.duplicates import check_duplicate, add_fingerprint, remove_fingerprints
+from services.cache_versions import VersionedCache
+from services.streaming import stream_json_array
 
 router = APIRouter(prefix="/projects/{project_id}/comments", tags=["评论"])
 
+# 按项目缓存评论列表，任一 worker 写入评论或项目后失效
+comments_cache = VersionedCache(("project", "comment"))
+
 
 @router.get("", response_model=list[CommentResponse])
-async def get_comments(project_id: str, db: Session = Depends(get_db)):
+async def get_comments(
+    project_id: str,
+    stream: bool = Query(False, description="以 JSON 数组流式返回，不经缓存，内存占用与评论数无关"),
+    db: Session = Depends(get_db)
+):
     """获取项目的所有评论"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    if stream:
+        project_pk = db.query(Project.pk).filter(Project.id == project_id).scalar()
+        if project_pk is None:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        return stream_json_array(
+            select(Comment).where(Comment.project_pk == project_pk).order_by(Comment.created_at.desc()),
+            CommentResponse.from_orm_model
+        )
     
-    if not project:
-        raise HTTPException(status_code=404, detail="项目不存在")
+    def load():
+        project = db.query(Project).filter(Project.id == project_id).first()
+        
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        
+        comments = db.query(Comment).filter(
+            Comment.project_pk == project.pk
+        ).order_by(Comment.created_at.desc()).all()
+        
+        return [CommentResponse.from_orm_model(c) for c in comments]
     
-    comments = db.query(Comment).filter(
-        Comment.project_id == project_id
-    ).order_by(Comment.created_at.desc()).all()
-    
-    return [CommentResponse.from_orm_model(c) for c in comments]
+    return comments_cache.get(project_id, load)
 
 
 @router.post("", response_model=CommentResponse)
@@ -34,27 +61,50 @@ async def create_comment(
     db: Session = Depends(get_db)
 ):
     """发表评论"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    def write(session: Session):
+        project = session.query(Project).filter(Project.id == project_id).first()
+        
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        
+        fingerprint, duplicate = check_duplicate(session, "comment", project_id, comment_data.content)
+        if duplicate:
+            if not duplicate.merge:
+                raise HTTPException(status_code=409, detail="内容与已有评论重复")
+            # 重复提交：返回已有评论，不再新增
+            existing = session.query(Comment).filter(Comment.id == duplicate.entity_id).first()
+            return CommentResponse.from_orm_model(existing), None
+        
+        comment = Comment(
+            project_pk=project.pk,
+            author_name=comment_data.author_name,
+            author_avatar=f"https://picsum.photos/seed/{comment_data.author_name}/100/100",
+            content=comment_data.content
+        )
+        
+        session.add(comment)
+        
+        # 更新项目的评论计数
+        project.comments_count += 1
+        
+        session.flush()
+        add_fingerprint(session, "comment", comment.id, project_id, fingerprint)
+        record_change(session, "comment", comment.id, "create")
+        record_change(session, "project", project_id, "update")
+        bump_trending(session, Project, project_id, "reply")
+        return CommentResponse.from_orm_model(comment), project.comments_count
     
-    if not project:
-        raise HTTPException(status_code=404, detail="项目不存在")
+    response, comments_count = await run_write(db, write)
+    if comments_count is None:
+        return response
     
-    comment = Comment(
-        project_id=project_id,
-        author_name=comment_data.author_name,
-        author_avatar=f"https://picsum.photos/seed/{comment_data.author_name}/100/100",
-        content=comment_data.content
+    broker.publish([f"project:{project_id}"], "comment.created", response.model_dump())
+    broker.publish(
+        ["projects", f"project:{project_id}"], "project.updated",
+        {"id": project_id, "commentsCount": comments_count}
     )
     
-    db.add(comment)
-    
-    # 更新项目的评论计数
-    project.comments_count += 1
-    
-    db.commit()
-    db.refresh(comment)
-    
-    return CommentResponse.from_orm_model(comment)
+    return response
 
 
 @router.delete("/{comment_id}", response_model=MessageResponse)
@@ -64,20 +114,31 @@ async def delete_comment(
     db: Session = Depends(get_db)
 ):
     """删除评论"""
-    comment = db.query(Comment).filter(
+    comment = db.query(Comment).join(Project, Project.pk == Comment.project_pk).filter(
         Comment.id == comment_id,
-        Comment.project_id == project_id
+        Project.id == project_id
     ).first()
     
     if not comment:
         raise HTTPException(status_code=404, detail="评论不存在")
     
     # 更新项目的评论计数
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = db.query(Project).filter(Project.pk == comment.project_pk).first()
     if project:
         project.comments_count = max(0, project.comments_count - 1)
     
     db.delete(comment)
+    remove_fingerprints(db, "comment", [comment_id])
+    record_change(db, "comment", comment_id, "delete")
+    if project:
+        record_change(db, "project", project_id, "update")
     db.commit()
     
+    broker.publish([f"project:{project_id}"], "comment.deleted", {"id": comment_id})
+    if project:
+        broker.publish(
+            ["projects", f"project:{project_id}"], "project.updated",
+            {"id": project_id, "commentsCount": project.comments_count}
+        )
+    
     return MessageResponse(message="评论已删除")
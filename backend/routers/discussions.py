@@ -3,22 +3,38 @@
 提供讨论帖子的增删改查功能
 """
 
+import base64
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, and_, exists, or_, func, select, update
 from typing import Optional
 
 from database import SessionLocal
 from models import Discussion, Reply
 from schemas import (
     DiscussionCreate, DiscussionResponse,
-    ReplyCreate, ReplyResponse,
-    MessageResponse
+    ReplyCreate, ReplyResponse, DiscussionThreadResponse, ThreadSummaryResponse,
+    LikeToggleRequest, MessageResponse
 )
+from services.like_service import set_like, liked_state
+from services.event_broker import broker
+from services.change_feed import record_change
+from services.ranking import bump_trending
+from services.viewer_stats import viewer_identity, viewer_sketches
+from services.write_queue import run_write
+from services.duplicates import check_duplicate, add_fingerprint
+from services.purge import soft_delete_discussion, purge_discussion
+from services.archive import archive_session, delete_archived_discussion
+from services.thread_summary import load_summary
+from services.cache_versions import VersionedCache
 
 router = APIRouter(prefix="/discussions", tags=["discussions"])
 
+# 讨论列表与统计缓存，任一 worker 写入讨论或回复后失效
+discussions_cache = VersionedCache(("discussion",))
+stats_cache = VersionedCache(("discussion", "reply"))
+
 
 def get_db():
     """获取数据库会话"""
@@ -29,90 +45,297 @@ def get_db():
         db.close()
 
 
+def record_view(discussion_id: str, viewer: str):
+    """
+    浏览量 +1 并累积独立访客草图，作为后台任务在响应发出后执行，不占用请求的关键路径
+    使用独立会话，且不改动 updated_at
+    """
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Discussion)
+            .where(Discussion.id == discussion_id)
+            .values(views_count=Discussion.views_count + 1, updated_at=Discussion.updated_at)
+        )
+        bump_trending(db, Discussion, discussion_id, "view")
+        viewer_sketches.record(db, Discussion, discussion_id, viewer)
+        db.commit()
+    finally:
+        db.close()
+
+
+def encode_reply_cursor(reply: Reply) -> str:
+    """将回复的 (created_at, id) 编码为翻页游标"""
+    raw = f"{reply.created_at.isoformat()}|{reply.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_reply_cursor(cursor: str) -> tuple[datetime, str]:
+    """解析翻页游标"""
+    try:
+        created_at, reply_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), reply_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="无效的游标")
+
+
+def fetch_reply_page(
+    db: Session,
+    discussion_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> tuple[list[Reply], Optional[str]]:
+    """
+    按 (created_at, id) 键集分页获取回复，返回 (本页回复, 下一页游标)
+    多取一条用于判断是否还有下一页，不需要额外的计数查询
+    """
+    discussion_pk = select(Discussion.pk).where(Discussion.id == discussion_id).scalar_subquery()
+    query = db.query(Reply).filter(Reply.discussion_pk == discussion_pk)
+    if cursor:
+        created_at, reply_id = decode_reply_cursor(cursor)
+        query = query.filter(or_(
+            Reply.created_at > created_at,
+            and_(Reply.created_at == created_at, Reply.id > reply_id)
+        ))
+
+    replies = query.order_by(asc(Reply.created_at), asc(Reply.id)).limit(limit + 1).all()
+    if len(replies) > limit:
+        return replies[:limit], encode_reply_cursor(replies[limit - 1])
+    return replies, None
+
+
 # ==================== 讨论帖子 API ====================
 
 @router.get("", response_model=list[DiscussionResponse])
 async def get_discussions(
     category: Optional[str] = Query(None, description="分类筛选"),
-    sort: str = Query("latest", description="排序方式: latest, popular, active"),
+    sort: str = Query("latest", description="排序方式: latest, popular, active, trending"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
     """获取讨论列表"""
-    query = db.query(Discussion)
+    def load():
+        query = db.query(Discussion).filter(Discussion.deleted_at.is_(None))
+        
+        # 分类筛选
+        if category:
+            query = query.filter(Discussion.category == category)
+        
+        # 排序
+        if sort == "popular":
+            query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.likes_count))
+        elif sort == "active":
+            query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.last_reply_at))
+        elif sort == "trending":
+            query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.trending_score).nulls_last())
+        else:  # latest
+            query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.created_at))
+        
+        discussions = query.offset(offset).limit(limit).all()
+        return [DiscussionResponse.from_orm_model(d) for d in discussions]
     
-    # 分类筛选
-    if category:
-        query = query.filter(Discussion.category == category)
+    return discussions_cache.get((category, sort, limit, offset), load)
+
+
+@router.get("/{discussion_id}", response_model=DiscussionResponse)
+async def get_discussion(
+    discussion_id: str,
+    background_tasks: BackgroundTasks,
+    viewer: str = Depends(viewer_identity),
+    db: Session = Depends(get_db)
+):
+    """获取单个讨论详情，热库未命中时回落到归档库（归档讨论不再计浏览量）"""
+    discussion = db.query(Discussion).filter(
+        Discussion.id == discussion_id,
+        Discussion.deleted_at.is_(None)
+    ).first()
+    if not discussion:
+        with archive_session() as cold:
+            discussion = cold.query(Discussion).filter(Discussion.id == discussion_id).first()
+        if not discussion:
+            raise HTTPException(status_code=404, detail="讨论不存在")
+        return DiscussionResponse.from_orm_model(discussion)
     
-    # 排序
-    if sort == "popular":
-        query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.likes_count))
-    elif sort == "active":
-        query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.last_reply_at))
-    else:  # latest
-        query = query.order_by(desc(Discussion.is_pinned), desc(Discussion.created_at))
+    # 增加浏览量（响应后异步写入，返回值中预先计入本次浏览）
+    background_tasks.add_task(record_view, discussion_id, viewer)
+    response = DiscussionResponse.from_orm_model(discussion)
+    response.viewsCount += 1
     
-    discussions = query.offset(offset).limit(limit).all()
-    return [DiscussionResponse.from_orm_model(d) for d in discussions]
+    return response
 
 
-@router.get("/{discussion_id}", response_model=DiscussionResponse)
-async def get_discussion(discussion_id: str, db: Session = Depends(get_db)):
-    """获取单个讨论详情"""
-    discussion = db.query(Discussion).filter(Discussion.id == discussion_id).first()
+@router.get("/{discussion_id}/thread", response_model=DiscussionThreadResponse)
+async def get_discussion_thread(
+    discussion_id: str,
+    background_tasks: BackgroundTasks,
+    limit: int = Query(50, ge=1, le=200),
+    x_user_identifier: str = Header(default="anonymous", alias="X-User-Identifier"),
+    viewer: str = Depends(viewer_identity),
+    db: Session = Depends(get_db)
+):
+    """
+    讨论详情页复合接口
+    一次返回讨论、首页回复及游标、回复总数和当前用户的点赞状态，
+    固定至多三次查询：讨论、回复页、点赞状态 (UNION ALL)；浏览量在响应后写入
+    热库未命中时整体回落到归档库
+    """
+    discussion = db.query(Discussion).filter(
+        Discussion.id == discussion_id,
+        Discussion.deleted_at.is_(None)
+    ).first()
     if not discussion:
-        raise HTTPException(status_code=404, detail="讨论不存在")
+        with archive_session() as cold:
+            discussion = cold.query(Discussion).filter(Discussion.id == discussion_id).first()
+            if not discussion:
+                raise HTTPException(status_code=404, detail="讨论不存在")
+            return build_thread_response(cold, discussion, limit, x_user_identifier, archived=True)
     
-    # 增加浏览量
-    discussion.views_count += 1
-    db.commit()
-    db.refresh(discussion)
+    background_tasks.add_task(record_view, discussion_id, viewer)
+    response = build_thread_response(db, discussion, limit, x_user_identifier)
+    response.discussion.viewsCount += 1
+    return response
+
+
+@router.get("/{discussion_id}/summary", response_model=ThreadSummaryResponse)
+async def get_thread_summary(discussion_id: str, db: Session = Depends(get_db)):
+    """
+    获取已存储的讨论摘要，不调用模型；pendingReplies 为尚未纳入摘要的回复数，
+    需要时调用 POST /api/ai/discussions/{id}/summary 增量刷新
+    """
+    discussion = db.query(Discussion).filter(
+        Discussion.id == discussion_id,
+        Discussion.deleted_at.is_(None)
+    ).first()
+    if not discussion:
+        with archive_session() as cold:
+            discussion = cold.query(Discussion).filter(Discussion.id == discussion_id).first()
+            if not discussion:
+                raise HTTPException(status_code=404, detail="讨论不存在")
+            return ThreadSummaryResponse.from_orm_model(discussion, load_summary(cold, discussion_id))
     
-    return DiscussionResponse.from_orm_model(discussion)
+    return ThreadSummaryResponse.from_orm_model(discussion, load_summary(db, discussion_id))
+
+
+def build_thread_response(
+    db: Session,
+    discussion: Discussion,
+    limit: int,
+    user_identifier: str,
+    archived: bool = False
+) -> DiscussionThreadResponse:
+    """组装讨论详情页响应，db 为讨论所在的库（热库或归档库）"""
+    replies, next_cursor = fetch_reply_page(db, discussion.id, limit)
+    liked = liked_state(
+        db,
+        {"discussion": [discussion.id], "reply": [r.id for r in replies]},
+        user_identifier,
+        use_filter=not archived
+    )
+    
+    return DiscussionThreadResponse(
+        discussion=DiscussionResponse.from_orm_model(discussion),
+        replies=[ReplyResponse.from_orm_model(r) for r in replies],
+        nextCursor=next_cursor,
+        repliesCount=discussion.replies_count,
+        isLiked=discussion.id in liked["discussion"],
+        likedReplyIds=[r.id for r in replies if r.id in liked["reply"]]
+    )
 
 
 @router.post("", response_model=DiscussionResponse)
 async def create_discussion(data: DiscussionCreate, db: Session = Depends(get_db)):
     """创建新讨论"""
-    discussion = Discussion(
-        title=data.title,
-        content=data.content,
-        category=data.category,
-        author_name=data.author_name,
-        author_avatar=f"https://api.dicebear.com/7.x/avataaars/svg?seed={data.author_name}"
-    )
-    db.add(discussion)
-    db.commit()
-    db.refresh(discussion)
+    def write(session: Session):
+        fingerprint, duplicate = check_duplicate(session, "discussion", None, f"{data.title}\n{data.content}")
+        if duplicate:
+            if not duplicate.merge:
+                raise HTTPException(status_code=409, detail="内容与已有讨论重复")
+            # 重复提交：返回已有讨论，不再新增
+            existing = session.query(Discussion).filter(Discussion.id == duplicate.entity_id).first()
+            return DiscussionResponse.from_orm_model(existing), False
+        
+        discussion = Discussion(
+            title=data.title,
+            content=data.content,
+            category=data.category,
+            author_name=data.author_name,
+            author_avatar=f"https://api.dicebear.com/7.x/avataaars/svg?seed={data.author_name}"
+        )
+        session.add(discussion)
+        session.flush()
+        add_fingerprint(session, "discussion", discussion.id, None, fingerprint)
+        record_change(session, "discussion", discussion.id, "create")
+        bump_trending(session, Discussion, discussion.id, "create")
+        return DiscussionResponse.from_orm_model(discussion), True
     
-    return DiscussionResponse.from_orm_model(discussion)
+    response, created = await run_write(db, write)
+    if created:
+        broker.publish(["discussions"], "discussion.created", response.model_dump())
+    
+    return response
 
 
 @router.post("/{discussion_id}/like", response_model=dict)
-async def like_discussion(discussion_id: str, db: Session = Depends(get_db)):
-    """点赞讨论"""
-    discussion = db.query(Discussion).filter(Discussion.id == discussion_id).first()
-    if not discussion:
-        raise HTTPException(status_code=404, detail="讨论不存在")
+async def like_discussion(
+    discussion_id: str,
+    request: Optional[LikeToggleRequest] = None,
+    x_user_identifier: str = Header(default="anonymous", alias="X-User-Identifier"),
+    db: Session = Depends(get_db)
+):
+    """点赞讨论，每个用户只计一次；请求体 isLiking=false 时取消点赞"""
+    is_liking = request.is_liking if request else True
     
-    discussion.likes_count += 1
-    db.commit()
+    def write(session: Session):
+        result = set_like(
+            session, "discussion", discussion_id, x_user_identifier, is_liking,
+            Discussion.deleted_at.is_(None)
+        )
+        if result is None:
+            raise HTTPException(status_code=404, detail="讨论不存在")
+        
+        likes_count, is_liked, changed = result
+        if changed:
+            # 重复点赞或取消未点赞的对象不写变更日志，列表缓存也不因此失效
+            if is_liked:
+                bump_trending(session, Discussion, discussion_id, "like")
+            record_change(session, "discussion", discussion_id, "update")
+        return likes_count, is_liked, changed
     
-    return {"likesCount": discussion.likes_count}
+    likes_count, is_liked, changed = await run_write(db, write)
+    
+    if changed:
+        broker.publish(
+            ["discussions", f"discussion:{discussion_id}"], "discussion.updated",
+            {"id": discussion_id, "likesCount": likes_count}
+        )
+    return {"likesCount": likes_count, "isLiked": is_liked}
 
 
 @router.delete("/{discussion_id}", response_model=MessageResponse)
-async def delete_discussion(discussion_id: str, db: Session = Depends(get_db)):
-    """删除讨论"""
-    discussion = db.query(Discussion).filter(Discussion.id == discussion_id).first()
-    if not discussion:
+async def delete_discussion(
+    discussion_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    删除讨论
+    先软删除并立即返回，回复及点赞记录在响应后由后台分批清理；
+    已归档的讨论在归档库中直接删除
+    """
+    if soft_delete_discussion(db, discussion_id):
+        background_tasks.add_task(purge_discussion, discussion_id)
+    elif db.query(Discussion.id).filter(Discussion.id == discussion_id).first() is not None:
+        # 已软删除、等待清理
+        raise HTTPException(status_code=404, detail="讨论不存在")
+    elif not delete_archived_discussion(discussion_id):
         raise HTTPException(status_code=404, detail="讨论不存在")
     
-    db.delete(discussion)
+    record_change(db, "discussion", discussion_id, "delete")
     db.commit()
     
+    broker.publish(["discussions", f"discussion:{discussion_id}"], "discussion.deleted", {"id": discussion_id})
+    
     return MessageResponse(message="讨论已删除", success=True)
 
 
@@ -121,19 +344,40 @@ async def delete_discussion(discussion_id: str, db: Session = Depends(get_db)):
 @router.get("/{discussion_id}/replies", response_model=list[ReplyResponse])
 async def get_replies(
     discussion_id: str,
+    response: Response,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="上一页返回的 X-Next-Cursor，优先于 offset"),
     db: Session = Depends(get_db)
 ):
-    """获取讨论的所有回复"""
-    replies = (
-        db.query(Reply)
-        .filter(Reply.discussion_id == discussion_id)
-        .order_by(asc(Reply.created_at))
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    """
+    获取讨论的所有回复，未使用 offset 时通过 X-Next-Cursor 响应头返回下一页游标
+    讨论已删除时返回 404，讨论已不在热库时从归档库读取
+    """
+    def load(session: Session) -> list[Reply]:
+        if cursor or offset == 0:
+            replies, next_cursor = fetch_reply_page(session, discussion_id, limit, cursor)
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            return replies
+        return (
+            session.query(Reply)
+            .join(Discussion, Discussion.pk == Reply.discussion_pk)
+            .filter(Discussion.id == discussion_id)
+            .order_by(asc(Reply.created_at), asc(Reply.id))
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+    
+    hot = db.query(Discussion.deleted_at).filter(Discussion.id == discussion_id).first()
+    if hot is None:
+        with archive_session() as cold:
+            replies = load(cold)
+    elif hot.deleted_at is not None:
+        raise HTTPException(status_code=404, detail="讨论不存在")
+    else:
+        replies = load(db)
     return [ReplyResponse.from_orm_model(r) for r in replies]
 
 
@@ -144,47 +388,110 @@ async def create_reply(
     db: Session = Depends(get_db)
 ):
     """创建回复"""
-    # 检查讨论是否存在
-    discussion = db.query(Discussion).filter(Discussion.id == discussion_id).first()
-    if not discussion:
-        raise HTTPException(status_code=404, detail="讨论不存在")
+    def write(session: Session):
+        # 检查讨论是否存在
+        discussion = session.query(Discussion).filter(
+            Discussion.id == discussion_id,
+            Discussion.deleted_at.is_(None)
+        ).first()
+        if not discussion:
+            with archive_session() as cold:
+                if cold.query(Discussion.id).filter(Discussion.id == discussion_id).first():
+                    raise HTTPException(status_code=400, detail="该讨论已归档，无法回复")
+            raise HTTPException(status_code=404, detail="讨论不存在")
+        
+        if discussion.is_closed:
+            raise HTTPException(status_code=400, detail="该讨论已关闭，无法回复")
+        
+        fingerprint, duplicate = check_duplicate(session, "reply", discussion_id, data.content)
+        if duplicate:
+            if not duplicate.merge:
+                raise HTTPException(status_code=409, detail="内容与已有回复重复")
+            # 重复提交：返回已有回复，不再新增
+            existing = session.query(Reply).filter(Reply.id == duplicate.entity_id).first()
+            return ReplyResponse.from_orm_model(existing), None, None
+        
+        reply_to_pk = None
+        if data.reply_to_id:
+            reply_to_pk = session.query(Reply.pk).filter(
+                Reply.id == data.reply_to_id,
+                Reply.discussion_pk == discussion.pk
+            ).scalar()
+            if reply_to_pk is None:
+                raise HTTPException(status_code=400, detail="引用的回复不存在")
+        
+        reply = Reply(
+            discussion_pk=discussion.pk,
+            content=data.content,
+            author_name=data.author_name,
+            author_avatar=f"https://api.dicebear.com/7.x/avataaars/svg?seed={data.author_name}",
+            reply_to_pk=reply_to_pk
+        )
+        session.add(reply)
+        
+        # 更新讨论的回复计数和最后回复时间
+        discussion.replies_count += 1
+        discussion.last_reply_at = datetime.utcnow()
+        
+        session.flush()
+        add_fingerprint(session, "reply", reply.id, discussion_id, fingerprint)
+        record_change(session, "reply", reply.id, "create")
+        record_change(session, "discussion", discussion_id, "update")
+        bump_trending(session, Discussion, discussion_id, "reply")
+        return ReplyResponse.from_orm_model(reply), discussion.replies_count, discussion.last_reply_at
     
-    if discussion.is_closed:
-        raise HTTPException(status_code=400, detail="该讨论已关闭，无法回复")
+    response, replies_count, last_reply_at = await run_write(db, write)
+    if replies_count is None:
+        return response
     
-    reply = Reply(
-        discussion_id=discussion_id,
-        content=data.content,
-        author_name=data.author_name,
-        author_avatar=f"https://api.dicebear.com/7.x/avataaars/svg?seed={data.author_name}",
-        reply_to_id=data.reply_to_id
+    broker.publish([f"discussion:{discussion_id}"], "reply.created", response.model_dump())
+    broker.publish(
+        ["discussions", f"discussion:{discussion_id}"], "discussion.updated",
+        {
+            "id": discussion_id,
+            "repliesCount": replies_count,
+            "lastReplyAt": last_reply_at.isoformat()
+        }
     )
-    db.add(reply)
-    
-    # 更新讨论的回复计数和最后回复时间
-    discussion.replies_count += 1
-    discussion.last_reply_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(reply)
-    
-    return ReplyResponse.from_orm_model(reply)
+    return response
 
 
 @router.post("/{discussion_id}/replies/{reply_id}/like", response_model=dict)
-async def like_reply(discussion_id: str, reply_id: str, db: Session = Depends(get_db)):
-    """点赞回复"""
-    reply = db.query(Reply).filter(
-        Reply.id == reply_id,
-        Reply.discussion_id == discussion_id
-    ).first()
-    if not reply:
-        raise HTTPException(status_code=404, detail="回复不存在")
+async def like_reply(
+    discussion_id: str,
+    reply_id: str,
+    request: Optional[LikeToggleRequest] = None,
+    x_user_identifier: str = Header(default="anonymous", alias="X-User-Identifier"),
+    db: Session = Depends(get_db)
+):
+    """点赞回复，每个用户只计一次；请求体 isLiking=false 时取消点赞"""
+    is_liking = request.is_liking if request else True
     
-    reply.likes_count += 1
-    db.commit()
+    def write(session: Session):
+        result = set_like(
+            session, "reply", reply_id, x_user_identifier, is_liking,
+            exists().where(
+                Discussion.pk == Reply.discussion_pk,
+                Discussion.id == discussion_id,
+                Discussion.deleted_at.is_(None)
+            )
+        )
+        if result is None:
+            raise HTTPException(status_code=404, detail="回复不存在")
+        
+        likes_count, is_liked, changed = result
+        if changed:
+            record_change(session, "reply", reply_id, "update")
+        return likes_count, is_liked, changed
     
-    return {"likesCount": reply.likes_count}
+    likes_count, is_liked, changed = await run_write(db, write)
+    if changed:
+        broker.publish(
+            [f"discussion:{discussion_id}"], "reply.updated",
+            {"id": reply_id, "likesCount": likes_count}
+        )
+    return {"likesCount": likes_count, "isLiked": is_liked}
 
 
 # ==================== 统计 API ====================
@@ -192,17 +499,21 @@ async def like_reply(discussion_id: str, reply_id: str, db: Session = Depends(ge
 @router.get("/stats/overview", response_model=dict)
 async def get_discussion_stats(db: Session = Depends(get_db)):
     """获取讨论区统计信息"""
-    total_discussions = db.query(Discussion).count()
-    total_replies = db.query(Reply).count()
-    
-    # 获取各分类数量
-    categories = {}
-    for cat in ["general", "tech", "idea", "help"]:
-        count = db.query(Discussion).filter(Discussion.category == cat).count()
-        categories[cat] = count
-    
-    return {
-        "totalDiscussions": total_discussions,
-        "totalReplies": total_replies,
-        "categories": categories
-    }
+    def load():
+        live = Discussion.deleted_at.is_(None)
+        total_discussions = db.query(Discussion).filter(live).count()
+        total_replies = db.query(Reply).join(Discussion).filter(live).count()
+        
+        # 各分类数量，一次分组查询
+        categories = {cat: 0 for cat in ["general", "tech", "idea", "help"]}
+        categories.update(
+            db.query(Discussion.category, func.count()).filter(live).group_by(Discussion.category).all()
+        )
+        
+        return {
+            "totalDiscussions": total_discussions,
+            "totalReplies": total_replies,
+            "categories": categories
+        }
+    
+    return stats_cache.get("overview", load)
@@ -0,0 +1,64 @@
+"""
+实时推送 API 路由
+通过 Server-Sent Events 推送讨论、回复、评论与点赞的增量事件，替代轮询
+"""
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from config import get_settings
+from services.event_broker import broker, is_valid_topic, Subscriber
+
+settings = get_settings()
+
+router = APIRouter(prefix="/events", tags=["实时推送"])
+
+
+async def _event_stream(request: Request, subscriber: Subscriber):
+    """持续输出订阅者队列中的事件，空闲时发送心跳注释以保持连接"""
+    try:
+        yield f"retry: 3000\n: subscribed {','.join(sorted(subscriber.topics))}\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=settings.events_keepalive_seconds
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                frame = ": ping\n\n"
+            yield frame
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@router.get("")
+async def subscribe_events(
+    request: Request,
+    topics: str = Query(..., description="逗号分隔的主题，如 discussions,discussion:{id},project:{id}")
+):
+    """
+    订阅实时事件 (text/event-stream)
+
+    事件类型: discussion.created, discussion.updated, discussion.deleted,
+    reply.created, reply.updated, comment.created, comment.deleted, project.updated；
+    收到 resync 时客户端应重新拉取完整数据
+    """
+    topic_list = list(dict.fromkeys(t.strip() for t in topics.split(",") if t.strip()))
+    if not topic_list or len(topic_list) > settings.events_max_topics:
+        raise HTTPException(status_code=400, detail=f"需要订阅 1~{settings.events_max_topics} 个主题")
+    invalid = [t for t in topic_list if not is_valid_topic(t)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"无效的主题: {', '.join(invalid)}")
+
+    subscriber = broker.subscribe(topic_list)
+    return StreamingResponse(
+        _event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 关闭 Nginx 代理缓冲，保证事件及时送达
+        }
+    )
@@ -0,0 +1,54 @@
+"""
+AI 任务 API 路由
+提交任务后立即返回任务 id，结果通过轮询 GET /api/jobs/{id} 或订阅 SSE 主题 job:{id} 获取
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Job
+from schemas import JobSubmitRequest, JobResponse
+from services.job_queue import JOB_HANDLERS, submit_job, job_queue
+from services.write_queue import run_write
+
+router = APIRouter(prefix="/jobs", tags=["AI 任务"])
+
+
+def get_db():
+    """数据库会话依赖"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("", response_model=JobResponse)
+async def create_job(request: JobSubmitRequest, db: Session = Depends(get_db)):
+    """
+    提交 AI 任务
+
+    任务类型: project_insight (payload: title, backgroundStory, shortDescription),
+    thread_summary (payload: discussionId)；相同任务正在排队、执行或刚完成时返回已有任务
+    """
+    if request.kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"不支持的任务类型: {request.kind}")
+
+    def write(session: Session):
+        job, created = submit_job(session, request.kind, request.payload, request.priority, request.key)
+        return JobResponse.from_orm_model(job, deduplicated=not created), created
+
+    response, created = await run_write(db, write)
+    if created:
+        job_queue.notify()
+    return response
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, db: Session = Depends(get_db)):
+    """查询任务状态与结果"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return JobResponse.from_orm_model(job)
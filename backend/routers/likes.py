@@ -0,0 +1,40 @@
+"""
+点赞状态 API 路由
+为列表与网格视图一次性返回多条内容的点赞状态
+"""
+
+from fastapi import APIRouter, Depends, Header
+from sqlalchemy.orm import Session
+
+from database import get_db
+from schemas import LikeStateRequest, LikeStateResponse
+from services.like_service import liked_state
+
+router = APIRouter(prefix="/likes", tags=["点赞"])
+
+
+@router.post("/state", response_model=LikeStateResponse)
+async def get_like_state(
+    request: LikeStateRequest,
+    x_user_identifier: str = Header(default="anonymous", alias="X-User-Identifier"),
+    db: Session = Depends(get_db)
+):
+    """
+    批量查询当前用户对项目、讨论、回复的点赞状态
+    所有类型合并为一次数据库查询，替代逐条请求
+    """
+    liked = liked_state(
+        db,
+        {
+            "project": request.project_ids,
+            "discussion": request.discussion_ids,
+            "reply": request.reply_ids,
+        },
+        x_user_identifier
+    )
+
+    return LikeStateResponse(
+        projects={pid: pid in liked["project"] for pid in request.project_ids},
+        discussions={did: did in liked["discussion"] for did in request.discussion_ids},
+        replies={rid: rid in liked["reply"] for rid in request.reply_ids}
+    )
@@ -0,0 +1,53 @@
+"""
+性能剖析结果 API 路由
+供受信任客户端下载已落盘的折叠栈文件
+"""
+
+import os
+
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import FileResponse
+from typing import Optional
+
+from config import get_settings
+from services.profiler import PROFILE_SUFFIX, is_trusted, resolve_profile_path
+
+settings = get_settings()
+
+router = APIRouter(prefix="/profiling", tags=["性能剖析"])
+
+
+def _require_token(token: Optional[str]):
+    """剖析接口仅对持有令牌的受信任客户端开放"""
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="剖析功能未启用")
+    if not is_trusted(token):
+        raise HTTPException(status_code=403, detail="无权访问剖析结果")
+
+
+@router.get("/profiles", response_model=list[str])
+async def list_profiles(
+    x_profile_token: Optional[str] = Header(default=None, alias="X-Profile-Token")
+):
+    """列出已保存的剖析文件，最新的在前"""
+    _require_token(x_profile_token)
+
+    if not os.path.isdir(settings.profiling_output_dir):
+        return []
+    names = [n for n in os.listdir(settings.profiling_output_dir) if n.endswith(PROFILE_SUFFIX)]
+    return sorted(names, reverse=True)
+
+
+@router.get("/profiles/{name}")
+async def download_profile(
+    name: str,
+    x_profile_token: Optional[str] = Header(default=None, alias="X-Profile-Token")
+):
+    """下载单个剖析文件 (折叠栈格式)"""
+    _require_token(x_profile_token)
+
+    path = resolve_profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="剖析文件不存在")
+
+    return FileResponse(path, media_type="text/plain", filename=name)
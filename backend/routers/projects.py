@@ -2,49 +2,138 @@
 项目相关 API 路由
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session, defer
 from typing import Optional
 
-from database import get_db
-from models import Project, Like
+from config import get_settings
+from database import get_db, SessionLocal
+from models import Project, ProjectNeighbor
 from schemas import (
     ProjectCreate, ProjectUpdate, ProjectResponse,
     LikeToggleRequest, LikeResponse, MessageResponse
 )
+from services.like_service import set_like
+from services.event_broker import broker
+from services.change_feed import record_change
+from services.ranking import bump_trending
+from services.viewer_stats import viewer_identity, viewer_sketches
+from services.write_queue import run_write
+from services.purge import delete_project_tree
+from services.cache_versions import VersionedCache
+from services.streaming import stream_json_array
+
+settings = get_settings()
 
 router = APIRouter(prefix="/projects", tags=["项目"])
 
+# 批量获取时单次允许的最大 id 数
+MAX_BATCH_IDS = 200
+
+# 参与相关项目计算的字段
+RELATED_FIELDS = {"title", "full_description", "tags"}
+
+# 项目列表缓存，任一 worker 写入项目后失效
+projects_cache = VersionedCache(("project",))
+
 
 @router.get("", response_model=list[ProjectResponse])
 async def get_all_projects(
     category: Optional[str] = None,
+    ids: Optional[str] = Query(None, description="逗号分隔的项目 id，批量获取指定项目"),
+    sort: str = Query("latest", description="排序方式: latest, trending"),
+    stream: bool = Query(False, description="以 JSON 数组流式返回，不经缓存，内存占用与项目数无关"),
     db: Session = Depends(get_db)
 ):
-    """获取所有项目列表，支持按分类筛选"""
+    """获取所有项目列表，支持按分类筛选、按热度排序，或通过 ids 批量获取"""
     query = db.query(Project)
     
+    if ids is not None:
+        id_list = list(dict.fromkeys(i for i in ids.split(",") if i))
+        if len(id_list) > MAX_BATCH_IDS:
+            raise HTTPException(status_code=400, detail=f"一次最多获取 {MAX_BATCH_IDS} 个项目")
+        # 按请求中的顺序返回，不存在的 id 直接忽略
+        found = {p.id: p for p in query.filter(Project.id.in_(id_list)).all()}
+        return [ProjectResponse.from_orm_model(found[i]) for i in id_list if i in found]
+    
+    stmt = select(Project)
     if category and category != "All":
-        query = query.filter(Project.category == category)
+        stmt = stmt.where(Project.category == category)
+    
+    if sort == "trending":
+        stmt = stmt.order_by(Project.trending_score.desc().nulls_last())
+    else:
+        stmt = stmt.order_by(Project.created_at.desc())
+    
+    if stream:
+        # 列表响应用不到访客草图，不读取
+        return stream_json_array(stmt.options(defer(Project.viewers_sketch)), ProjectResponse.from_orm_model)
     
-    projects = query.order_by(Project.created_at.desc()).all()
-    return [ProjectResponse.from_orm_model(p) for p in projects]
+    def load():
+        return [ProjectResponse.from_orm_model(p) for p in db.execute(stmt).scalars()]
+    
+    return projects_cache.get((category, sort), load)
+
+
+def refresh_related(project_id: str):
+    """后台更新相关项目；首次调用时才导入 NumPy"""
+    from services.related import refresh_project_related
+    refresh_project_related(project_id)
+
+
+def record_project_view(project_id: str, viewer: str):
+    """项目浏览计入热度与独立访客草图，作为后台任务在响应发出后执行"""
+    db = SessionLocal()
+    try:
+        bump_trending(db, Project, project_id, "view")
+        viewer_sketches.record(db, Project, project_id, viewer)
+        db.commit()
+    finally:
+        db.close()
 
 
 @router.get("/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: str, db: Session = Depends(get_db)):
+async def get_project(
+    project_id: str,
+    background_tasks: BackgroundTasks,
+    viewer: str = Depends(viewer_identity),
+    db: Session = Depends(get_db)
+):
     """获取单个项目详情"""
     project = db.query(Project).filter(Project.id == project_id).first()
     
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
+    background_tasks.add_task(record_project_view, project_id, viewer)
     return ProjectResponse.from_orm_model(project)
 
 
+@router.get("/{project_id}/related", response_model=list[ProjectResponse])
+async def get_related_projects(
+    project_id: str,
+    limit: Optional[int] = Query(None, ge=1, description="默认返回全部预计算的相关项目"),
+    db: Session = Depends(get_db)
+):
+    """获取相关项目，直接读取预先计算的 top-k 列表"""
+    related = (
+        db.query(Project)
+        .join(ProjectNeighbor, ProjectNeighbor.neighbor_pk == Project.pk)
+        .filter(ProjectNeighbor.project_pk == select(Project.pk).where(Project.id == project_id).scalar_subquery())
+        .order_by(ProjectNeighbor.rank)
+        .limit(limit or settings.related_top_k)
+        .all()
+    )
+    if not related and not db.query(Project.id).filter(Project.id == project_id).first():
+        raise HTTPException(status_code=404, detail="项目不存在")
+    return [ProjectResponse.from_orm_model(p) for p in related]
+
+
 @router.post("", response_model=ProjectResponse)
 async def create_project(
     project_data: ProjectCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """创建新项目"""
@@ -62,9 +151,13 @@ async def create_project(
     )
     
     db.add(project)
+    db.flush()
+    record_change(db, "project", project.id, "create")
+    bump_trending(db, Project, project.id, "create")
     db.commit()
     db.refresh(project)
     
+    background_tasks.add_task(refresh_related, project.id)
     return ProjectResponse.from_orm_model(project)
 
 
@@ -72,6 +165,7 @@ async def create_project(
 async def update_project(
     project_id: str,
     project_data: ProjectUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """更新项目信息"""
@@ -86,21 +180,24 @@ async def update_project(
         if value is not None:
             setattr(project, field, value)
     
+    record_change(db, "project", project_id, "update")
     db.commit()
     db.refresh(project)
     
+    # 影响相似度的字段变化时在后台更新相关项目
+    if RELATED_FIELDS & update_data.keys():
+        background_tasks.add_task(refresh_related, project_id)
     return ProjectResponse.from_orm_model(project)
 
 
 @router.delete("/{project_id}", response_model=MessageResponse)
 async def delete_project(project_id: str, db: Session = Depends(get_db)):
-    """删除项目"""
-    project = db.query(Project).filter(Project.id == project_id).first()
-    
-    if not project:
+    """删除项目，评论与点赞以集合式 DELETE 一并删除，不逐条加载"""
+    if not delete_project_tree(db, project_id):
+        db.rollback()
         raise HTTPException(status_code=404, detail="项目不存在")
     
-    db.delete(project)
+    record_change(db, "project", project_id, "delete")
     db.commit()
     
     return MessageResponse(message="项目已删除")
@@ -116,32 +213,26 @@ async def toggle_like(
     """
     切换点赞状态
     使用 X-User-Identifier 头部来标识用户（可以是 session ID、IP 等）
+    点赞记录由唯一约束去重，无需先查询是否已点赞
     """
-    project = db.query(Project).filter(Project.id == project_id).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="项目不存在")
-    
-    # 检查是否已点赞
-    existing_like = db.query(Like).filter(
-        Like.project_id == project_id,
-        Like.user_identifier == x_user_identifier
-    ).first()
-    
-    if request.is_liking:
-        # 点赞
-        if not existing_like:
-            new_like = Like(project_id=project_id, user_identifier=x_user_identifier)
-            db.add(new_like)
-            project.likes_count += 1
-            db.commit()
-        is_liked = True
-    else:
-        # 取消点赞
-        if existing_like:
-            db.delete(existing_like)
-            project.likes_count = max(0, project.likes_count - 1)
-            db.commit()
-        is_liked = False
-    
-    return LikeResponse(newLikesCount=project.likes_count, isLiked=is_liked)
+    def write(session: Session):
+        result = set_like(session, "project", project_id, x_user_identifier, request.is_liking)
+        if result is None:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        
+        likes_count, is_liked, changed = result
+        if changed:
+            # 重复点赞或取消未点赞的项目不写变更日志，列表缓存也不因此失效
+            if is_liked:
+                bump_trending(session, Project, project_id, "like")
+            record_change(session, "project", project_id, "update")
+        return likes_count, is_liked, changed
+    
+    likes_count, is_liked, changed = await run_write(db, write)
+    
+    if changed:
+        broker.publish(
+            ["projects", f"project:{project_id}"], "project.updated",
+            {"id": project_id, "likesCount": likes_count}
+        )
+    return LikeResponse(newLikesCount=likes_count, isLiked=is_liked)
@@ -5,7 +5,7 @@ Pydantic 请求/响应模型
 
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Literal, Optional
 
 
 # ==================== 项目相关 ====================
@@ -58,6 +58,7 @@ class ProjectResponse(BaseModel):
     tags: list[str]
     likesCount: int
     commentsCount: int
+    uniqueViewersCount: int = 0
     createdAt: str
     updatedAt: str
     
@@ -81,6 +82,7 @@ class ProjectResponse(BaseModel):
             tags=project.tags or [],
             likesCount=project.likes_count,
             commentsCount=project.comments_count,
+            uniqueViewersCount=project.unique_viewers or 0,
             createdAt=project.created_at.isoformat() if project.created_at else "",
             updatedAt=project.updated_at.isoformat() if project.updated_at else ""
         )
@@ -132,6 +134,20 @@ class LikeResponse(BaseModel):
     isLiked: bool
 
 
+class LikeStateRequest(BaseModel):
+    """批量点赞状态查询请求体"""
+    project_ids: list[str] = Field(default=[], alias="projectIds", max_length=500)
+    discussion_ids: list[str] = Field(default=[], alias="discussionIds", max_length=500)
+    reply_ids: list[str] = Field(default=[], alias="replyIds", max_length=500)
+
+
+class LikeStateResponse(BaseModel):
+    """批量点赞状态响应体 - id 到是否已点赞的映射"""
+    projects: dict[str, bool]
+    discussions: dict[str, bool]
+    replies: dict[str, bool]
+
+
 # ==================== AI 相关 ====================
 
 class AIInsightRequest(BaseModel):
@@ -173,6 +189,7 @@ class DiscussionResponse(BaseModel):
     authorName: str
     authorAvatar: str
     viewsCount: int
+    uniqueViewersCount: int = 0
     likesCount: int
     repliesCount: int
     isPinned: bool
@@ -195,6 +212,7 @@ class DiscussionResponse(BaseModel):
             authorName=discussion.author_name,
             authorAvatar=discussion.author_avatar or f"https://api.dicebear.com/7.x/avataaars/svg?seed={discussion.author_name}",
             viewsCount=discussion.views_count,
+            uniqueViewersCount=discussion.unique_viewers or 0,
             likesCount=discussion.likes_count,
             repliesCount=discussion.replies_count,
             isPinned=bool(discussion.is_pinned),
@@ -239,3 +257,143 @@ class ReplyResponse(BaseModel):
             replyToId=reply.reply_to_id,
             createdAt=reply.created_at.isoformat() if reply.created_at else ""
         )
+
+
+class DiscussionThreadResponse(BaseModel):
+    """讨论详情页复合响应体"""
+    discussion: DiscussionResponse
+    replies: list[ReplyResponse]
+    nextCursor: Optional[str]
+    repliesCount: int
+    isLiked: bool
+    likedReplyIds: list[str]
+
+
+class ThreadSummaryResponse(BaseModel):
+    """讨论摘要响应体"""
+    discussionId: str
+    summary: str
+    repliesCovered: int
+    pendingReplies: int  # 摘要之后新增、尚未纳入摘要的回复数
+    updatedAt: str
+    
+    @classmethod
+    def from_orm_model(cls, discussion, summary=None):
+        """从讨论及其摘要 (可为空) 转换"""
+        covered = summary.replies_covered if summary else 0
+        return cls(
+            discussionId=discussion.id,
+            summary=summary.summary if summary else "",
+            repliesCovered=covered,
+            pendingReplies=max(discussion.replies_count - covered, 0),
+            updatedAt=summary.updated_at.isoformat() if summary and summary.updated_at else ""
+        )
+
+
+class AIUsageRow(BaseModel):
+    """单日单路由的 AI 用量"""
+    day: str
+    route: str
+    calls: int
+    failures: int
+    truncatedCalls: int
+    promptTokens: int
+    completionTokens: int
+    avgLatencyMs: float
+    maxLatencyMs: float
+    estimatedCost: float
+    
+    @classmethod
+    def from_orm_model(cls, usage, cost: float):
+        """从 ORM 模型转换"""
+        return cls(
+            day=usage.day,
+            route=usage.route,
+            calls=usage.calls,
+            failures=usage.failures,
+            truncatedCalls=usage.truncated,
+            promptTokens=usage.prompt_tokens,
+            completionTokens=usage.completion_tokens,
+            avgLatencyMs=round(usage.latency_ms_total / usage.calls, 1) if usage.calls else 0.0,
+            maxLatencyMs=round(usage.latency_ms_max, 1),
+            estimatedCost=cost
+        )
+
+
+class AIUsageReport(BaseModel):
+    """AI 用量报告"""
+    days: int
+    rows: list[AIUsageRow]
+    totalCalls: int
+    totalPromptTokens: int
+    totalCompletionTokens: int
+    totalEstimatedCost: float
+
+
+# ==================== AI 任务相关 ====================
+
+class JobSubmitRequest(BaseModel):
+    """提交 AI 任务请求体"""
+    kind: str
+    payload: dict = {}
+    priority: Literal["interactive", "background"] = "interactive"
+    key: Optional[str] = Field(None, max_length=64, description="去重键，缺省时按任务类型与 payload 生成")
+
+
+class JobResponse(BaseModel):
+    """AI 任务响应体"""
+    id: str
+    kind: str
+    status: str
+    priority: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    deduplicated: bool = False  # 是否复用了已有任务
+    createdAt: str
+    startedAt: Optional[str]
+    finishedAt: Optional[str]
+    
+    @classmethod
+    def from_orm_model(cls, job, deduplicated: bool = False):
+        """从 ORM 模型转换"""
+        return cls(
+            id=job.id,
+            kind=job.kind,
+            status=job.status,
+            priority="interactive" if job.priority <= 0 else "background",
+            result=job.result,
+            error=job.error,
+            attempts=job.attempts or 0,
+            deduplicated=deduplicated,
+            createdAt=job.created_at.isoformat() if job.created_at else "",
+            startedAt=job.started_at.isoformat() if job.started_at else None,
+            finishedAt=job.finished_at.isoformat() if job.finished_at else None
+        )
+
+
+# ==================== 增量同步相关 ====================
+
+class ChangeSet(BaseModel):
+    """一组新增或更新的实体"""
+    projects: list[ProjectResponse] = []
+    discussions: list[DiscussionResponse] = []
+    replies: list[ReplyResponse] = []
+    comments: list[CommentResponse] = []
+
+
+class DeletedSet(BaseModel):
+    """已删除实体的 id"""
+    projects: list[str] = []
+    discussions: list[str] = []
+    replies: list[str] = []
+    comments: list[str] = []
+
+
+class ChangeFeedResponse(BaseModel):
+    """增量同步响应体"""
+    cursor: int
+    hasMore: bool
+    created: ChangeSet
+    updated: ChangeSet
+    deleted: DeletedSet
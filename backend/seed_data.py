@@ -3,9 +3,14 @@
 导入初始项目数据（与前端 constants.tsx 保持一致）
 """
 
-from database import SessionLocal, init_db
+from typing import Optional
+
+from database import SessionLocal, init_db, read_app_meta, write_app_meta
 from models import Project, Comment
 
+# 种子数据版本，修改下方初始数据时递增
+SEED_VERSION = "1"
+
 
 # 初始项目数据（对应前端 INITIAL_PROJECTS）
 INITIAL_PROJECTS = [
@@ -60,10 +65,17 @@ INITIAL_PROJECTS = [
 INITIAL_COMMENTS = []
 
 
-def seed_database():
-    """初始化数据库并导入种子数据"""
-    print("初始化数据库表...")
-    init_db()
+def seed_database(meta: Optional[dict[str, str]] = None) -> bool:
+    """
+    初始化数据库并导入种子数据，返回是否执行了导入检查
+    已记录当前种子版本时直接跳过，无需再查询项目表
+    """
+    if meta is None:
+        meta = read_app_meta()
+        print("初始化数据库表...")
+        init_db(meta)
+    if meta.get("seed_version") == SEED_VERSION:
+        return False
     
     db = SessionLocal()
     
@@ -72,7 +84,8 @@ def seed_database():
         existing_count = db.query(Project).count()
         if existing_count > 0:
             print(f"数据库已存在 {existing_count} 个项目，跳过初始化")
-            return
+            write_app_meta(meta, seed_version=SEED_VERSION)
+            return True
         
         print("导入项目数据...")
         for project_data in INITIAL_PROJECTS:
@@ -85,7 +98,9 @@ def seed_database():
             db.add(comment)
         
         db.commit()
+        write_app_meta(meta, seed_version=SEED_VERSION)
         print(f"✅ 成功导入 {len(INITIAL_PROJECTS)} 个项目和 {len(INITIAL_COMMENTS)} 条评论")
+        return True
     
     except Exception as e:
         print(f"❌ 数据导入失败: {e}")
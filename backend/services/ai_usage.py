@@ -0,0 +1,78 @@
+"""
+AI 用量统计
+每次模型调用后按 (UTC 日期, 调用路由) 累加 token 数、耗时与失败次数，一次 upsert 完成，
+用于查看各功能的调用量、延迟与估算费用。
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal, dialect_insert
+from models import AIUsage
+
+settings = get_settings()
+
+
+def record_usage(
+    route: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency_ms: float,
+    failed: bool = False,
+    truncated: bool = False
+):
+    """累加一次调用的用量；统计失败不影响调用本身"""
+    stmt = dialect_insert(AIUsage).values(
+        day=datetime.utcnow().strftime("%Y-%m-%d"),
+        route=route,
+        calls=1,
+        failures=int(failed),
+        truncated=int(truncated),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_ms_total=latency_ms,
+        latency_ms_max=latency_ms
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AIUsage.day, AIUsage.route],
+        set_={
+            "calls": AIUsage.calls + 1,
+            "failures": AIUsage.failures + stmt.excluded.failures,
+            "truncated": AIUsage.truncated + stmt.excluded.truncated,
+            "prompt_tokens": AIUsage.prompt_tokens + stmt.excluded.prompt_tokens,
+            "completion_tokens": AIUsage.completion_tokens + stmt.excluded.completion_tokens,
+            "latency_ms_total": AIUsage.latency_ms_total + stmt.excluded.latency_ms_total,
+            "latency_ms_max": case(
+                (stmt.excluded.latency_ms_max > AIUsage.latency_ms_max, stmt.excluded.latency_ms_max),
+                else_=AIUsage.latency_ms_max
+            ),
+        }
+    )
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        print(f"AI 用量记录失败: {e}")
+    finally:
+        db.close()
+
+
+def estimated_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """按配置的单价估算费用（元）"""
+    return round(
+        prompt_tokens * settings.ai_price_prompt_per_million / 1_000_000
+        + completion_tokens * settings.ai_price_completion_per_million / 1_000_000,
+        6
+    )
+
+
+def usage_rows(db: Session, days: int) -> list[AIUsage]:
+    """最近 days 天（含今天）的用量，按日期倒序、路由排列"""
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return db.execute(
+        select(AIUsage).where(AIUsage.day >= since).order_by(AIUsage.day.desc(), AIUsage.route)
+    ).scalars().all()
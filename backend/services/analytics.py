@@ -0,0 +1,170 @@
+"""
+活跃度统计
+按小时或按天统计讨论、回复、评论与点赞的数量（按所属讨论或项目的分类拆分）。
+每类活动一条 GROUP BY (时间桶, 分类) 查询；已结束的时间桶汇总后写入 activity_rollups 表，
+之后的查询直接读取，只有当前尚未结束的时间桶每次实时统计。
+汇总进度按粒度记录在 app_meta 中（activity_rollup_until:{粒度}），其之前的桶都已汇总。
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import dialect_insert
+from models import (
+    ActivityRollup, AppMeta, Comment, Discussion, DiscussionLike, Like, Project, Reply, ReplyLike
+)
+
+settings = get_settings()
+
+GRANULARITIES = {
+    "hour": (timedelta(hours=1), "%Y-%m-%dT%H:00"),
+    "day": (timedelta(days=1), "%Y-%m-%d"),
+}
+
+SERIES = ("discussions", "replies", "comments", "likes")
+
+UNCATEGORIZED = "other"
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_keys(start: datetime, end: datetime, granularity: str) -> list[str]:
+    """[start, end) 内所有时间桶的键，start 须已对齐到桶的起点"""
+    step, fmt = GRANULARITIES[granularity]
+    keys = []
+    while start < end:
+        keys.append(start.strftime(fmt))
+        start += step
+    return keys
+
+
+def _bucket_expr(db: Session, column, granularity: str):
+    """数据库端的时间桶表达式，输出与 bucket_keys 相同格式的字符串"""
+    if db.get_bind().dialect.name == "postgresql":
+        pattern = 'YYYY-MM-DD"T"HH24:00' if granularity == "hour" else "YYYY-MM-DD"
+        return func.to_char(column, pattern)
+    return func.strftime(GRANULARITIES[granularity][1], column)
+
+
+def _series_queries():
+    """每类活动的 (名称, 时间列, 分类列, 带关联的 FROM 子句)"""
+    return [
+        ("discussions", Discussion.created_at, Discussion.category, Discussion.__table__),
+        ("replies", Reply.created_at, Discussion.category,
+         Reply.__table__.join(Discussion.__table__, Reply.discussion_pk == Discussion.pk)),
+        ("comments", Comment.created_at, Project.category,
+         Comment.__table__.join(Project.__table__, Comment.project_pk == Project.pk)),
+        ("likes", Like.created_at, Project.category,
+         Like.__table__.join(Project.__table__, Like.project_pk == Project.pk)),
+        ("likes", DiscussionLike.created_at, Discussion.category,
+         DiscussionLike.__table__.join(Discussion.__table__, DiscussionLike.discussion_pk == Discussion.pk)),
+        ("likes", ReplyLike.created_at, Discussion.category,
+         ReplyLike.__table__.join(Reply.__table__, ReplyLike.reply_pk == Reply.pk)
+         .join(Discussion.__table__, Reply.discussion_pk == Discussion.pk)),
+    ]
+
+
+def aggregate(
+    db: Session,
+    granularity: str,
+    start: Optional[datetime],
+    end: datetime
+) -> dict[tuple[str, str, str], int]:
+    """实时统计 [start, end) 内的活动，返回 {(时间桶, 活动类型, 分类): 数量}"""
+    counts: dict[tuple[str, str, str], int] = defaultdict(int)
+    for series, created_at, category, source in _series_queries():
+        bucket = _bucket_expr(db, created_at, granularity)
+        query = (
+            select(bucket, func.coalesce(category, UNCATEGORIZED), func.count())
+            .select_from(source)
+            .where(created_at < end)
+            .group_by(bucket, category)
+        )
+        if start is not None:
+            query = query.where(created_at >= start)
+        for key, cat, count in db.execute(query):
+            counts[(key, series, cat)] += count
+    return counts
+
+
+def _watermark_key(granularity: str) -> str:
+    return f"activity_rollup_until:{granularity}"
+
+
+def _materialize(db: Session, granularity: str, until: datetime) -> datetime:
+    """
+    将 until 之前尚未汇总的已结束时间桶写入汇总表，返回新的汇总进度
+    多个 worker 同时汇总同一区间时结果相同，重复写入被忽略
+    """
+    stored = db.execute(select(AppMeta.value).where(AppMeta.key == _watermark_key(granularity))).scalar()
+    watermark = datetime.fromisoformat(stored) if stored else None
+    if watermark is not None and watermark >= until:
+        return watermark
+
+    counts = aggregate(db, granularity, watermark, until)
+    if counts:
+        db.execute(dialect_insert(ActivityRollup).on_conflict_do_nothing(), [
+            {"granularity": granularity, "bucket": key, "series": series, "category": cat, "count": count}
+            for (key, series, cat), count in counts.items()
+        ])
+    stmt = dialect_insert(AppMeta).values(key=_watermark_key(granularity), value=until.isoformat())
+    db.execute(stmt.on_conflict_do_update(index_elements=[AppMeta.key], set_={"value": stmt.excluded.value}))
+    db.commit()
+    return until
+
+
+def reset_rollups(db: Session):
+    """清空汇总（如导入了历史数据），下次查询时重新汇总；调用方负责提交事务"""
+    db.execute(ActivityRollup.__table__.delete())
+    db.execute(AppMeta.__table__.delete().where(AppMeta.key.like("activity_rollup_until:%")))
+
+
+def activity(
+    db: Session,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    now: Optional[datetime] = None
+) -> tuple[list[str], dict[str, dict[str, list[int]]]]:
+    """
+    返回 (时间桶列表, {活动类型: {分类: 各桶数量}})，包含 start 与 end 所在的桶，无活动的桶补零
+    已结束的桶读汇总表，未结束的桶实时统计
+    """
+    now = now or datetime.utcnow()
+    step, fmt = GRANULARITIES[granularity]
+    start = bucket_start(start, granularity)
+    end = bucket_start(end, granularity) + step
+    keys = bucket_keys(start, end, granularity)
+    index = {key: i for i, key in enumerate(keys)}
+    open_start = bucket_start(now, granularity)
+
+    counts: dict[tuple[str, str, str], int] = {}
+    closed_end = min(end, open_start)
+    if start < closed_end:
+        _materialize(db, granularity, open_start)
+        rows = db.execute(
+            select(ActivityRollup.bucket, ActivityRollup.series, ActivityRollup.category, ActivityRollup.count)
+            .where(
+                ActivityRollup.granularity == granularity,
+                ActivityRollup.bucket >= start.strftime(fmt),
+                ActivityRollup.bucket < closed_end.strftime(fmt)
+            )
+        )
+        counts.update({(key, series, cat): count for key, series, cat, count in rows})
+    if end > open_start:
+        counts.update(aggregate(db, granularity, max(start, open_start), end))
+
+    series: dict[str, dict[str, list[int]]] = {name: {} for name in SERIES}
+    for (key, name, cat), count in counts.items():
+        if key in index:
+            series[name].setdefault(cat, [0] * len(keys))[index[key]] += count
+    return keys, series
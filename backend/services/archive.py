@@ -0,0 +1,225 @@
+"""
+冷数据归档服务
+已关闭或长期无新回复的讨论连同回复、点赞记录迁移到独立的归档库，
+热库的 discussions / replies 表及其索引只保留活跃数据，能常驻页缓存。
+归档表结构与热库相同，ORM 模型可直接在归档会话上查询，读接口在热库未命中时回落到归档库。
+
+用法: python -m services.archive
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import MetaData, bindparam, create_engine, delete, func, or_, and_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from config import get_settings
+from database import (
+    SessionLocal, dialect_insert, read_app_meta, write_app_meta, schema_fingerprint,
+    _rebuild_primary_keys, _ensure_columns, _ensure_indexes
+)
+from models import AppMeta, Discussion, Reply, DiscussionLike, ReplyLike, ThreadSummary
+from services.cache_versions import bump_versions
+from services.duplicates import remove_fingerprints
+
+settings = get_settings()
+
+# 归档库的表结构从模型复制，按外键依赖顺序排列
+archive_metadata = MetaData()
+ARCHIVED_TABLES = [
+    model.__table__.to_metadata(archive_metadata)
+    for model in (Discussion, Reply, DiscussionLike, ReplyLike, ThreadSummary)
+]
+# 归档库自己的元数据表，记录其结构指纹：归档库被删除或替换时指纹随之消失，启动时重新建表
+AppMeta.__table__.to_metadata(archive_metadata)
+
+archive_engine = create_engine(
+    settings.archive_database_url,
+    connect_args={"check_same_thread": False} if "sqlite" in settings.archive_database_url else {}
+)
+
+ArchiveSession = sessionmaker(autoflush=False, expire_on_commit=False, bind=archive_engine)
+
+
+def init_archive() -> bool:
+    """
+    初始化归档库表结构，与热库一样补齐新增的列和索引，返回是否执行了初始化
+    结构指纹记录在归档库自己的 app_meta 表中
+    """
+    meta = read_app_meta(archive_engine)
+    fingerprint = schema_fingerprint(archive_metadata, archive_engine)
+    if meta.get("schema_version") == fingerprint:
+        return False
+
+    archive_metadata.create_all(bind=archive_engine)
+    _rebuild_primary_keys(archive_engine, archive_metadata)
+    _ensure_columns(archive_engine, archive_metadata)
+    _ensure_indexes(archive_engine, archive_metadata)
+    write_app_meta(meta, archive_engine, archive_metadata, schema_version=fingerprint)
+    return True
+
+
+@contextmanager
+def archive_session() -> Iterator[Session]:
+    """只读访问归档库的会话"""
+    db = ArchiveSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _cold_discussions(db: Session, now: datetime, limit: int) -> list:
+    """选出一批待归档的讨论 (pk, id) 并加行锁（跳过正被写入的讨论）：置顶与已软删除的讨论不归档"""
+    active_at = func.coalesce(Discussion.last_reply_at, Discussion.created_at)
+    return db.execute(
+        select(Discussion.pk, Discussion.id)
+        .where(
+            Discussion.deleted_at.is_(None),
+            Discussion.is_pinned == 0,
+            or_(
+                active_at < now - timedelta(days=settings.archive_after_days),
+                and_(
+                    Discussion.is_closed == 1,
+                    active_at < now - timedelta(days=settings.archive_closed_after_days)
+                )
+            )
+        )
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+
+def _batch_rows(discussion_pks: list[int]):
+    """一批讨论在各表中对应行的筛选条件，顺序与 ARCHIVED_TABLES 一致"""
+    reply_pks = select(Reply.pk).where(Reply.discussion_pk.in_(discussion_pks))
+    return [
+        (Discussion, Discussion.pk.in_(discussion_pks)),
+        (Reply, Reply.discussion_pk.in_(discussion_pks)),
+        (DiscussionLike, DiscussionLike.discussion_pk.in_(discussion_pks)),
+        (ReplyLike, ReplyLike.reply_pk.in_(reply_pks)),
+        (ThreadSummary, ThreadSummary.discussion_pk.in_(discussion_pks)),
+    ]
+
+
+def _copy_rows(hot: Session, cold: Session, model, table, where, pk_maps: dict[str, dict[int, int]]) -> None:
+    """
+    把一张表的行复制到归档库：整数主键只在各自的库内有效，归档库重新分配，
+    外键按 pk_maps（热库 pk -> 归档库 pk，按父表名分组）换算，之后的子表据此关联；
+    自引用外键（引用的回复）要等本表的行都写入后才能换算，随后单独更新
+    已存在的行（上次中断前写入的）被忽略，仍按公开 id 查出其归档库 pk
+    """
+    source = model.__table__
+    rows = [dict(row) for row in hot.execute(select(source).where(where)).mappings()]
+    if not rows:
+        return
+
+    pk_name = source.primary_key.columns.keys()[0]
+    foreign_keys = {fk.parent.name: fk.column.table.name for fk in source.foreign_keys}
+    hot_pks = [row.pop(pk_name) for row in rows]
+    quoted = {}
+    for row in rows:
+        for name, parent in foreign_keys.items():
+            if parent == source.name:
+                quoted[row["id"]] = row[name]
+                row[name] = None
+            else:
+                row[name] = pk_maps[parent].get(row[name])
+    cold.execute(dialect_insert(table, archive_engine).on_conflict_do_nothing(), rows)
+
+    public = source.c.get("id")
+    if public is None or public.primary_key:
+        return
+    cold_pks = {}
+    ids = [row["id"] for row in rows]
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cold_pks.update(cold.execute(select(table.c.id, table.c.pk).where(table.c.id.in_(chunk))).all())
+    pk_map = pk_maps[source.name] = {hot_pk: cold_pks[row["id"]] for hot_pk, row in zip(hot_pks, rows)}
+
+    for name, parent in foreign_keys.items():
+        if parent != source.name:
+            continue
+        params = [
+            {"b_id": public_id, "b_ref": pk_map.get(hot_ref)}
+            for public_id, hot_ref in quoted.items() if hot_ref is not None
+        ]
+        if params:
+            cold.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values({name: bindparam("b_ref")}),
+                params
+            )
+
+
+def archive_cold_discussions(now: Optional[datetime] = None, batch_size: int = 0) -> int:
+    """
+    将冷讨论迁移到归档库，返回归档的讨论数
+    每批先写入归档库并提交，再从热库删除；中途中断后重复执行时，已写入的行被忽略，不会重复
+    选取、复制与删除在同一个热库事务中进行，并先锁住本批讨论及其回复：SQLite 下事务一开始即取得写锁，
+    PostgreSQL 下新回复、点赞与摘要的外键检查或计数更新会等待行锁，事务提交后因讨论已不存在而失败回滚，
+    因此复制之后、删除之前不会有新写入的行被一并删除而未归档
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.archive_batch_size
+    init_archive()
+
+    archived = 0
+    hot = SessionLocal()
+    cold = ArchiveSession()
+    try:
+        while True:
+            # 先写后读：SQLite 的事务在首次写入时才取得写锁
+            bump_versions(hot, "discussion", "reply")
+            batch = _cold_discussions(hot, now, batch_size)
+            if not batch:
+                hot.rollback()
+                break
+            discussion_pks = [row.pk for row in batch]
+            hot.execute(
+                select(Reply.pk).where(Reply.discussion_pk.in_(discussion_pks)).with_for_update()
+            ).all()
+
+            criteria = _batch_rows(discussion_pks)
+            pk_maps: dict[str, dict[int, int]] = {}
+            for (model, where), table in zip(criteria, ARCHIVED_TABLES):
+                _copy_rows(hot, cold, model, table, where, pk_maps)
+            cold.commit()
+
+            # 归档内容不再参与重复检测；先删子表再删父表
+            remove_fingerprints(hot, "reply", select(Reply.id).where(Reply.discussion_pk.in_(discussion_pks)))
+            remove_fingerprints(hot, "discussion", [row.id for row in batch])
+            for model, where in reversed(criteria):
+                hot.execute(delete(model).where(where).execution_options(synchronize_session=False))
+            hot.commit()
+            archived += len(batch)
+    finally:
+        cold.close()
+        hot.close()
+    return archived
+
+
+def delete_archived_discussion(discussion_id: str) -> bool:
+    """从归档库中删除讨论及其回复、点赞记录与摘要，讨论不在归档库中时返回 False"""
+    cold = ArchiveSession()
+    try:
+        discussion_pk = cold.execute(select(Discussion.pk).where(Discussion.id == discussion_id)).scalar()
+        if discussion_pk is None:
+            return False
+        criteria = _batch_rows([discussion_pk])
+        result = None
+        for model, where in reversed(criteria):
+            result = cold.execute(delete(model).where(where).execution_options(synchronize_session=False))
+        # 最后删除的是讨论本身
+        if not result.rowcount:
+            cold.rollback()
+            return False
+        cold.commit()
+        return True
+    finally:
+        cold.close()
+
+
+if __name__ == "__main__":
+    count = archive_cold_discussions()
+    print(f"✅ 已归档 {count} 个讨论")
@@ -0,0 +1,110 @@
+"""
+跨 worker 缓存失效
+不依赖外部服务：每类实体在 cache_versions 表中有一个版本号，写接口在写入数据的同一事务内递增，
+各 worker 的进程内缓存以读到的版本号为戳，版本变化即视为失效。
+
+SQLite 下用一条常驻连接上的 PRAGMA data_version 判断数据库自上次检查后是否有过任何提交，
+没有提交时直接复用上次读到的版本号，绝大多数读请求的失效检查不访问任何表。
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal, engine, dialect_insert
+from models import CacheVersion
+
+settings = get_settings()
+
+
+def bump_versions(db: Session, *entity_types: str):
+    """递增实体类型的缓存版本，调用方负责提交事务（与数据变更同一事务提交）"""
+    for entity_type in entity_types:
+        db.execute(
+            dialect_insert(CacheVersion)
+            .values(entity_type=entity_type, version=1)
+            .on_conflict_do_update(
+                index_elements=[CacheVersion.entity_type],
+                set_={"version": CacheVersion.version + 1}
+            )
+        )
+
+
+class VersionTracker:
+    """读取并缓存各实体类型的当前版本号"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._data_version: Optional[int] = None
+        self._probe: Optional[sqlite3.Connection] = None
+
+    def _sqlite_data_version(self) -> Optional[int]:
+        """常驻连接上的 data_version，其他连接（含本进程连接池中的连接）每次提交都会使其改变"""
+        if engine.dialect.name != "sqlite" or not engine.url.database or engine.url.database == ":memory:":
+            return None
+        if self._probe is None:
+            self._probe = sqlite3.connect(engine.url.database, check_same_thread=False)
+        return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def versions(self) -> dict[str, int]:
+        with self._lock:
+            data_version = self._sqlite_data_version()
+            if data_version is not None and data_version == self._data_version:
+                return self._versions
+            db = SessionLocal()
+            try:
+                self._versions = dict(db.execute(select(CacheVersion.entity_type, CacheVersion.version)).all())
+            finally:
+                db.close()
+            self._data_version = data_version
+            return self._versions
+
+
+version_tracker = VersionTracker()
+
+
+class VersionedCache:
+    """
+    以实体版本号为戳的进程内 LRU 缓存
+    depends_on 中任一实体类型的版本变化、或条目超过 cache_max_age_seconds 时重新加载
+    """
+
+    def __init__(self, depends_on: tuple[str, ...], max_entries: int = 0, max_age: float = 0):
+        self.depends_on = depends_on
+        self.max_entries = max_entries or settings.cache_max_entries
+        self.max_age = max_age or settings.cache_max_age_seconds
+        self._entries: OrderedDict[Hashable, tuple[tuple, float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        返回缓存值，失效时调用 loader 重新加载
+        版本号在加载之前读取：加载期间发生的写入会使下一次读取判定失效，不会把旧数据标记为新版本
+        """
+        versions = version_tracker.versions()
+        stamp = tuple(versions.get(t, 0) for t in self.depends_on)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp and now - entry[1] < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (stamp, now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
@@ -0,0 +1,65 @@
+"""
+变更日志服务
+写接口在同一事务内记录实体变更，供 /api/changes 增量同步读取
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import ChangeLog
+from services.cache_versions import bump_versions
+
+ENTITY_TYPES = ("project", "discussion", "reply", "comment")
+
+
+def record_change(db: Session, entity_type: str, entity_id: str, op: str):
+    """
+    记录一次实体变更，调用方负责提交事务
+    同时递增该实体类型的缓存版本，使各 worker 的进程内缓存失效
+    先删除该实体的旧记录再插入新记录，使日志大小与实体数量成正比，而不是与写入次数成正比。
+    create 记录被后续更新替换时仍保持 create，客户端应将 create / update 一律按 upsert 处理。
+    """
+    where = (ChangeLog.entity_type == entity_type, ChangeLog.entity_id == entity_id)
+    if engine.dialect.delete_returning:
+        previous = db.execute(delete(ChangeLog).where(*where).returning(ChangeLog.op)).scalar()
+    else:
+        previous = db.execute(select(ChangeLog.op).where(*where)).scalar()
+        db.execute(delete(ChangeLog).where(*where))
+    if op == "update" and previous == "create":
+        op = "create"
+
+    db.execute(insert(ChangeLog).values(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        op=op,
+        changed_at=datetime.utcnow()
+    ))
+    bump_versions(db, entity_type)
+
+
+def record_changes(db: Session, entity_type: str, entity_ids: list[str], op: str = "update"):
+    """
+    批量记录同类实体的变更（如数据导入），调用方负责提交事务
+    与 record_change 相同，每个实体只保留最新一条记录
+    """
+    if not entity_ids:
+        return
+    db.execute(
+        delete(ChangeLog)
+        .where(ChangeLog.entity_type == entity_type, ChangeLog.entity_id.in_(entity_ids))
+        .execution_options(synchronize_session=False)
+    )
+    now = datetime.utcnow()
+    db.execute(insert(ChangeLog), [
+        {"entity_type": entity_type, "entity_id": entity_id, "op": op, "changed_at": now}
+        for entity_id in entity_ids
+    ])
+    bump_versions(db, entity_type)
+
+
+def latest_cursor(db: Session) -> int:
+    """当前最新的变更游标"""
+    return db.execute(select(ChangeLog.id).order_by(ChangeLog.id.desc()).limit(1)).scalar() or 0
@@ -0,0 +1,347 @@
+"""
+数据导入导出服务
+以 NDJSON 流式导出项目、评论、讨论、回复及点赞记录，每行一条 {"type": ..., "data": {...}}；
+导入时按批 upsert，逐行读取，内存占用与数据量无关。
+整数主键只在各自的库内有效，不导出；外键列导出为父记录的公开 id（如 project_pk 导出为 project_id），
+导入时再按公开 id 换算为目标库中的 pk，父记录不存在的行被跳过。
+已归档的讨论、回复及点赞记录从归档库导出，行上带 "archived": true，导入时写回归档库；
+已软删除、等待清理的讨论及其回复、点赞记录不导出。
+
+用法:
+    python -m services.data_transfer export portal.ndjson [--types project,discussion]
+    python -m services.data_transfer import portal.ndjson [--batch-size 5000]
+"""
+
+import argparse
+import base64
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+from sqlalchemy import DateTime, LargeBinary, Table, bindparam, exists, select, update
+
+from config import get_settings
+from database import SessionLocal, dialect_insert, init_db
+from models import Project, Comment, Like, Discussion, Reply, DiscussionLike, ReplyLike
+from services.cache_versions import bump_versions
+from services.change_feed import ENTITY_TYPES, record_changes
+from services.reconcile import reconcile_counts
+from services.analytics import reset_rollups
+from services.duplicates import backfill_fingerprints
+from services.archive import ARCHIVED_TABLES, ArchiveSession, archive_engine, init_archive
+
+settings = get_settings()
+
+FORMAT_VERSION = 1
+
+# 导出类型 -> 模型，按依赖顺序排列，导入时父记录先于子记录写入
+EXPORT_TYPES = {
+    "project": Project,
+    "comment": Comment,
+    "like": Like,
+    "discussion": Discussion,
+    "reply": Reply,
+    "discussion_like": DiscussionLike,
+    "reply_like": ReplyLike,
+}
+
+# upsert 的冲突键：实体按公开 id，点赞记录按 (被点赞对象, 用户)
+CONFLICT_KEYS = {
+    Project: ["id"],
+    Comment: ["id"],
+    Like: ["project_pk", "user_identifier"],
+    Discussion: ["id"],
+    Reply: ["id"],
+    DiscussionLike: ["discussion_pk", "user_identifier"],
+    ReplyLike: ["reply_pk", "user_identifier"],
+}
+
+# 导入后需要失效的缓存实体类型，点赞记录归入被点赞对象
+CACHE_ENTITY = {
+    "project": "project",
+    "comment": "comment",
+    "like": "project",
+    "discussion": "discussion",
+    "reply": "reply",
+    "discussion_like": "discussion",
+    "reply_like": "reply",
+}
+
+EXPORT_BATCH_SIZE = 1000
+
+# 归档库中同结构的表，这些类型导出时另外读取归档库
+ARCHIVED = {table.name: table for table in ARCHIVED_TABLES}
+
+
+def _live(model):
+    """热库中应导出的行：排除已软删除的讨论及其回复、点赞记录"""
+    live_discussion = exists().where(Discussion.deleted_at.is_(None))
+    if model is Discussion:
+        return Discussion.deleted_at.is_(None)
+    if model in (Reply, DiscussionLike):
+        return live_discussion.where(Discussion.pk == model.discussion_pk)
+    if model is ReplyLike:
+        return exists().where(
+            Reply.pk == ReplyLike.reply_pk, Reply.discussion_pk == Discussion.pk, Discussion.deleted_at.is_(None)
+        )
+    return None
+
+
+def _columns(model):
+    table = model if isinstance(model, Table) else model.__table__
+    return [c for c in table.columns if not c.primary_key]
+
+
+def _links(table: Table) -> dict[str, tuple[str, Table]]:
+    """外键列 -> (导出字段名, 父表)，如 project_pk -> project_id"""
+    return {fk.parent.name: (fk.parent.name[:-len("_pk")] + "_id", fk.column.table) for fk in table.foreign_keys}
+
+
+def _export_columns(table: Table) -> list:
+    """导出的列：外键列换成父记录的公开 id"""
+    links = _links(table)
+    columns = []
+    for column in _columns(table):
+        if column.name in links:
+            field, parent = links[column.name]
+            owner = parent.alias()
+            column = select(owner.c.id).where(owner.c.pk == column).scalar_subquery().label(field)
+        columns.append(column)
+    return columns
+
+
+def _pks_by_id(session, table: Table, ids) -> dict[str, int]:
+    """按公开 id 查出 pk，分块查询"""
+    ids = list(ids)
+    found = {}
+    for start in range(0, len(ids), 500):
+        found.update(session.execute(select(table.c.id, table.c.pk).where(table.c.id.in_(ids[start:start + 500]))).all())
+    return found
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return value
+
+
+def _decoder(column) -> Callable:
+    if isinstance(column.type, DateTime):
+        return lambda v: datetime.fromisoformat(v) if v is not None else None
+    if isinstance(column.type, LargeBinary):
+        return lambda v: base64.b64decode(v) if v is not None else None
+    return lambda v: v
+
+
+def iter_export(types: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """
+    逐行生成 NDJSON，首行为格式说明
+    使用独立会话并以 yield_per 分批读取，可直接作为流式响应体
+    """
+    wanted = list(types) if types else list(EXPORT_TYPES)
+    meta = {"version": FORMAT_VERSION, "exportedAt": datetime.utcnow().isoformat()}
+    yield json.dumps({"type": "meta", "data": meta}) + "\n"
+
+    db = SessionLocal()
+    cold = ArchiveSession()
+    try:
+        for entity_type in EXPORT_TYPES:
+            if entity_type not in wanted:
+                continue
+            model = EXPORT_TYPES[entity_type]
+            sources = [(db, model.__table__, _live(model), {})]
+            if model.__tablename__ in ARCHIVED:
+                sources.append((cold, ARCHIVED[model.__tablename__], None, {"archived": True}))
+            for session, table, where, extra in sources:
+                columns = _export_columns(table)
+                stmt = select(*columns).order_by(*table.primary_key.columns)
+                if where is not None:
+                    stmt = stmt.where(where)
+                for row in session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+                    data = {c.name: _encode(v) for c, v in zip(columns, row)}
+                    yield json.dumps({"type": entity_type, **extra, "data": data}, ensure_ascii=False) + "\n"
+    finally:
+        cold.close()
+        db.close()
+
+
+def _upsert(db, model, rows: list[dict], archived: bool = False) -> int:
+    """
+    按 CONFLICT_KEYS 中的唯一键批量 upsert，archived 为 True 时写入归档库的同名表；点赞记录已存在时保持不变
+    外键字段按公开 id 换算为目标库中的 pk：父记录不存在时，必填外键的行被跳过，可空的外键置空；
+    自引用外键（引用的回复）可能指向同一批中的行，写入后再换算更新。返回写入的行数
+    """
+    table = ARCHIVED[model.__tablename__] if archived else model.__table__
+    quoted = {}
+    for column, (field, parent) in _links(table).items():
+        refs = [row.pop(field, None) for row in rows]
+        if parent is table:
+            quoted[column] = {row["id"]: ref for row, ref in zip(rows, refs) if ref}
+            pks = {}
+        else:
+            pks = _pks_by_id(db, parent, {ref for ref in refs if ref})
+        for row, ref in zip(rows, refs):
+            row[column] = pks.get(ref)
+        if not table.c[column].nullable:
+            rows = [row for row in rows if row[column] is not None]
+    if not rows:
+        return 0
+
+    stmt = dialect_insert(table, archive_engine) if archived else dialect_insert(model)
+    index_elements = CONFLICT_KEYS[model]
+    updates = {c.name: stmt.excluded[c.name] for c in _columns(table) if c.name not in index_elements}
+    if model in (Like, DiscussionLike, ReplyLike):
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=updates)
+    db.execute(stmt, rows)
+
+    for column, refs in quoted.items():
+        pks = _pks_by_id(db, table, set(refs.values()))
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values({column: bindparam("b_ref")}),
+            [{"b_id": row_id, "b_ref": pks.get(ref)} for row_id, ref in refs.items()]
+        )
+    return len(rows)
+
+
+def import_ndjson(
+    lines: Iterable[str],
+    batch_size: int = 5000,
+    progress: Optional[Callable[[str, int], None]] = None
+) -> dict[str, int]:
+    """
+    从 NDJSON 行导入数据，返回各类型导入行数
+    同类型的连续行攒满一批后写入并提交，progress(类型, 累计行数) 在每批提交后回调
+    """
+    counts = {entity_type: 0 for entity_type in EXPORT_TYPES}
+    decoders = {
+        entity_type: {c.name: _decoder(c) for c in _export_columns(model.__table__)}
+        for entity_type, model in EXPORT_TYPES.items()
+    }
+    db = SessionLocal()
+    cold = ArchiveSession()
+    buffer: list[dict] = []
+    current: Optional[str] = None
+    archived = False
+
+    def flush():
+        if not buffer:
+            return
+        if archived:
+            # 归档数据只写回归档库，不进入变更日志与缓存
+            counts[current] += _upsert(cold, EXPORT_TYPES[current], buffer, archived=True)
+            cold.commit()
+        else:
+            counts[current] += flush_hot()
+        buffer.clear()
+        if progress:
+            progress(current, counts[current])
+
+    def flush_hot():
+        if EXPORT_TYPES[current] in (Like, DiscussionLike, ReplyLike):
+            # 与点赞接口一样先递增版本再插入，点赞过滤器据此追加导入的记录
+            bump_versions(db, "like")
+        written = _upsert(db, EXPORT_TYPES[current], buffer)
+        if current in ENTITY_TYPES:
+            # 导入的实体写入变更日志，增量同步的客户端无需全量重新同步
+            record_changes(db, current, [row["id"] for row in buffer if row.get("id")])
+        bump_versions(db, CACHE_ENTITY[current])
+        db.commit()
+        return written
+
+    try:
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                entity_type, data = record["type"], record["data"]
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"第 {line_no} 行格式无效")
+            if entity_type == "meta":
+                if data.get("version") != FORMAT_VERSION:
+                    raise ValueError(f"不支持的导出格式版本: {data.get('version')}")
+                continue
+            if entity_type not in EXPORT_TYPES:
+                raise ValueError(f"第 {line_no} 行类型未知: {entity_type}")
+            is_archived = bool(record.get("archived"))
+            if is_archived and EXPORT_TYPES[entity_type].__tablename__ not in ARCHIVED:
+                raise ValueError(f"第 {line_no} 行类型不支持归档: {entity_type}")
+
+            if entity_type != current or is_archived != archived:
+                flush()
+                current, archived = entity_type, is_archived
+            column_decoders = decoders[entity_type]
+            buffer.append({name: decode(data.get(name)) for name, decode in column_decoders.items() if name in data})
+            if len(buffer) >= batch_size:
+                flush()
+        flush()
+    except Exception:
+        db.rollback()
+        cold.rollback()
+        raise
+    finally:
+        cold.close()
+        db.close()
+    return counts
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="门户数据 NDJSON 导入导出")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="导出为 NDJSON")
+    export_parser.add_argument("path", help="输出文件，- 表示标准输出")
+    export_parser.add_argument("--types", help=f"逗号分隔的类型，可选: {','.join(EXPORT_TYPES)}")
+    import_parser = sub.add_parser("import", help="从 NDJSON 导入（按 id upsert）")
+    import_parser.add_argument("path", help="输入文件，- 表示标准输入")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        types = args.types.split(",") if args.types else None
+        out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8")
+        try:
+            for line in iter_export(types):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return
+
+    init_db()
+    init_archive()
+    start = time.perf_counter()
+
+    def report(entity_type: str, count: int):
+        elapsed = time.perf_counter() - start
+        print(f"  {entity_type}: 已导入 {count} 行 ({elapsed:.1f}s)", file=sys.stderr)
+
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    try:
+        counts = import_ndjson(source, args.batch_size, report)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    db = SessionLocal()
+    try:
+        # 导入数据中的计数字段按明细重新校正；导入的历史活动使已汇总的活跃度统计失效
+        reconcile_counts(db, args.batch_size)
+        reset_rollups(db)
+        db.commit()
+        backfill_fingerprints(db, args.batch_size)
+        if counts["project"]:
+            from services.related import rebuild_related
+            rebuild_related(db)
+    finally:
+        db.close()
+    summary = "，".join(f"{t} {n}" for t, n in counts.items() if n)
+    print(f"✅ 导入完成: {summary or '无数据'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _main()
@@ -3,16 +3,55 @@ DeepSeek AI 服务
 使用 OpenAI SDK 兼容接口调用 DeepSeek API
 """
 
-from openai import OpenAI
+import asyncio
+import time
+from functools import lru_cache
+
 from config import get_settings
+from services.ai_usage import record_usage
+from services.prompt_budget import compact, estimate_tokens, fit_fields, fit_messages
 
 settings = get_settings()
 
-# 初始化 DeepSeek 客户端 (使用 OpenAI SDK 兼容接口)
-client = OpenAI(
-    api_key=settings.deepseek_api_key,
-    base_url=settings.deepseek_base_url
-)
+
+@lru_cache
+def get_client():
+    """
+    获取 DeepSeek 客户端 (使用 OpenAI SDK 兼容接口)
+    首次调用时才导入 SDK 并创建客户端，不处理 AI 请求的 worker 启动时无需加载
+    """
+    from openai import OpenAI
+    return OpenAI(
+        api_key=settings.deepseek_api_key,
+        base_url=settings.deepseek_base_url
+    )
+
+
+def _complete(route: str, truncated: bool, **kwargs):
+    """
+    调用模型并记录用量（在线程中执行）
+    响应未携带 usage 时按字数估算 token 数
+    """
+    start = time.perf_counter()
+    try:
+        response = get_client().chat.completions.create(**kwargs)
+    except Exception:
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in kwargs["messages"])
+        record_usage(route, prompt_tokens, 0, (time.perf_counter() - start) * 1000, failed=True, truncated=truncated)
+        raise
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+    else:
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in kwargs["messages"])
+        completion_tokens = estimate_tokens(response.choices[0].message.content or "")
+    record_usage(route, prompt_tokens, completion_tokens, latency_ms, truncated=truncated)
+    return response
+
+
+INSIGHT_FALLBACK = "AI 暂时无法提供点评。"
 
 
 async def generate_project_insight(
@@ -21,7 +60,7 @@ async def generate_project_insight(
     short_description: str
 ) -> str:
     """
-    生成项目的 AI 视角点评
+    生成项目的 AI 视角点评，调用失败时返回兜底文本
     
     Args:
         title: 项目名称
@@ -32,42 +71,59 @@ async def generate_project_insight(
         AI 生成的点评文本
     """
     try:
-        prompt = f"""你是一个资深开发者评论家。请根据以下项目信息，提供一个简短且吸引人的"AI 视角点评"，突出它的创新点。
+        return await request_project_insight(title, background_story, short_description)
+    except Exception as e:
+        print(f"DeepSeek API Error: {e}")
+        return INSIGHT_FALLBACK
 
-项目名称: {title}
-背景: {background_story}
-功能: {short_description}
+
+async def request_project_insight(
+    title: str,
+    background_story: str,
+    short_description: str
+) -> str:
+    """生成项目的 AI 视角点评，调用失败时抛出异常，供任务队列重试"""
+    # 背景故事等字段长度不受限制，按预算截断后再拼入提示词
+    fields = {"title": title, "background": background_story, "description": short_description}
+    fitted = fit_fields(fields, settings.ai_insight_input_tokens)
+    truncated = fitted != {name: compact(value) for name, value in fields.items()}
+    prompt = f"""你是一个资深开发者评论家。请根据以下项目信息，提供一个简短且吸引人的"AI 视角点评"，突出它的创新点。
+
+项目名称: {fitted["title"]}
+背景: {fitted["background"]}
+功能: {fitted["description"]}
 
 要求：字数在100字以内，语气专业且富有感染力。"""
 
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一个专业的技术评论家，擅长发现项目的亮点和创新之处。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content or "暂无 AI 点评。"
+    # SDK 为同步调用，放到线程中执行，避免等待上游时阻塞事件循环
+    response = await asyncio.to_thread(
+        _complete,
+        "project_insight",
+        truncated,
+        model="deepseek-chat",
+        messages=[
+            {
+                "role": "system",
+                "content": "你是一个专业的技术评论家，擅长发现项目的亮点和创新之处。"
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        max_tokens=200,
+        temperature=0.7
+    )
     
-    except Exception as e:
-        print(f"DeepSeek API Error: {e}")
-        return "AI 暂时无法提供点评。"
+    return response.choices[0].message.content or "暂无 AI 点评。"
 
 
 async def chat_completion(
     messages: list[dict],
     model: str = "deepseek-chat",
     max_tokens: int = 1000,
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    route: str = "chat"
 ) -> str:
     """
     通用聊天完成接口
@@ -77,14 +133,19 @@ async def chat_completion(
         model: 模型名称
         max_tokens: 最大 token 数
         temperature: 温度参数
+        route: 用量统计中的调用路由
     
     Returns:
         AI 回复文本
     """
     try:
-        response = client.chat.completions.create(
+        fitted = fit_messages(messages, settings.ai_max_prompt_tokens)
+        response = await asyncio.to_thread(
+            _complete,
+            route,
+            fitted is not messages,
             model=model,
-            messages=messages,
+            messages=fitted,
             max_tokens=max_tokens,
             temperature=temperature
         )
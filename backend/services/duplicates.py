@@ -0,0 +1,201 @@
+"""
+重复内容检测
+讨论（标题 + 正文）、回复与评论的正文计算 64 位 SimHash：文本去掉空白与标点并转小写后取相邻三字的 shingle，
+各 shingle 的哈希按出现次数加权投票决定每一位。指纹按 16 位切成 4 段，每段一行写入 content_fingerprints，
+以 (kind, band, band_value) 建索引。汉明距离小于 4 的两个指纹至少有一段完全相同，
+新内容只需按 4 个段值各做一次索引查找取得候选，再逐个计算汉明距离，不必扫描已有内容。
+
+回复与评论默认只与同一讨论或项目下的内容比较（另有 (kind, scope_id, band, band_value) 索引），
+不同讨论里相似的常见回复不算重复；DUPLICATE_CROSS_SCOPE=true 时也与其他位置的内容比较。讨论始终全站比较。
+
+发现重复时按 DUPLICATE_ACTION 处理：reject 拒绝；merge 在同一讨论或项目下视为重复提交，直接返回已有内容，
+其他位置的重复仍拒绝；off 关闭检测。过短的内容（如"谢谢"）不参与检测。
+
+用法: python -m services.duplicates  # 为尚无指纹的历史内容补算
+"""
+
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from models import Comment, ContentFingerprint, Discussion, Reply
+
+settings = get_settings()
+
+BANDS = 4
+BAND_BITS = 64 // BANDS
+SHINGLE = 3
+
+_NOISE = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """去掉空白与标点并转小写，使仅格式不同的内容得到相同指纹"""
+    return _NOISE.sub("", (text or "").lower())
+
+
+def simhash(text: str) -> Optional[int]:
+    """64 位 SimHash；规范化后不足 DUPLICATE_MIN_CHARS 字的内容返回 None"""
+    text = normalize(text)
+    if len(text) < settings.duplicate_min_chars:
+        return None
+    shingles = Counter(text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1))
+
+    # 按字节位置累计各字节值的权重，最后每位只需汇总 256 个字节值，避免逐 shingle 逐位循环
+    tables: list[Counter] = [Counter() for _ in range(8)]
+    for shingle, weight in shingles.items():
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for pos, byte in enumerate(digest):
+            tables[pos][byte] += weight
+
+    half = sum(shingles.values()) / 2
+    fingerprint = 0
+    for pos, table in enumerate(tables):
+        for bit in range(8):
+            if sum(w for byte, w in table.items() if byte >> bit & 1) > half:
+                fingerprint |= 1 << (pos * 8 + bit)
+    return fingerprint
+
+
+def bands(fingerprint: int) -> list[int]:
+    return [(fingerprint >> (i * BAND_BITS)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def _to_signed(fingerprint: int) -> int:
+    """数据库的 BIGINT 为有符号 64 位"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+@dataclass
+class Duplicate:
+    """与新内容重复的已有内容"""
+    kind: str
+    entity_id: str
+    scope_id: Optional[str]
+    distance: int
+    merge: bool  # 按配置应返回已有内容而非拒绝
+
+
+def _is_live(db: Session, kind: str, entity_id: str) -> bool:
+    """候选内容仍然存在（已删除、已归档的内容其指纹可能尚未清理）"""
+    if kind == "discussion":
+        query = select(Discussion.id).where(Discussion.id == entity_id, Discussion.deleted_at.is_(None))
+    elif kind == "reply":
+        query = (
+            select(Reply.id).join(Discussion, Reply.discussion_pk == Discussion.pk)
+            .where(Reply.id == entity_id, Discussion.deleted_at.is_(None))
+        )
+    else:
+        query = select(Comment.id).where(Comment.id == entity_id)
+    return db.execute(query).first() is not None
+
+
+def find_duplicate(db: Session, kind: str, scope_id: Optional[str], fingerprint: int) -> Optional[Duplicate]:
+    """按段值查找候选，返回汉明距离在阈值内且最接近的已有内容"""
+    query = select(ContentFingerprint.entity_id, ContentFingerprint.scope_id, ContentFingerprint.simhash).where(
+        ContentFingerprint.kind == kind,
+        or_(*(
+            and_(ContentFingerprint.band == i, ContentFingerprint.band_value == value)
+            for i, value in enumerate(bands(fingerprint))
+        ))
+    )
+    if scope_id is not None and not settings.duplicate_cross_scope:
+        query = query.where(ContentFingerprint.scope_id == scope_id)
+    rows = db.execute(query.distinct()).all()
+    candidates = sorted(
+        (((stored & ((1 << 64) - 1)) ^ fingerprint).bit_count(), entity_id, stored_scope)
+        for entity_id, stored_scope, stored in rows
+    )
+    for distance, entity_id, stored_scope in candidates:
+        if distance > settings.duplicate_max_distance:
+            break
+        if _is_live(db, kind, entity_id):
+            merge = settings.duplicate_action == "merge" and stored_scope == scope_id
+            return Duplicate(kind, entity_id, stored_scope, distance, merge)
+    return None
+
+
+def check_duplicate(
+    db: Session,
+    kind: str,
+    scope_id: Optional[str],
+    text: str
+) -> tuple[Optional[int], Optional[Duplicate]]:
+    """返回 (新内容的指纹, 重复的已有内容)；检测关闭或内容过短时指纹为 None"""
+    if settings.duplicate_action == "off":
+        return None, None
+    fingerprint = simhash(text)
+    if fingerprint is None:
+        return None, None
+    return fingerprint, find_duplicate(db, kind, scope_id, fingerprint)
+
+
+def add_fingerprint(db: Session, kind: str, entity_id: str, scope_id: Optional[str], fingerprint: Optional[int]):
+    """写入新内容的分段指纹，与内容在同一事务内提交"""
+    if fingerprint is None:
+        return
+    stored = _to_signed(fingerprint)
+    db.add_all([
+        ContentFingerprint(
+            kind=kind, entity_id=entity_id, scope_id=scope_id, band=i, band_value=value, simhash=stored
+        )
+        for i, value in enumerate(bands(fingerprint))
+    ])
+
+
+def remove_fingerprints(db: Session, kind: str, entity_ids):
+    """删除内容的指纹，entity_ids 可以是 id 列表或子查询"""
+    db.execute(
+        delete(ContentFingerprint)
+        .where(ContentFingerprint.kind == kind, ContentFingerprint.entity_id.in_(entity_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _sources():
+    """每类内容的 (类型, 模型, 所属范围列, 取正文的函数)"""
+    return [
+        ("discussion", Discussion, None, lambda row: f"{row.title}\n{row.content}"),
+        ("reply", Reply, Reply.discussion_id, lambda row: row.content),
+        ("comment", Comment, Comment.project_id, lambda row: row.content),
+    ]
+
+
+def backfill_fingerprints(db: Session, batch_size: int = 1000) -> int:
+    """为尚无指纹的内容（历史、种子或导入数据）补算指纹，每批提交，返回处理的行数"""
+    if settings.duplicate_action == "off":
+        return 0
+    done = 0
+    for kind, model, scope, text_of in _sources():
+        fingerprinted = select(ContentFingerprint.entity_id).where(ContentFingerprint.kind == kind)
+        low = 0
+        while True:
+            rows = db.execute(
+                select(model).where(model.pk > low, model.id.not_in(fingerprinted))
+                .order_by(model.pk).limit(batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+            for row in rows:
+                scope_id = getattr(row, scope.key) if scope is not None else None
+                add_fingerprint(db, kind, row.id, scope_id, simhash(text_of(row)))
+            db.commit()
+            done += len(rows)
+            low = rows[-1].pk
+    return done
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        count = backfill_fingerprints(session)
+    finally:
+        session.close()
+    print(f"✅ 已检查 {count} 条尚无指纹的内容")
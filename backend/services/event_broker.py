@@ -0,0 +1,110 @@
+"""
+进程内事件广播
+写接口在提交后发布小体量的增量事件，按主题扇出给订阅者 (SSE 连接)
+
+主题约定:
+- discussions            讨论列表级事件（新讨论、点赞数、回复数变化）
+- discussion:{id}        单个讨论内的事件（新回复、回复点赞）
+- projects               项目网格级事件（点赞数、评论数变化）
+- project:{id}           单个项目内的事件（新评论）
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+TOPIC_PREFIXES = ("discussion:", "project:", "job:")
+TOPICS = ("discussions", "projects")
+
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+
+
+def is_valid_topic(topic: str) -> bool:
+    return topic in TOPICS or (topic.startswith(TOPIC_PREFIXES) and topic.split(":", 1)[1] != "")
+
+
+def format_event(event: str, data: Any) -> str:
+    """编码为 SSE 帧；每个事件只序列化一次，由所有订阅者共享"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """
+    单个订阅者，持有有界队列
+    队列满时说明客户端消费跟不上：清空积压并只保留一个 resync 事件，
+    客户端收到后重新拉取一次完整数据，服务端内存占用始终有上限
+    """
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics = frozenset(topics)
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue)
+        self.overflows = 0
+
+    def offer(self, frame: str):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+
+
+class EventBroker:
+    """按主题扇出事件的进程内广播器"""
+
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._topics: dict[str, set[Subscriber]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({sub for subs in self._topics.values() for sub in subs})
+
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(topics, self.max_queue)
+        for topic in subscriber.topics:
+            self._topics[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for topic in subscriber.topics:
+            subs = self._topics.get(topic)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del self._topics[topic]
+
+    def publish(self, topics: Iterable[str], event: str, data: Any):
+        """
+        向若干主题发布事件，同一订阅者即使订阅了多个命中主题也只收到一次
+        可以在事件循环线程外调用（如后台任务），此时转交给事件循环执行
+        """
+        topics = list(topics)
+        if not any(topic in self._topics for topic in topics):
+            return
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self.publish, topics, event, data)
+            return
+
+        frame = format_event(event, data)
+        targets = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        for subscriber in targets:
+            subscriber.offer(frame)
+
+
+broker = EventBroker(settings.events_queue_size)
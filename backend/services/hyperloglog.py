@@ -0,0 +1,56 @@
+"""
+HyperLogLog 基数估计
+用固定大小的寄存器数组估计不重复元素个数，精度 p=9 时占 512 字节，标准误差约 4.6%
+寄存器逐位取最大值即可合并，合并满足交换律与幂等性，适合多 worker 各自累积后汇总
+"""
+
+import hashlib
+import math
+from typing import Optional
+
+DEFAULT_PRECISION = 9
+
+
+class HyperLogLog:
+    """HyperLogLog 草图"""
+
+    def __init__(self, registers: Optional[bytes] = None, precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is not None and len(registers) == self.size:
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    def add(self, value: str) -> bool:
+        """加入一个元素，返回寄存器是否发生变化（未变化时无需持久化）"""
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> (64 - self.precision)
+        remaining = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> bool:
+        """并入另一个草图，返回自身是否发生变化"""
+        changed = False
+        for i, value in enumerate(other.registers):
+            if value > self.registers[i]:
+                self.registers[i] = value
+                changed = True
+        return changed
+
+    def estimate(self) -> int:
+        """估计不重复元素个数，小基数时使用线性计数修正"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
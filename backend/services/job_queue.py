@@ -0,0 +1,286 @@
+"""
+AI 任务队列
+AI 调用以任务形式写入 jobs 表，由进程内固定数量的协程按 (优先级, 提交顺序) 领取执行：
+- 交互式任务优先于后台批量任务，另有保留协程只处理交互式任务，批量任务只能占用剩余的并发
+- 相同任务键在排队或执行中时不重复提交，刚完成的结果在一段时间内直接复用
+- 领取通过单条 UPDATE ... RETURNING 完成，多个 worker 进程共享同一张表也不会重复执行；
+  执行进程中途退出的任务在超过执行超时后可被任一进程重新领取
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from models import Discussion, Job
+from services.deepseek_service import INSIGHT_FALLBACK, request_project_insight
+from services.event_broker import broker
+from services.thread_summary import refresh_summary
+
+settings = get_settings()
+
+PRIORITIES = {"interactive": 0, "background": 10}
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+JOB_HANDLERS: dict[str, JobHandler] = {}
+JOB_FALLBACKS: dict[str, Callable[[dict], Any]] = {}
+
+
+def job_handler(kind: str, fallback: Optional[Callable[[dict], Any]] = None):
+    """
+    注册任务类型的处理函数，处理函数接收 payload，返回可 JSON 序列化的结果
+    处理函数失败时应抛出异常以便重试；fallback 在最后一次尝试仍失败时生成兜底结果，
+    任务仍记为 failed，兜底结果不会被相同任务复用
+    """
+    def register(fn: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = fn
+        if fallback is not None:
+            JOB_FALLBACKS[kind] = fallback
+        return fn
+    return register
+
+
+def job_key(kind: str, payload: dict) -> str:
+    """默认去重键：任务类型 + 规范化 payload 的摘要"""
+    raw = json.dumps([kind, payload], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def submit_job(
+    db: Session,
+    kind: str,
+    payload: dict,
+    priority: str = "interactive",
+    key: Optional[str] = None
+) -> tuple[Job, bool]:
+    """
+    提交任务，调用方负责提交事务，返回 (任务, 是否新建)
+    相同键的任务正在排队或执行、或在 JOB_RESULT_TTL_SECONDS 内已完成时返回已有任务；
+    已有任务仍在排队时按更高的优先级执行
+    """
+    key = key or job_key(kind, payload)
+    level = PRIORITIES[priority]
+    fresh_after = datetime.utcnow() - timedelta(seconds=settings.job_result_ttl_seconds)
+    existing = (
+        db.query(Job)
+        .filter(
+            Job.job_key == key,
+            or_(
+                Job.status.in_(("queued", "running")),
+                (Job.status == "done") & (Job.finished_at >= fresh_after)
+            )
+        )
+        .order_by(Job.pk.desc())
+        .first()
+    )
+    if existing:
+        if existing.status == "queued" and existing.priority > level:
+            existing.priority = level
+        return existing, False
+
+    job = Job(kind=kind, job_key=key, priority=level, payload=payload)
+    db.add(job)
+    db.flush()
+    return job, True
+
+
+def job_event(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+    }
+
+
+class JobQueue:
+    """进程内的任务执行协程池"""
+
+    def __init__(self, workers: int, interactive_workers: int):
+        self.workers = workers
+        self.interactive_workers = min(interactive_workers, workers)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        prune_jobs()
+        self._tasks = [
+            asyncio.create_task(
+                self._run(PRIORITIES["interactive"] if i < self.interactive_workers else None),
+                name=f"job-worker-{i}"
+            )
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """停止领取新任务并等待执行中的任务结束"""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """本进程提交了新任务，唤醒空闲协程"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self, max_priority: Optional[int]):
+        while not self._stopping:
+            claimed = claim_job(max_priority)
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.job_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(*claimed)
+
+    async def _execute(self, pk: int, kind: str, payload: dict):
+        handler = JOB_HANDLERS.get(kind)
+        try:
+            if handler is None:
+                raise ValueError(f"未知的任务类型: {kind}")
+            result = await asyncio.wait_for(handler(payload or {}), settings.job_timeout_seconds)
+        except Exception as e:
+            job = finish_job(pk, error=f"{type(e).__name__}: {e}")
+            if job is not None and job.status == "failed":
+                self.failed += 1
+        else:
+            job = finish_job(pk, result=result)
+            self.completed += 1
+        if job is not None:
+            broker.publish([f"job:{job.id}"], "job.updated", job_event(job))
+
+
+def claim_job(max_priority: Optional[int] = None) -> Optional[tuple[int, str, dict]]:
+    """
+    原子地领取优先级最高、最早提交的排队任务，返回 (pk, 类型, payload)
+    执行超时仍为 running 的任务说明执行它的进程已退出，同样可以领取
+    """
+    stale = datetime.utcnow() - timedelta(seconds=settings.job_timeout_seconds + settings.job_poll_seconds)
+    claimable = or_(
+        Job.status == "queued",
+        (Job.status == "running") & (Job.started_at < stale) & (Job.attempts < settings.job_max_attempts)
+    )
+    candidate = select(Job.pk).where(claimable)
+    if max_priority is not None:
+        candidate = candidate.where(Job.priority <= max_priority)
+    candidate = candidate.order_by(Job.priority, Job.pk).limit(1).scalar_subquery()
+
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            update(Job)
+            .where(Job.pk == candidate, claimable)
+            .values(status="running", started_at=datetime.utcnow(), attempts=Job.attempts + 1)
+            .returning(Job.pk, Job.kind, Job.payload)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.commit()
+        return tuple(row) if row else None
+    finally:
+        db.close()
+
+
+def finish_job(pk: int, result: Any = None, error: Optional[str] = None) -> Optional[Job]:
+    """记录任务结果；失败且未达最大重试次数时重新排队"""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.pk == pk, Job.status == "running").first()
+        if job is None:
+            return None
+        if error is None:
+            job.status, job.result, job.error = "done", result, None
+        elif job.attempts < settings.job_max_attempts:
+            job.status, job.error = "queued", error
+        else:
+            job.status, job.error = "failed", error
+            fallback = JOB_FALLBACKS.get(job.kind)
+            if fallback is not None:
+                job.result = fallback(job.payload or {})
+        if job.status != "queued":
+            job.finished_at = datetime.utcnow()
+        db.commit()
+        db.refresh(job)
+        return job
+    finally:
+        db.close()
+
+
+def prune_jobs() -> int:
+    """
+    将多次中断、已无重试次数的任务标记为失败，并删除超过保留期的已结束任务，返回删除数
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.job_timeout_seconds + settings.job_poll_seconds)
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job)
+            .where(Job.status == "running", Job.started_at < stale, Job.attempts >= settings.job_max_attempts)
+            .values(status="failed", error="执行中断次数过多", finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        removed = db.execute(delete(Job).where(
+            Job.status.in_(("done", "failed")),
+            Job.finished_at < now - timedelta(days=settings.job_retention_days)
+        )).rowcount
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+
+job_queue = JobQueue(settings.job_workers, settings.job_interactive_workers)
+
+
+# ==================== 任务类型 ====================
+
+@job_handler("project_insight", fallback=lambda payload: {"insight": INSIGHT_FALLBACK})
+async def run_project_insight(payload: dict) -> dict:
+    insight = await request_project_insight(
+        title=payload.get("title", ""),
+        background_story=payload.get("backgroundStory", ""),
+        short_description=payload.get("shortDescription", "")
+    )
+    return {"insight": insight}
+
+
+@job_handler("thread_summary")
+async def run_thread_summary(payload: dict) -> dict:
+    db = SessionLocal()
+    try:
+        discussion = db.query(Discussion).filter(
+            Discussion.id == payload.get("discussionId"),
+            Discussion.deleted_at.is_(None)
+        ).first()
+        if not discussion:
+            raise ValueError("讨论不存在")
+        summary = await refresh_summary(db, discussion)
+        return {
+            "summary": summary.summary if summary else "",
+            "repliesCovered": summary.replies_covered if summary else 0,
+        }
+    finally:
+        db.close()
@@ -0,0 +1,250 @@
+"""
+点赞服务
+基于唯一约束的单语句 upsert 实现点赞去重，
+并在前面放置进程内布隆过滤器，使"该用户是否点赞过"在常见路径上无需访问数据库
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, delete, case, literal, union_all
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal, engine, dialect_insert
+from models import Project, Like, Discussion, DiscussionLike, Reply, ReplyLike
+from services.cache_versions import bump_versions, version_tracker
+
+settings = get_settings()
+
+# 点赞对象类型 -> (点赞记录模型, 外键列名, 被点赞模型)；外键指向被点赞对象的整数 pk，对外仍使用公开 id
+LIKE_TARGETS = {
+    "project": (Like, "project_pk", Project),
+    "discussion": (DiscussionLike, "discussion_pk", Discussion),
+    "reply": (ReplyLike, "reply_pk", Reply),
+}
+
+
+class BloomFilter:
+    """
+    定长布隆过滤器
+    只会误报 (判定为"可能存在")，不会漏报，因此"不存在"的结论可以直接信任
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+# 全量重建时容量相对已有记录数的余量
+FILTER_HEADROOM = 2
+
+
+def _key(target: str, target_id: str, user_identifier: str) -> str:
+    return f"{target}:{target_id}:{user_identifier}"
+
+
+class LikeFilter:
+    """
+    点赞成员过滤器
+    从三张点赞表加载，之后按各表的整数主键只追加上次加载之后的新记录。
+    点赞事务先递增 "like" 缓存版本再插入记录，版本号的行锁使点赞按主键顺序提交，
+    因此过滤器记下加载前读到的版本号：版本未变说明已包含全部点赞（含其他 worker 的），
+    版本变了则过滤器暂不作判定、一律回库确认，同时在后台线程中追加新记录。
+    重复点赞不插入记录，也不递增版本，不会使过滤器失效。
+    加载与追加都不在事件循环中执行。取消点赞无法从布隆过滤器中删除，只会导致一次回库确认，
+    误报随之累积，每隔 like_filter_refresh_seconds 在后台全量重建一次。
+    重建时容量取配置值与已有记录数的 FILTER_HEADROOM 倍中的较大者，记录数超过配置容量后不会反复重建。
+    """
+
+    def __init__(self):
+        self._bloom: Optional[BloomFilter] = None
+        self._version: Optional[int] = None  # 过滤器已包含的点赞对应的版本号
+        self._last_ids: dict[str, int] = {}  # 各表已加载到的主键
+        self._count = 0
+        self._capacity = 0  # 当前过滤器的设计容量
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._loading = False
+
+    def _load(self, version: int, full: bool):
+        """后台线程：全量重建或追加新记录；version 须在读取点赞表之前读取"""
+        try:
+            if full:
+                capacity = max(settings.like_filter_capacity, math.ceil(self._count * FILTER_HEADROOM))
+                bloom = BloomFilter(capacity, settings.like_filter_error_rate)
+                last_ids = {target: 0 for target in LIKE_TARGETS}
+                count = 0
+            else:
+                # 追加时直接写入正在使用的过滤器：只会置位，期间版本号未对齐，读取方不会据此判定
+                bloom, last_ids, count, capacity = self._bloom, dict(self._last_ids), self._count, self._capacity
+            db = SessionLocal()
+            try:
+                for target, (model, fk, parent) in LIKE_TARGETS.items():
+                    rows = db.execute(
+                        select(model.id, parent.id, model.user_identifier)
+                        .join(parent, parent.pk == getattr(model, fk))
+                        .where(model.id > last_ids[target])
+                        .order_by(model.id)
+                        .execution_options(yield_per=5000)
+                    )
+                    for like_id, target_id, user_identifier in rows:
+                        bloom.add(_key(target, target_id, user_identifier))
+                        last_ids[target] = like_id
+                        count += 1
+            finally:
+                db.close()
+            with self._lock:
+                self._bloom, self._last_ids, self._count, self._version = bloom, last_ids, count, version
+                self._capacity = capacity
+                if full:
+                    self._built_at = time.monotonic()
+        except Exception as e:
+            print(f"点赞过滤器加载失败: {e}")
+        finally:
+            self._loading = False
+
+    def usable(self) -> bool:
+        """过滤器已包含当前全部点赞时返回 True；否则在后台加载或追加，本次调用方应回库确认"""
+        version = version_tracker.versions().get("like", 0)
+        current = self._bloom is not None and self._version == version
+        # 超出容量后误报率上升，与累积的已取消点赞一样靠全量重建恢复
+        full = (
+            self._bloom is None
+            or self._count > self._capacity
+            or time.monotonic() - self._built_at >= settings.like_filter_refresh_seconds
+        )
+        if not current or full:
+            with self._lock:
+                if not self._loading:
+                    self._loading = True
+                    threading.Thread(target=self._load, args=(version, full), daemon=True).start()
+        return current
+
+    def might_contain(self, target: str, target_id: str, user_identifier: str) -> bool:
+        """只在 usable() 为 True 时有意义"""
+        return _key(target, target_id, user_identifier) in self._bloom
+
+
+like_filter = LikeFilter()
+
+
+def set_like(
+    db: Session,
+    target: str,
+    target_id: str,
+    user_identifier: str,
+    is_liking: bool,
+    *criteria
+) -> Optional[tuple[int, bool, bool]]:
+    """
+    设置点赞状态，返回 (最新点赞数, 是否已点赞, 本次是否发生变化)；被点赞对象不存在时返回 None
+
+    先按公开 id 取得被点赞对象的 pk，点赞记录由唯一约束去重：点赞走 INSERT ... ON CONFLICT DO NOTHING，
+    取消走 DELETE，再按是否真正发生变化决定是否调整计数。
+    criteria 为定位被点赞对象时附加的过滤条件（如回复所属的讨论）。
+    调用方负责提交事务，返回 None 时不应提交。
+    """
+    like_model, fk, parent = LIKE_TARGETS[target]
+    fk_column = getattr(like_model, fk)
+
+    target_pk = db.execute(select(parent.pk).where(parent.id == target_id, *criteria)).scalar()
+    if target_pk is None:
+        return None
+
+    existing = (fk_column == target_pk, like_model.user_identifier == user_identifier)
+    if is_liking:
+        # 已点赞时无需写入，也不递增版本，过滤器保持可用
+        if db.execute(select(like_model.id).where(*existing)).first() is not None:
+            changed = False
+        else:
+            # 先递增版本再插入：版本号行锁使点赞记录按主键顺序提交，过滤器据此增量追加；
+            # 并发的相同点赞仍由唯一约束去重，最多多递增一次版本
+            bump_versions(db, "like")
+            stmt = dialect_insert(like_model).values(
+                user_identifier=user_identifier, **{fk: target_pk}
+            ).on_conflict_do_nothing(index_elements=[fk_column, like_model.user_identifier])
+            changed = db.execute(stmt).rowcount == 1
+    else:
+        changed = db.execute(delete(like_model).where(*existing)).rowcount == 1
+
+    where = [parent.pk == target_pk]
+    if changed:
+        new_count = (parent.likes_count + 1) if is_liking else case(
+            (parent.likes_count > 0, parent.likes_count - 1), else_=0
+        )
+        stmt = update(parent).where(*where).values(likes_count=new_count)
+        if engine.dialect.update_returning:
+            likes_count = db.execute(stmt.returning(parent.likes_count)).scalar()
+        else:
+            db.execute(stmt)
+            likes_count = db.execute(select(parent.likes_count).where(*where)).scalar()
+    else:
+        likes_count = db.execute(select(parent.likes_count).where(*where)).scalar()
+
+    return likes_count, is_liking, changed
+
+
+def has_liked(db: Session, target: str, target_id: str, user_identifier: str) -> bool:
+    """判断用户是否点赞过某对象，过滤器判定为"未点赞"时不访问数据库"""
+    return target_id in liked_ids(db, target, [target_id], user_identifier)
+
+
+def liked_ids(db: Session, target: str, target_ids: Iterable[str], user_identifier: str) -> set[str]:
+    """返回 target_ids 中该用户已点赞的子集，只对过滤器无法排除的 id 回库确认"""
+    return liked_state(db, {target: target_ids}, user_identifier)[target]
+
+
+def liked_state(
+    db: Session,
+    targets: dict[str, Iterable[str]],
+    user_identifier: str,
+    use_filter: bool = True
+) -> dict[str, set[str]]:
+    """
+    批量查询多类对象的点赞状态，返回 {对象类型: 已点赞 id 集合}
+    过滤器排除"未点赞"的 id 后，剩余候选用一条 UNION ALL 查询确认；过滤器落后于最新点赞时全部回库
+    过滤器只覆盖热库，查询归档库时应传 use_filter=False
+    """
+    use_filter = use_filter and like_filter.usable()
+    result: dict[str, set[str]] = {target: set() for target in targets}
+    selects = []
+    for target, target_ids in targets.items():
+        candidates = [
+            target_id for target_id in set(target_ids)
+            if not use_filter or like_filter.might_contain(target, target_id, user_identifier)
+        ]
+        if not candidates:
+            continue
+        like_model, fk, parent = LIKE_TARGETS[target]
+        selects.append(
+            select(literal(target).label("target"), parent.id.label("target_id"))
+            .join(like_model, getattr(like_model, fk) == parent.pk)
+            .where(parent.id.in_(candidates), like_model.user_identifier == user_identifier)
+        )
+
+    if not selects:
+        return result
+
+    stmt = selects[0] if len(selects) == 1 else union_all(*selects)
+    for target, target_id in db.execute(stmt):
+        result[target].add(target_id)
+    return result
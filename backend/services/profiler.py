@@ -0,0 +1,141 @@
+"""
+按需请求级采样剖析器
+周期性采样处理请求的线程调用栈，输出折叠栈 (folded stacks) 格式，
+可直接交给 flamegraph.pl、speedscope 或 inferno 生成火焰图
+"""
+
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from config import get_settings
+
+settings = get_settings()
+
+PROFILE_SUFFIX = ".folded"
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _fold_stack(frame) -> str:
+    """将栈帧链转换为 root;...;leaf 形式的折叠栈"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    对指定线程进行定时栈采样
+
+    async 路由、Pydantic 转换和同步的 SQLAlchemy 调用都运行在事件循环线程上，
+    因此采样该线程即可覆盖一次请求的主要耗时。
+    同一 worker 上并发处理的其他请求也可能出现在采样中。
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._started_at = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_fold_stack(frame)] += 1
+
+    def to_folded(self) -> str:
+        """导出折叠栈文本，每行 "栈 次数" """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def is_trusted(token: Optional[str]) -> bool:
+    """校验剖析令牌，未配置令牌时一律拒绝"""
+    if not settings.profiling_token or not token:
+        return False
+    return secrets.compare_digest(token, settings.profiling_token)
+
+
+def save_profile(profiler: SamplingProfiler, request: Request) -> str:
+    """将剖析结果写入输出目录，返回文件名"""
+    os.makedirs(settings.profiling_output_dir, exist_ok=True)
+    path = _UNSAFE_CHARS.sub("_", request.url.path).strip("_") or "root"
+    name = (
+        f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.method}-{path}"
+        f"-{profiler.duration * 1000:.0f}ms{PROFILE_SUFFIX}"
+    )
+    with open(os.path.join(settings.profiling_output_dir, name), "w", encoding="utf-8") as f:
+        f.write(profiler.to_folded())
+    return name
+
+
+def resolve_profile_path(name: str) -> Optional[str]:
+    """根据文件名定位剖析文件，拒绝任何路径穿越"""
+    if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+        return None
+    path = os.path.join(settings.profiling_output_dir, name)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    请求剖析中间件
+
+    - 受信任请求 (X-Profile-Token 头或 profile_token 参数) 总会被剖析，
+      结果文件名通过 X-Profile-File 响应头返回；
+      若同时携带 X-Profile: return，则直接以折叠栈文本作为响应体返回
+    - profiling_sample_rate > 0 时随机剖析该比例的请求并落盘，用于持续剖析
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if not settings.profiling_enabled:
+            return await call_next(request)
+
+        token = request.headers.get("X-Profile-Token") or request.query_params.get("profile_token")
+        trusted = is_trusted(token)
+        if not trusted and random.random() >= settings.profiling_sample_rate:
+            return await call_next(request)
+
+        profiler = SamplingProfiler(threading.get_ident(), settings.profiling_interval_ms / 1000)
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+
+        if trusted and request.headers.get("X-Profile") == "return":
+            return PlainTextResponse(
+                profiler.to_folded(),
+                headers={"X-Profile-Duration-Ms": f"{profiler.duration * 1000:.1f}"}
+            )
+
+        name = save_profile(profiler, request)
+        if trusted:
+            response.headers["X-Profile-File"] = name
+        return response
@@ -0,0 +1,96 @@
+"""
+提示词预算
+调用模型前按 token 预算截断过长的输入，使单次请求的耗时与费用可预期。
+token 数按字符类别估算（中文约 0.6 token/字，其他字符约 0.3 token/字），无需加载分词器；
+截断时保留开头与结尾，中间以省略号代替。
+"""
+
+import math
+import re
+
+_CJK = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+CJK_TOKENS = 0.6
+OTHER_TOKENS = 0.3
+
+ELLIPSIS = "……"
+
+# 截断时开头保留的比例，其余留给结尾
+HEAD_RATIO = 2 / 3
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return math.ceil(cjk * CJK_TOKENS + (len(text) - cjk) * OTHER_TOKENS)
+
+
+def compact(text: str) -> str:
+    """压缩连续空白与空行"""
+    text = _SPACES.sub(" ", text or "")
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """压缩空白后仍超出预算时，保留开头与结尾，截去中间部分"""
+    text = compact(text)
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+
+    # 按平均每字 token 数换算保留的字数，再逐步收紧直到满足预算
+    per_char = estimate_tokens(text) / len(text)
+    keep = int((budget - estimate_tokens(ELLIPSIS)) / per_char)
+    while keep > 0:
+        head = math.ceil(keep * HEAD_RATIO)
+        result = text[:head] + ELLIPSIS + text[len(text) - (keep - head):] if keep > head else text[:head] + ELLIPSIS
+        if estimate_tokens(result) <= budget:
+            return result
+        keep = int(keep * 0.95)
+    return ""
+
+
+def fit_fields(fields: dict[str, str], budget: int) -> dict[str, str]:
+    """
+    多个字段共享一个预算：较短的字段原样保留，剩余预算在较长的字段之间平均分配
+    """
+    fields = {name: compact(value) for name, value in fields.items()}
+    costs = {name: estimate_tokens(value) for name, value in fields.items()}
+    if sum(costs.values()) <= budget:
+        return fields
+
+    remaining = budget
+    pending = sorted(fields, key=lambda name: costs[name])
+    allowance: dict[str, int] = {}
+    while pending:
+        share = remaining // len(pending)
+        name = pending[0]
+        if costs[name] > share:
+            # 其余字段都不短于当前字段，均分剩余预算
+            for name in pending:
+                allowance[name] = share
+            break
+        allowance[name] = costs[name]
+        remaining -= costs[name]
+        pending.pop(0)
+    return {name: truncate_to_tokens(value, allowance[name]) for name, value in fields.items()}
+
+
+def fit_messages(messages: list[dict], budget: int) -> list[dict]:
+    """消息总长超出预算时，从最后一条用户消息中截去超出的部分"""
+    total = sum(estimate_tokens(m.get("content", "")) for m in messages)
+    if total <= budget:
+        return messages
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index].get("role") == "user":
+            content = messages[index]["content"]
+            allowed = max(estimate_tokens(content) - (total - budget), 0)
+            fitted = list(messages)
+            fitted[index] = {**messages[index], "content": truncate_to_tokens(content, allowed)}
+            return fitted
+    return messages
@@ -0,0 +1,112 @@
+"""
+批量删除服务
+删除不再把子记录逐条加载进会话：项目用集合式 DELETE 一次删除评论与点赞；
+讨论先软删除立即返回，回复由后台按批次清理，每批单独提交，事务与锁持有时间都有上限
+
+SQLite 默认不启用外键约束，模型上的 ON DELETE CASCADE 只对新建的表和 PostgreSQL 生效，
+这里的显式删除保证已有数据库同样不会留下孤儿记录
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from models import (
+    Project, Comment, Like, Discussion, DiscussionLike, Reply, ReplyLike, ProjectVector, ProjectNeighbor,
+    ThreadSummary
+)
+from services.cache_versions import bump_versions
+from services.duplicates import remove_fingerprints
+
+settings = get_settings()
+
+
+def delete_project_tree(db: Session, project_id: str) -> bool:
+    """集合式删除项目及其评论、点赞，调用方负责提交事务；项目不存在时返回 False"""
+    project_pk = db.execute(select(Project.pk).where(Project.id == project_id)).scalar()
+    if project_pk is None:
+        return False
+    db.execute(delete(Like).where(Like.project_pk == project_pk))
+    remove_fingerprints(db, "comment", select(Comment.id).where(Comment.project_pk == project_pk))
+    db.execute(delete(Comment).where(Comment.project_pk == project_pk))
+    # 其他项目的相关列表因此少一项，下次全量重建时补齐
+    db.execute(delete(ProjectNeighbor).where(
+        (ProjectNeighbor.project_pk == project_pk) | (ProjectNeighbor.neighbor_pk == project_pk)
+    ))
+    db.execute(delete(ProjectVector).where(ProjectVector.project_pk == project_pk))
+    # 各 worker 缓存的相关项目语料随之失效
+    bump_versions(db, "related")
+    result = db.execute(
+        delete(Project).where(Project.pk == project_pk).execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def soft_delete_discussion(db: Session, discussion_id: str) -> bool:
+    """查出未删除的讨论并标记 deleted_at，调用方负责提交事务；讨论不存在或已删除时返回 False"""
+    discussion = db.query(Discussion).filter(
+        Discussion.id == discussion_id,
+        Discussion.deleted_at.is_(None)
+    ).first()
+    if not discussion:
+        return False
+    discussion.deleted_at = datetime.utcnow()
+    return True
+
+
+def purge_discussion(discussion_id: str, batch_size: int = 0) -> int:
+    """
+    分批物理删除讨论的回复及点赞记录，最后删除讨论本身，返回删除的回复数
+    每批单独提交，中途中断后可以重复执行
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    purged = 0
+    db = SessionLocal()
+    try:
+        discussion_pk = db.execute(select(Discussion.pk).where(Discussion.id == discussion_id)).scalar()
+        if discussion_pk is None:
+            return 0
+        while True:
+            rows = db.execute(
+                select(Reply.pk, Reply.id).where(Reply.discussion_pk == discussion_pk).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            reply_pks = [row.pk for row in rows]
+            db.execute(delete(ReplyLike).where(ReplyLike.reply_pk.in_(reply_pks)))
+            remove_fingerprints(db, "reply", [row.id for row in rows])
+            db.execute(
+                delete(Reply).where(Reply.pk.in_(reply_pks)).execution_options(synchronize_session=False)
+            )
+            db.commit()
+            purged += len(rows)
+
+        db.execute(delete(DiscussionLike).where(DiscussionLike.discussion_pk == discussion_pk))
+        db.execute(delete(ThreadSummary).where(ThreadSummary.discussion_pk == discussion_pk))
+        remove_fingerprints(db, "discussion", [discussion_id])
+        db.execute(
+            delete(Discussion)
+            .where(Discussion.pk == discussion_pk, Discussion.deleted_at.is_not(None))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    return purged
+
+
+def purge_deleted_discussions(limit: int = 100) -> int:
+    """清理所有已软删除但尚未物理删除的讨论（如进程在清理中途退出），返回处理的讨论数"""
+    db = SessionLocal()
+    try:
+        discussion_ids = db.execute(
+            select(Discussion.id).where(Discussion.deleted_at.is_not(None)).limit(limit)
+        ).scalars().all()
+    finally:
+        db.close()
+    for discussion_id in discussion_ids:
+        purge_discussion(discussion_id)
+    return len(discussion_ids)
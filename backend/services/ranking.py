@@ -0,0 +1,152 @@
+"""
+热度排行服务
+热度分 = Σ 权重 × 2^((事件时间 - 基准点) / 半衰期)
+
+以固定基准点记分，旧事件的贡献无需随时间逐条衰减：所有分数同乘一个因子不改变排序，
+因此每次点赞、回复、浏览只需对单行做一次加法，按分数索引即可直接取 Top-N。
+分数随时间指数增长，由定时任务把基准点移到当前时刻并整体缩放 (rescale)；
+记分只在读到的基准点仍然有效时生效，与其他 worker 的缩放并发时按新基准点重算。
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, exists, func, select, update
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from models import Project, Discussion, RankingState
+
+settings = get_settings()
+
+STATE_NAME = "trending"
+
+# 基准点被其他 worker 移动时记分的重试次数
+BUMP_ATTEMPTS = 3
+
+EVENT_WEIGHTS = {
+    "create": lambda: settings.trending_weight_create,
+    "like": lambda: settings.trending_weight_like,
+    "reply": lambda: settings.trending_weight_reply,
+    "view": lambda: settings.trending_weight_view,
+}
+
+
+def _half_lives(since: datetime, now: datetime) -> float:
+    return (now - since).total_seconds() / (settings.trending_half_life_hours * 3600)
+
+
+def _get_epoch(db: Session, now: datetime) -> datetime:
+    """读取当前基准点，首次使用时以当前时刻初始化"""
+    state = db.get(RankingState, STATE_NAME)
+    if state is None:
+        state = RankingState(name=STATE_NAME, epoch=now)
+        db.add(state)
+        db.flush()
+    return state.epoch
+
+
+def bump_trending(db: Session, model, entity_id: str, event: str, now: Optional[datetime] = None):
+    """
+    记录一次热度事件（create / like / reply / view），调用方负责提交事务
+    只更新 trending_score，不改动 updated_at；从不触发缩放，缩放只由定时任务执行
+    """
+    now = now or datetime.utcnow()
+    epoch = _get_epoch(db, now)
+    for _ in range(BUMP_ATTEMPTS):
+        delta = EVENT_WEIGHTS[event]() * 2 ** _half_lives(epoch, now)
+        # 以读到的基准点为条件：期间被缩放过则不加分，重新读取基准点后重算
+        result = db.execute(
+            update(model)
+            .where(
+                model.id == entity_id,
+                exists().where(RankingState.name == STATE_NAME, RankingState.epoch == epoch)
+            )
+            .values(
+                trending_score=func.coalesce(model.trending_score, 0.0) + delta,
+                updated_at=model.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return
+        current = db.execute(select(RankingState.epoch).where(RankingState.name == STATE_NAME)).scalar()
+        if current == epoch:
+            return  # 基准点未变，对象不存在
+        epoch = current
+
+
+def rescale_trending(db: Session, now: Optional[datetime] = None):
+    """
+    将基准点移到当前时刻并等比缩放所有热度分，排序不变
+    由定时任务周期调用；先更新基准点，并发的记分据此判定基准点已变而重算
+    """
+    now = now or datetime.utcnow()
+    state = db.get(RankingState, STATE_NAME)
+    if state is None:
+        _get_epoch(db, now)
+        return
+
+    factor = 2 ** -_half_lives(state.epoch, now)
+    state.epoch = now
+    db.flush()
+    for model in (Project, Discussion):
+        db.execute(
+            update(model)
+            .where(model.trending_score.is_not(None))
+            .values(trending_score=model.trending_score * factor, updated_at=model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def backfill_trending(db: Session, batch_size: int = 1000):
+    """
+    为尚无热度分的行（新增列前的历史数据、种子数据）按现有计数估算初始分
+    所有历史互动视为发生在最后活跃时刻
+    """
+    now = datetime.utcnow()
+    epoch = _get_epoch(db, now)
+
+    def initial_score(likes: int, replies: int, views: int, active_at: Optional[datetime]) -> float:
+        weight = (
+            settings.trending_weight_create
+            + settings.trending_weight_like * (likes or 0)
+            + settings.trending_weight_reply * (replies or 0)
+            + settings.trending_weight_view * (views or 0)
+        )
+        return weight * 2 ** _half_lives(epoch, active_at or now)
+
+    def load(model, activity):
+        return db.execute(
+            select(model.id, model.likes_count, *activity)
+            .where(model.trending_score.is_(None))
+            .limit(batch_size)
+        ).all()
+
+    def store(model, scores: list[dict]):
+        if scores:
+            table = model.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("entity_id"))
+                .values(trending_score=bindparam("score"), updated_at=table.c.updated_at),
+                scores
+            )
+
+    while True:
+        projects = load(Project, [Project.comments_count, Project.created_at])
+        store(Project, [
+            {"entity_id": pid, "score": initial_score(likes, comments, 0, created_at)}
+            for pid, likes, comments, created_at in projects
+        ])
+        discussions = load(Discussion, [
+            Discussion.replies_count, Discussion.views_count,
+            func.coalesce(Discussion.last_reply_at, Discussion.created_at)
+        ])
+        store(Discussion, [
+            {"entity_id": did, "score": initial_score(likes, replies, views, active_at)}
+            for did, likes, replies, views, active_at in discussions
+        ])
+        db.commit()
+        if len(projects) < batch_size and len(discussions) < batch_size:
+            break
@@ -0,0 +1,182 @@
+"""
+准入控制与限流
+- 每个客户端（X-User-Identifier，缺失时为客户端 IP）在每类路由上各有一个令牌桶，预算在 Settings 中配置
+- 每类路由 (ai / writes / reads) 另有全局并发上限，超出时立即拒绝而不是排队
+超出预算的请求直接返回 429 和 Retry-After，不进入路由处理，昂贵路径（SQLite 写入、DeepSeek 调用）
+因此不会被单个客户端占满。
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import get_settings
+
+settings = get_settings()
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# 不限流的路径前缀：SSE 长连接会一直占用并发名额，文档页面无需限制
+EXEMPT_PREFIXES = ("/api/events", "/api/docs", "/api/redoc", "/api/openapi.json")
+
+# 以 POST 提交查询参数、只读数据的路径，按读请求限流
+READ_ONLY_POSTS = {"/api/likes/state"}
+
+# 限流规则 -> (每分钟令牌数, 桶容量, 并发类别)
+RULES = {
+    "ai": (lambda: settings.rate_limit_ai_per_minute, lambda: settings.rate_limit_ai_burst, "ai"),
+    "likes": (lambda: settings.rate_limit_likes_per_minute, lambda: settings.rate_limit_likes_burst, "writes"),
+    "writes": (lambda: settings.rate_limit_writes_per_minute, lambda: settings.rate_limit_writes_burst, "writes"),
+    "reads": (lambda: settings.rate_limit_reads_per_minute, lambda: settings.rate_limit_reads_burst, "reads"),
+}
+
+CONCURRENCY = {
+    "ai": lambda: settings.concurrency_ai,
+    "writes": lambda: settings.concurrency_writes,
+    "reads": lambda: settings.concurrency_reads,
+}
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """返回请求所属的限流规则，不限流的请求返回 None"""
+    if method == "OPTIONS" or not path.startswith("/api") or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/api/ai") or (method == "POST" and path == "/api/jobs"):
+        return "ai"
+    if method in WRITE_METHODS and path not in READ_ONLY_POSTS:
+        return "likes" if path.endswith("/like") else "writes"
+    return "reads"
+
+
+def client_key(request: Request) -> str:
+    """限流键：优先使用 X-User-Identifier，缺失时退回客户端 IP"""
+    identifier = request.headers.get("X-User-Identifier")
+    if identifier and identifier != "anonymous":
+        return identifier
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度补充，最多攒 capacity 个"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """尝试取走一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    进程内准入控制器
+    运行在事件循环线程中，计数无需加锁；多 worker 部署时每个 worker 各自计数，实际预算约为配置值乘以 worker 数
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+        self._in_flight = {route_class: 0 for route_class in CONCURRENCY}
+        self.rejected = {rule: 0 for rule in RULES}
+
+    def check_rate(self, rule: str, client: str, now: Optional[float] = None) -> float:
+        """消耗一个令牌，返回 0 表示放行，否则为建议的重试等待秒数；每分钟令牌数配置为 0 表示不限流"""
+        per_minute, burst, _ = RULES[rule]
+        if per_minute() <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        key = (rule, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(per_minute() / 60, burst(), now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+    def try_acquire(self, route_class: str) -> bool:
+        limit = CONCURRENCY[route_class]()
+        if limit and self._in_flight[route_class] >= limit:
+            return False
+        self._in_flight[route_class] += 1
+        return True
+
+    def release(self, route_class: str):
+        self._in_flight[route_class] -= 1
+
+
+admission = AdmissionController(settings.rate_limit_max_clients)
+
+
+def _reject(rule: str, retry_after: float) -> JSONResponse:
+    admission.rejected[rule] += 1
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "请求过于频繁，请稍后再试"},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    """
+    准入控制中间件：先占用路由类别的并发名额，再检查客户端令牌桶
+    因并发已满被拒绝的请求不消耗令牌；名额在响应体发送完毕（或请求异常结束）后才释放，
+    流式响应在整个发送期间都计入并发。以纯 ASGI 中间件实现，BaseHTTPMiddleware 的 call_next 在响应头返回时即结束。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        rule = classify(request.method, request.url.path)
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        route_class = RULES[rule][2]
+        if not admission.try_acquire(route_class):
+            return await _reject(rule, 1)(scope, receive, send)
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                admission.release(route_class)
+
+        retry_after = admission.check_rate(rule, client_key(request))
+        if retry_after:
+            release()
+            return await _reject(rule, retry_after)(scope, receive, send)
+
+        async def send_and_release(message: Message):
+            try:
+                await send(message)
+            finally:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    release()
+
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            release()
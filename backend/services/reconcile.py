@@ -0,0 +1,176 @@
+"""
+计数校正
+项目的评论数、点赞数，讨论的回复数、点赞数与回复的点赞数是冗余计数，由写接口增减维护，
+并发写入或批量操作后可能与明细表不一致。本模块按主键区间分批，用一条 LEFT JOIN + GROUP BY
+查询找出计数与明细不符的行，只更新这些行，并报告偏差。
+
+点赞记录是引入按用户去重之后才有的，早期（及种子数据中）的点赞没有明细，
+因此点赞数只在小于点赞记录数时校正，偏大的只计入报告。
+
+用法: python -m services.reconcile [--batch-size 5000] [--dry-run]
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from models import Project, Comment, Like, Discussion, Reply, DiscussionLike, ReplyLike
+from services.cache_versions import bump_versions
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CountTarget:
+    """一个冗余计数：parent.column 应等于 child 中 fk 指向该行 pk 的记录数"""
+    name: str
+    parent: type
+    column: str
+    child: type
+    fk: str
+    cache_entity: str
+    only_raise: bool = False  # 只校正偏小的计数
+
+
+TARGETS = [
+    CountTarget("project_comments", Project, "comments_count", Comment, "project_pk", "project"),
+    CountTarget("project_likes", Project, "likes_count", Like, "project_pk", "project", only_raise=True),
+    CountTarget("discussion_replies", Discussion, "replies_count", Reply, "discussion_pk", "discussion"),
+    CountTarget("discussion_likes", Discussion, "likes_count", DiscussionLike, "discussion_pk", "discussion", only_raise=True),
+    CountTarget("reply_likes", Reply, "likes_count", ReplyLike, "reply_pk", "reply", only_raise=True),
+]
+
+
+@dataclass
+class DriftReport:
+    """单个计数的校正结果"""
+    checked: int = 0  # 检查的行数
+    drifted: int = 0  # 计数与明细不符的行数
+    fixed: int = 0  # 实际更新的行数（并发修改过的行留待下次）
+    drift: int = 0  # 偏差绝对值之和
+
+
+def _drifted_rows(db: Session, target: CountTarget, low: int, high: int) -> list[tuple[int, int, int]]:
+    """主键区间 (low, high] 内计数与明细不符的行: (pk, 当前计数, 实际记录数)"""
+    parent, child = target.parent, target.child
+    stored = func.coalesce(getattr(parent, target.column), 0)
+    actual = func.count(child.id)
+    return db.execute(
+        select(parent.pk, stored, actual)
+        .outerjoin(child, getattr(child, target.fk) == parent.pk)
+        .where(parent.pk > low, parent.pk <= high)
+        .group_by(parent.pk, stored)
+        .having(stored != actual)
+    ).all()
+
+
+def reconcile_target(
+    db: Session,
+    target: CountTarget,
+    batch_size: int = 0,
+    dry_run: bool = False
+) -> DriftReport:
+    """校正一个冗余计数，每批单独提交"""
+    batch_size = batch_size or settings.reconcile_batch_size
+    parent = target.parent
+    column = getattr(parent, target.column)
+    report = DriftReport()
+    values = {target.column: bindparam("b_actual")}
+    if hasattr(parent, "updated_at"):
+        values["updated_at"] = parent.updated_at
+    fix = (
+        update(parent)
+        .where(parent.pk == bindparam("b_pk"), func.coalesce(column, 0) == bindparam("b_stored"))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+    low = 0
+    max_pk = db.execute(select(func.max(parent.pk))).scalar() or 0
+    while low < max_pk:
+        # 先取本批的上界，区间按主键划分，批次之间不重叠也不遗漏
+        high = db.execute(
+            select(parent.pk).where(parent.pk > low).order_by(parent.pk).offset(batch_size - 1).limit(1)
+        ).scalar() or max_pk
+        report.checked += db.execute(
+            select(func.count()).select_from(parent).where(parent.pk > low, parent.pk <= high)
+        ).scalar()
+
+        rows = _drifted_rows(db, target, low, high)
+        report.drifted += len(rows)
+        report.drift += sum(abs(stored - actual) for _, stored, actual in rows)
+        updates = [
+            {"b_pk": row_pk, "b_stored": stored, "b_actual": actual}
+            for row_pk, stored, actual in rows
+            if not (target.only_raise and stored > actual)
+        ]
+        if updates and not dry_run:
+            # 以读到的计数为条件更新，期间被并发修改过的行不覆盖
+            report.fixed += db.connection().execute(fix, updates).rowcount
+            bump_versions(db, target.cache_entity)
+            db.commit()
+        low = high
+    return report
+
+
+def reconcile_counts(
+    db: Session,
+    batch_size: int = 0,
+    dry_run: bool = False,
+    targets: Optional[list[str]] = None
+) -> dict[str, DriftReport]:
+    """校正全部（或指定的）冗余计数，返回各计数的偏差报告"""
+    return {
+        target.name: reconcile_target(db, target, batch_size, dry_run)
+        for target in TARGETS
+        if targets is None or target.name in targets
+    }
+
+
+def run_reconcile():
+    """定时任务入口"""
+    db = SessionLocal()
+    try:
+        reports = reconcile_counts(db)
+    finally:
+        db.close()
+    drifted = {name: report for name, report in reports.items() if report.fixed}
+    if drifted:
+        print("🔧 计数校正: " + "，".join(
+            f"{name} {report.fixed}/{report.drifted} 行 (偏差 {report.drift})" for name, report in drifted.items()
+        ))
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="校正项目、讨论与回复的冗余计数")
+    parser.add_argument("--batch-size", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="只报告偏差，不修改")
+    parser.add_argument("--targets", help=f"逗号分隔，可选: {','.join(t.name for t in TARGETS)}")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        reports = reconcile_counts(
+            db, args.batch_size, args.dry_run, args.targets.split(",") if args.targets else None
+        )
+    finally:
+        db.close()
+    for name, report in reports.items():
+        print(
+            f"  {name:20} 检查 {report.checked} 行，不一致 {report.drifted} 行，"
+            f"已校正 {report.fixed} 行，偏差合计 {report.drift}",
+            file=sys.stderr
+        )
+    print(f"✅ 计数校正完成 ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _main()
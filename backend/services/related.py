@@ -0,0 +1,345 @@
+"""
+相关项目服务
+对标题、完整描述与标签提取特征（英文按词，中文按相邻两字的 bigram），哈希到固定维度后以 TF-IDF 加权，
+按余弦相似度为每个项目预先计算 top-k 相关项目写入 project_neighbors 表，查询时按 rank 取 k 行即可。
+
+各 worker 在进程内缓存整个语料（按加载时的 IDF 加权并归一化的稀疏向量，以项目的整数 pk 标识），以 cache_versions 中 related 的版本为戳，
+其他进程修改或删除向量后才从库中重新加载。新建或修改项目时只替换该项目的一行，
+再用它与全部向量做一次稀疏点积 (O(非零项数)) 得到它所在的行与列，据此更新受影响项目的列表，不必两两重算；
+IDF 在缓存期间保持不变，语料增长超过 IDF_REFRESH_GROWTH 时重新加载，全量重建可用 python -m services.related 执行。
+本模块依赖 NumPy，路由与启动流程在用到时才导入，不增加 worker 的启动耗时。
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal, dialect_insert
+from models import CacheVersion, Project, ProjectVector, ProjectNeighbor
+from services.cache_versions import bump_versions
+
+settings = get_settings()
+
+# 哈希特征维度，修改后需全量重建
+FEATURE_DIM = 1 << 12
+
+# 标题与标签比描述更能代表项目主题
+TITLE_WEIGHT = 2
+TAG_WEIGHT = 3
+
+# 全量重建时每次参与矩阵乘法的行数，限制峰值内存；增量更新时也按此批量读取候选项目的列表
+CHUNK_SIZE = 512
+
+# 缓存的语料比加载时多出这一比例的项目后重新加载，刷新 IDF
+IDF_REFRESH_GROWTH = 0.1
+
+# cache_versions 中的实体类型，项目向量增删改时递增
+RELATED_VERSION = "related"
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CJK = re.compile(r"[\u4e00-\u9fff]+")
+
+# 同一进程内的增量更新串行执行，避免相互覆盖邻居列表
+_lock = threading.Lock()
+
+
+def _terms(text: str) -> Iterable[str]:
+    """英文与数字按词切分，中文连续片段切成相邻两字的 bigram（单字片段保留单字）"""
+    text = (text or "").lower()
+    for word in _WORD.findall(text):
+        if len(word) > 1:
+            yield f"w:{word}"
+    for run in _CJK.findall(text):
+        if len(run) == 1:
+            yield f"c:{run}"
+        for i in range(len(run) - 1):
+            yield f"c:{run[i:i + 2]}"
+
+
+def _bucket(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little") % FEATURE_DIM
+
+
+def extract_features(title: str, full_description: str, tags: Optional[list]) -> tuple[np.ndarray, np.ndarray]:
+    """返回稀疏词频向量 (下标, 次线性词频)"""
+    counts: Counter = Counter()
+    for term in _terms(title):
+        counts[_bucket(term)] += TITLE_WEIGHT
+    for term in _terms(full_description):
+        counts[_bucket(term)] += 1
+    for tag in tags or []:
+        counts[_bucket(f"t:{str(tag).strip().lower()}")] += TAG_WEIGHT
+        for term in _terms(str(tag)):
+            counts[_bucket(term)] += 1
+
+    indices = np.fromiter(counts.keys(), dtype=np.uint32, count=len(counts))
+    values = np.fromiter((1 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+def encode_features(indices: np.ndarray, values: np.ndarray) -> bytes:
+    return indices.astype("<u4").tobytes() + values.astype("<f4").tobytes()
+
+
+def decode_features(blob: bytes) -> tuple[np.ndarray, np.ndarray]:
+    n = len(blob) // 8
+    return np.frombuffer(blob, dtype="<u4", count=n), np.frombuffer(blob, dtype="<f4", offset=n * 4, count=n)
+
+
+def _project_features(project) -> bytes:
+    return encode_features(*extract_features(project.title, project.full_description, project.tags))
+
+
+def _store_vector(db: Session, project_pk: int, features: bytes):
+    stmt = dialect_insert(ProjectVector).values(project_pk=project_pk, features=features)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ProjectVector.project_pk],
+        set_={"features": stmt.excluded.features, "updated_at": datetime.utcnow()}
+    ))
+
+
+class _Corpus:
+    """全部项目按加载时的 IDF 加权并 L2 归一化的稀疏向量，可逐行替换"""
+
+    def __init__(self, db: Session):
+        rows = db.execute(select(ProjectVector.project_pk, ProjectVector.features).order_by(ProjectVector.pk)).all()
+        self.ids = [project_pk for project_pk, _ in rows]
+        self.position = {project_pk: i for i, project_pk in enumerate(self.ids)}
+        vectors = [decode_features(features) for _, features in rows]
+        df = np.zeros(FEATURE_DIM, dtype=np.float32)
+        for indices, _ in vectors:
+            df[indices] += 1
+        self.idf = np.log((1 + len(self.ids)) / (1 + df)) + 1
+        self.vectors = [self._weigh(*vector) for vector in vectors]
+        self.loaded_size = len(self.ids)
+        self._flat: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def _weigh(self, indices: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        weights = values * self.idf[indices]
+        return indices, weights / max(float(np.linalg.norm(weights)), 1e-12)
+
+    def put(self, project_pk: int, features: bytes) -> int:
+        """替换或追加一个项目的向量，返回其行号"""
+        vector = self._weigh(*decode_features(features))
+        row = self.position.get(project_pk)
+        if row is None:
+            row = self.position[project_pk] = len(self.ids)
+            self.ids.append(project_pk)
+            self.vectors.append(vector)
+        else:
+            self.vectors[row] = vector
+        self._flat = None
+        return row
+
+    def _flattened(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """全部非零项拼接成 (所属行, 下标, 权重) 三个数组，语料变更后惰性重建"""
+        if self._flat is None:
+            lengths = [len(indices) for indices, _ in self.vectors]
+            self._flat = (
+                np.repeat(np.arange(len(self.vectors)), lengths),
+                np.concatenate([indices for indices, _ in self.vectors]) if self.vectors else np.zeros(0, np.uint32),
+                np.concatenate([weights for _, weights in self.vectors]) if self.vectors else np.zeros(0, np.float32),
+            )
+        return self._flat
+
+    def scores(self, row: int) -> np.ndarray:
+        """一个项目对全部项目的余弦相似度，即相似度矩阵中它所在的行与列"""
+        query = np.zeros(FEATURE_DIM, dtype=np.float32)
+        indices, weights = self.vectors[row]
+        query[indices] = weights
+        owners, all_indices, all_weights = self._flattened()
+        return np.bincount(owners, weights=query[all_indices] * all_weights, minlength=len(self.ids)).astype(np.float32)
+
+    def dense(self, rows: range) -> np.ndarray:
+        matrix = np.zeros((len(rows), FEATURE_DIM), dtype=np.float32)
+        for out, i in enumerate(rows):
+            indices, weights = self.vectors[i]
+            matrix[out, indices] = weights
+        return matrix
+
+    def similarities(self, rows: range) -> np.ndarray:
+        """rows 对全部项目的余弦相似度矩阵，逐块计算"""
+        left = self.dense(rows)
+        result = np.empty((len(rows), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), CHUNK_SIZE):
+            block = range(start, min(start + CHUNK_SIZE, len(self.ids)))
+            result[:, block.start:block.stop] = left @ self.dense(block).T
+        return result
+
+    def top_k(self, row: int, scores: np.ndarray, k: int) -> list[tuple[int, float]]:
+        """取相似度最高的 k 个项目（排除自身与零相似度）"""
+        scores = scores.copy()
+        scores[row] = 0
+        if len(scores) > k:
+            candidates = np.argpartition(-scores, k)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        ranked = sorted(candidates, key=lambda i: -scores[i])
+        return [(self.ids[i], float(scores[i])) for i in ranked if scores[i] > 0]
+
+
+def _write_neighbors(db: Session, project_pk: int, neighbors: list[tuple[int, float]]):
+    db.execute(delete(ProjectNeighbor).where(ProjectNeighbor.project_pk == project_pk))
+    if neighbors:
+        db.execute(insert(ProjectNeighbor), [
+            {"project_pk": project_pk, "neighbor_pk": neighbor_pk, "score": score, "rank": rank}
+            for rank, (neighbor_pk, score) in enumerate(neighbors)
+        ])
+
+
+# 进程内缓存的语料及其对应的 related 版本，只在 _lock 内读写
+_corpus: Optional[_Corpus] = None
+_corpus_version: Optional[int] = None
+
+
+def _related_version(db: Session) -> int:
+    return db.execute(
+        select(CacheVersion.version).where(CacheVersion.entity_type == RELATED_VERSION)
+    ).scalar() or 0
+
+
+def _cached_corpus(db: Session, version: int) -> _Corpus:
+    """
+    取进程内缓存的语料，调用方已在本事务中递增 related 版本（同时取得写锁）
+    版本恰好比缓存多 1 说明期间没有其他进程改过向量，可直接沿用；否则在本事务中重新加载
+    """
+    global _corpus
+    if (
+        _corpus is None
+        or _corpus_version != version - 1
+        or len(_corpus.ids) > _corpus.loaded_size * (1 + IDF_REFRESH_GROWTH)
+    ):
+        _corpus = _Corpus(db)
+    return _corpus
+
+
+def update_related(db: Session, project_id: str) -> Optional[int]:
+    """
+    项目新建或内容修改后增量更新相关项目，调用方负责提交事务，提交后以返回的版本调用 _remember_corpus
+    1. 重算该项目的向量与其 top-k 列表
+    2. 原本把它列为相关项目的列表重新计算（它的内容已变）
+    3. 其余项目若与它的相似度超过自身列表的末位，则把它插入列表
+    """
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        return None
+    k = settings.related_top_k
+    project_pk = project.pk
+    bump_versions(db, RELATED_VERSION)
+    version = _related_version(db)
+    features = _project_features(project)
+    _store_vector(db, project_pk, features)
+    corpus = _cached_corpus(db, version)
+    row = corpus.put(project_pk, features)
+    scores = corpus.scores(row)
+    _write_neighbors(db, project_pk, corpus.top_k(row, scores, k))
+
+    stale = set(db.execute(
+        select(ProjectNeighbor.project_pk)
+        .where(ProjectNeighbor.neighbor_pk == project_pk, ProjectNeighbor.project_pk != project_pk)
+    ).scalars())
+    for other_pk in stale:
+        other = corpus.position.get(other_pk)
+        if other is not None:
+            _write_neighbors(db, other_pk, corpus.top_k(other, corpus.scores(other), k))
+
+    lists = {
+        pk: (count, lowest) for pk, count, lowest in db.execute(
+            select(ProjectNeighbor.project_pk, func.count(), func.min(ProjectNeighbor.score))
+            .group_by(ProjectNeighbor.project_pk)
+        )
+    }
+    candidates = {}
+    for other in np.flatnonzero(scores > 0):
+        other_pk, score = corpus.ids[other], float(scores[other])
+        if other_pk == project_pk or other_pk in stale:
+            continue
+        count, lowest = lists.get(other_pk, (0, 0.0))
+        if count < k or score > lowest:
+            candidates[other_pk] = score
+
+    candidate_pks = list(candidates)
+    for start in range(0, len(candidate_pks), CHUNK_SIZE):
+        chunk = candidate_pks[start:start + CHUNK_SIZE]
+        current = {other_pk: [] for other_pk in chunk}
+        for other_pk, neighbor_pk, score in db.execute(
+            select(ProjectNeighbor.project_pk, ProjectNeighbor.neighbor_pk, ProjectNeighbor.score)
+            .where(ProjectNeighbor.project_pk.in_(chunk), ProjectNeighbor.neighbor_pk != project_pk)
+        ):
+            current[other_pk].append((neighbor_pk, score))
+        for other_pk, neighbors in current.items():
+            merged = sorted([*neighbors, (project_pk, candidates[other_pk])], key=lambda pair: -pair[1])[:k]
+            _write_neighbors(db, other_pk, merged)
+    return version
+
+
+def _remember_corpus(version: Optional[int]):
+    """事务提交后记录缓存语料对应的版本；回滚时传 None 丢弃缓存（其中已含未提交的向量）"""
+    global _corpus, _corpus_version
+    if version is None:
+        _corpus = None
+    _corpus_version = version
+
+
+def refresh_project_related(project_id: str):
+    """作为后台任务在项目新建、修改后执行"""
+    with _lock:
+        db = SessionLocal()
+        version = None
+        try:
+            version = update_related(db, project_id)
+            db.commit()
+        except Exception:
+            version = None
+            raise
+        finally:
+            db.close()
+            _remember_corpus(version)
+
+
+def rebuild_related(db: Session) -> int:
+    """全量重算所有项目的向量与相关项目列表，返回项目数"""
+    k = settings.related_top_k
+    projects = db.execute(select(Project.pk, Project.title, Project.full_description, Project.tags)).all()
+    for project in projects:
+        _store_vector(db, project.pk, _project_features(project))
+    db.execute(delete(ProjectVector).where(ProjectVector.project_pk.not_in(select(Project.pk))))
+    bump_versions(db, RELATED_VERSION)
+    db.flush()
+
+    corpus = _Corpus(db)
+    db.execute(delete(ProjectNeighbor))
+    for start in range(0, len(corpus.ids), CHUNK_SIZE):
+        rows = range(start, min(start + CHUNK_SIZE, len(corpus.ids)))
+        for row, scores in zip(rows, corpus.similarities(rows)):
+            _write_neighbors(db, corpus.ids[row], corpus.top_k(row, scores, k))
+    db.commit()
+    return len(corpus.ids)
+
+
+def ensure_related(db: Session):
+    """存在尚未计算向量的项目（历史数据、种子或导入数据）时全量重建"""
+    missing = db.execute(
+        select(func.count()).select_from(Project)
+        .where(Project.pk.not_in(select(ProjectVector.project_pk)))
+    ).scalar()
+    if missing:
+        rebuild_related(db)
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        count = rebuild_related(session)
+    finally:
+        session.close()
+    print(f"✅ 已重建 {count} 个项目的相关项目")
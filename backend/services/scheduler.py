@@ -0,0 +1,398 @@
+"""
+进程内定时任务调度
+由应用生命周期启动和停止，每个任务一个协程：按计划（固定间隔或 cron 表达式，UTC）加随机抖动等待到期，
+再通过 scheduler_leases 表中的租约行竞争执行权。租约以上次开始时间做比较并交换，
+多个 worker 进程同时到期时只有一个执行，且同一周期不会重复执行；执行期间定期续约。
+同步任务在线程中执行，不阻塞事件循环；关闭时等待执行中的任务结束（最多 SCHEDULER_DRAIN_SECONDS）。
+"""
+
+import asyncio
+import inspect
+import os
+import random
+import re
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import or_, select, update
+
+from config import get_settings
+from database import SessionLocal, dialect_insert
+from models import SchedulerLease
+
+settings = get_settings()
+
+# 单次等待的上限：到期前定期醒来，读取其他进程的执行记录并重新计算下次执行时间
+MAX_SLEEP_SECONDS = 60.0
+
+_INTERVAL = re.compile(r"^@every\s+(\d+)\s*([smhd])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class Interval:
+    """固定间隔：上次开始后 seconds 秒再次执行"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def next_after(self, last: datetime) -> datetime:
+        return last + timedelta(seconds=self.seconds)
+
+    def first(self, now: datetime) -> datetime:
+        return now
+
+    def __repr__(self):
+        return f"@every {self.seconds:g}s"
+
+
+class Cron:
+    """5 段 cron 表达式：分 时 日 月 周，支持 *、*/n、a-b、a-b/n 与逗号列表；周日为 0"""
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expr: str):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 表达式需要 5 段: {expr}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.RANGES)
+        )
+        # 日与周同时指定时满足其一即可（与 cron 一致）
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(part: str, low: int, high: int) -> set[int]:
+        values = set()
+        for item in part.split(","):
+            base, _, step = item.partition("/")
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (int(v) for v in base.split("-", 1))
+            else:
+                start = end = int(base)
+            if start < low or end > high or start > end:
+                raise ValueError(f"cron 字段超出范围: {item}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, t: datetime) -> bool:
+        day = t.day in self.days
+        weekday = (t.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, last: datetime) -> datetime:
+        """last 之后最近的一个整分钟触发时刻"""
+        t = last.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"cron 表达式没有可触发的时刻: {self.expr}")
+
+    def first(self, now: datetime) -> datetime:
+        return self.next_after(now)
+
+    def __repr__(self):
+        return self.expr
+
+
+def parse_schedule(spec: str):
+    """解析计划：'@every 10m' 形式的间隔，或 5 段 cron 表达式"""
+    spec = spec.strip()
+    match = _INTERVAL.match(spec)
+    if match:
+        return Interval(int(match.group(1)) * _UNITS[match.group(2)])
+    return Cron(spec)
+
+
+@dataclass
+class TaskStats:
+    """单个任务在本进程内的运行指标"""
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0  # 到期时租约被其他进程取得
+    last_started_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    max_duration_ms: float = 0.0
+    total_duration_ms: float = 0.0
+    last_error: Optional[str] = None
+    next_run_at: Optional[datetime] = None
+
+
+@dataclass
+class ScheduledTask:
+    name: str
+    schedule: Any
+    fn: Callable[[], Any]
+    jitter: float
+    stats: TaskStats = field(default_factory=TaskStats)
+
+
+class Scheduler:
+    """定时任务调度器"""
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.tasks: dict[str, ScheduledTask] = {}
+        self._stopping: Optional[asyncio.Event] = None
+        self._loops: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._loops)
+
+    def register(self, name: str, spec: str, fn: Callable[[], Any], jitter: Optional[float] = None):
+        """注册任务；spec 为空时不注册。fn 可以是同步函数（在线程中执行）或协程函数"""
+        if not spec:
+            return
+        self.tasks[name] = ScheduledTask(
+            name=name,
+            schedule=parse_schedule(spec),
+            fn=fn,
+            jitter=settings.scheduler_jitter_seconds if jitter is None else jitter
+        )
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = asyncio.Event()
+        self._loops = [
+            asyncio.create_task(self._loop(task), name=f"scheduler-{task.name}")
+            for task in self.tasks.values()
+        ]
+
+    async def stop(self):
+        """停止调度，等待执行中的任务结束；超时后放弃等待，租约到期后由其他进程接手"""
+        if not self.running:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._loops, timeout=settings.scheduler_drain_seconds)
+        for loop in pending:
+            loop.cancel()
+        self._loops = []
+
+    async def _sleep(self, seconds: float) -> bool:
+        """等待指定时间，期间收到停止信号时返回 True"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=max(seconds, 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _loop(self, task: ScheduledTask):
+        seen: Optional[datetime] = None
+        target: Optional[datetime] = None
+        while not self._stopping.is_set():
+            try:
+                last = _last_started(task.name)
+            except Exception as e:
+                print(f"定时任务 {task.name} 读取状态失败: {e}")
+                if await self._sleep(MAX_SLEEP_SECONDS):
+                    break
+                continue
+
+            # 上次开始时间变化（本进程或其他进程执行过）时重新计算下次执行时间与抖动
+            if target is None or last != seen:
+                seen = last
+                now = datetime.utcnow()
+                due = task.schedule.next_after(last) if last else task.schedule.first(now)
+                target = due + timedelta(seconds=random.uniform(0, task.jitter))
+                task.stats.next_run_at = target
+
+            wait = (target - datetime.utcnow()).total_seconds()
+            if wait > 0:
+                if await self._sleep(min(wait, MAX_SLEEP_SECONDS)):
+                    break
+                continue
+
+            if _acquire(task.name, self.owner, seen):
+                await self._run(task)
+            else:
+                task.stats.skipped += 1
+            target = None
+
+    async def _run(self, task: ScheduledTask):
+        stats = task.stats
+        stats.last_started_at = datetime.utcnow()
+        renew = asyncio.create_task(self._renew(task.name))
+        start = time.perf_counter()
+        error = None
+        try:
+            if inspect.iscoroutinefunction(task.fn):
+                await task.fn()
+            else:
+                await asyncio.to_thread(task.fn)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"定时任务 {task.name} 执行失败: {error}")
+        finally:
+            renew.cancel()
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        stats.runs += 1
+        if error is not None:
+            stats.failures += 1
+        stats.last_duration_ms = duration_ms
+        stats.max_duration_ms = max(stats.max_duration_ms, duration_ms)
+        stats.total_duration_ms += duration_ms
+        stats.last_error = error
+        _release(task.name, self.owner, duration_ms, error)
+
+    async def _renew(self, name: str):
+        """执行期间每隔三分之一租约时长续约一次"""
+        while True:
+            await asyncio.sleep(settings.scheduler_lease_seconds / 3)
+            await asyncio.to_thread(_extend, name, self.owner)
+
+    def metrics(self) -> dict[str, dict]:
+        """各任务的计划、本进程内的运行指标 (process) 与所有进程合计的执行记录 (shared)"""
+        db = SessionLocal()
+        try:
+            leases = {lease.name: lease for lease in db.query(SchedulerLease).all()}
+        finally:
+            db.close()
+
+        report = {}
+        for name, task in self.tasks.items():
+            lease = leases.get(name)
+            report[name] = {
+                "schedule": repr(task.schedule),
+                "process": dict(task.stats.__dict__),
+                "shared": {
+                    "runs": lease.runs,
+                    "failures": lease.failures,
+                    "owner": lease.owner,
+                    "lastStartedAt": lease.last_started_at,
+                    "lastFinishedAt": lease.last_finished_at,
+                    "lastDurationMs": lease.last_duration_ms,
+                    "lastError": lease.last_error,
+                } if lease else None,
+            }
+        return report
+
+
+def _last_started(name: str) -> Optional[datetime]:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(SchedulerLease.last_started_at).where(SchedulerLease.name == name)
+        ).scalar()
+    finally:
+        db.close()
+
+
+def _acquire(name: str, owner: str, seen: Optional[datetime]) -> bool:
+    """
+    竞争租约：租约空闲（或已过期）且上次开始时间仍是本进程读到的值时取得执行权，
+    其他进程已在本周期执行过时失败
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.execute(dialect_insert(SchedulerLease).values(name=name, runs=0, failures=0).on_conflict_do_nothing())
+        acquired = db.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.name == name,
+                or_(SchedulerLease.expires_at.is_(None), SchedulerLease.expires_at < now),
+                SchedulerLease.last_started_at.is_(None) if seen is None else SchedulerLease.last_started_at == seen
+            )
+            .values(
+                owner=owner,
+                expires_at=now + timedelta(seconds=settings.scheduler_lease_seconds),
+                last_started_at=now
+            )
+        ).rowcount == 1
+        db.commit()
+        return acquired
+    finally:
+        db.close()
+
+
+def _extend(name: str, owner: str):
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.owner == owner)
+            .values(expires_at=datetime.utcnow() + timedelta(seconds=settings.scheduler_lease_seconds))
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _release(name: str, owner: str, duration_ms: float, error: Optional[str]):
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.owner == owner)
+            .values(
+                owner=None,
+                expires_at=None,
+                last_finished_at=datetime.utcnow(),
+                last_duration_ms=duration_ms,
+                last_error=error,
+                runs=SchedulerLease.runs + 1,
+                failures=SchedulerLease.failures + int(error is not None)
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+scheduler = Scheduler()
+
+
+# ==================== 定时任务 ====================
+
+def _in_session(fn: Callable) -> Callable[[], None]:
+    """包装接收会话参数的维护函数：独立会话执行并提交"""
+    def run():
+        db = SessionLocal()
+        try:
+            fn(db)
+            db.commit()
+        finally:
+            db.close()
+    return run
+
+
+def register_default_tasks(target: Scheduler = scheduler):
+    """注册内置的维护任务，计划由 SCHEDULE_* 配置"""
+    from services.archive import archive_cold_discussions
+    from services.job_queue import prune_jobs
+    from services.purge import purge_deleted_discussions
+    from services.ranking import rescale_trending
+    from services.reconcile import run_reconcile
+
+    def rebuild_related(db):
+        # 相关项目依赖 NumPy，执行时才导入
+        from services.related import rebuild_related
+        rebuild_related(db)
+
+    target.register("rescale_trending", settings.schedule_rescale_trending, _in_session(rescale_trending))
+    target.register("purge_deleted_discussions", settings.schedule_purge_deleted, purge_deleted_discussions)
+    target.register("archive_cold_discussions", settings.schedule_archive, archive_cold_discussions)
+    target.register("rebuild_related", settings.schedule_rebuild_related, _in_session(rebuild_related))
+    target.register("prune_jobs", settings.schedule_prune_jobs, prune_jobs)
+    target.register("reconcile_counts", settings.schedule_reconcile_counts, run_reconcile)
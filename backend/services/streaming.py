@@ -0,0 +1,44 @@
+"""
+流式 JSON 数组响应
+列表接口默认先构造全部响应模型再一次性序列化，内存与首字节时间随结果行数线性增长。
+流式模式以 yield_per 分批从游标读取 ORM 对象，逐批序列化并写出数组片段，
+会话的标识映射只弱引用对象，写出后即可回收，每个请求同时只持有一批对象，峰值内存与结果行数无关。
+
+生成器在响应开始发送后才执行，此时请求的数据库会话可能已经关闭，因此使用独立会话；
+StreamingResponse 在线程池中迭代同步生成器，查询不阻塞事件循环。
+"""
+
+from typing import Callable, Iterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from database import SessionLocal
+
+# 每批从游标读取并序列化的行数
+STREAM_BATCH_SIZE = 500
+
+
+def iter_json_array(
+    stmt: Select,
+    serialize: Callable[[object], BaseModel],
+    batch_size: int = STREAM_BATCH_SIZE
+) -> Iterator[str]:
+    """按 stmt 的顺序逐批生成 JSON 数组片段，拼接后与非流式响应的内容相同"""
+    yield "["
+    db = SessionLocal()
+    try:
+        rows = db.execute(stmt.execution_options(yield_per=batch_size)).scalars()
+        first = True
+        for batch in rows.partitions():
+            chunk = ",".join(serialize(row).model_dump_json() for row in batch)
+            yield chunk if first else "," + chunk
+            first = False
+    finally:
+        db.close()
+    yield "]"
+
+
+def stream_json_array(stmt: Select, serialize: Callable[[object], BaseModel]) -> StreamingResponse:
+    return StreamingResponse(iter_json_array(stmt, serialize), media_type="application/json")
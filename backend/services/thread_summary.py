@@ -0,0 +1,158 @@
+"""
+讨论摘要服务
+摘要按回复的 (created_at, id) 顺序滚动更新：每次刷新只把上次的摘要与其后的新回复发给模型，
+token 消耗与新增内容成正比，与讨论总长度无关；读取摘要直接查表，不调用模型。
+每批回复按 AI_MAX_PROMPT_TOKENS 预算选取，提示词不会再被截去中间部分，游标推进到的回复都已完整发给模型。
+"""
+
+import asyncio
+import weakref
+from typing import Optional
+
+from sqlalchemy import and_, asc, or_
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from models import Discussion, Reply, ThreadSummary
+from services.deepseek_service import chat_completion
+from services.prompt_budget import compact, estimate_tokens, truncate_to_tokens
+from services.write_queue import run_write
+
+settings = get_settings()
+
+SYSTEM_PROMPT = "你是社区讨论的总结助手，擅长用简洁的中文概括讨论的主要观点、分歧与结论。"
+
+# 同一讨论的刷新在进程内串行执行，并发请求不会重复为同一批回复付费
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def summary_lock(discussion_id: str) -> asyncio.Lock:
+    lock = _locks.get(discussion_id)
+    if lock is None:
+        lock = _locks[discussion_id] = asyncio.Lock()
+    return lock
+
+
+def load_summary(db: Session, discussion_id: str) -> Optional[ThreadSummary]:
+    return (
+        db.query(ThreadSummary)
+        .join(Discussion, Discussion.pk == ThreadSummary.discussion_pk)
+        .filter(Discussion.id == discussion_id)
+        .populate_existing()
+        .first()
+    )
+
+
+def fetch_delta(db: Session, discussion: Discussion, summary: Optional[ThreadSummary]) -> list[Reply]:
+    """
+    读取摘要游标之后的新回复，条数、总字数与提示词 token 预算受配置限制
+    超出部分留待下次刷新，游标只推进到本批最后一条
+    """
+    query = db.query(Reply).filter(Reply.discussion_pk == discussion.pk)
+    if summary and summary.last_reply_id:
+        query = query.filter(or_(
+            Reply.created_at > summary.last_reply_at,
+            and_(Reply.created_at == summary.last_reply_at, Reply.id > summary.last_reply_id)
+        ))
+    replies = query.order_by(asc(Reply.created_at), asc(Reply.id)).limit(settings.summary_max_replies).all()
+
+    budget = settings.summary_max_delta_chars
+    tokens = _reply_budget(discussion, summary.summary if summary else "")
+    batch = []
+    for reply in replies:
+        size = min(len(reply.content), settings.summary_reply_chars)
+        # 每行另计 1 个 token 给换行与估算的取整误差
+        cost = estimate_tokens(_reply_line(reply)) + 1
+        if batch and (size > budget or cost > tokens):
+            break
+        batch.append(reply)
+        budget -= size
+        tokens -= cost
+    return batch
+
+
+def _reply_line(reply: Reply) -> str:
+    return f"{reply.author_name}: {compact(reply.content[:settings.summary_reply_chars])}"
+
+
+def _reply_budget(discussion: Discussion, previous: str) -> int:
+    """提示词中留给新增回复的 token 数：总预算减去系统提示、讨论主题、已有摘要与说明"""
+    return settings.ai_max_prompt_tokens - sum(
+        estimate_tokens(message["content"]) for message in _prompt(discussion, previous, [])
+    )
+
+
+def build_messages(discussion: Discussion, previous: str, replies: list[Reply]) -> list[dict]:
+    """
+    组装提示词：讨论主题 + 上次摘要 + 新增回复
+    fetch_delta 已按预算选取回复；只有单条回复就超出预算时截短这一条，该回复以截短后的内容计入摘要
+    """
+    lines = [_reply_line(reply) for reply in replies]
+    if len(lines) == 1:
+        lines[0] = truncate_to_tokens(lines[0], _reply_budget(discussion, previous) - 1)
+    return _prompt(discussion, previous, lines)
+
+
+def _prompt(discussion: Discussion, previous: str, lines: list[str]) -> list[dict]:
+    prompt = f"""讨论标题: {discussion.title}
+讨论内容: {discussion.content[:settings.summary_reply_chars]}
+
+已有摘要:
+{previous or "（暂无，这是第一批回复）"}
+
+新增回复:
+{chr(10).join(lines)}
+
+请结合已有摘要与新增回复，输出更新后的完整摘要，200字以内。"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def save_summary(
+    db: Session,
+    discussion_id: str,
+    previous: Optional[ThreadSummary],
+    text: str,
+    replies: list[Reply]
+) -> ThreadSummary:
+    """
+    写入新摘要并推进游标，调用方负责提交事务
+    摘要已被其他 worker 更新（游标已变）时保留对方的结果
+    """
+    current = load_summary(db, discussion_id)
+    expected = previous.last_reply_id if previous else None
+    if current and current.last_reply_id != expected:
+        return current
+
+    if not current:
+        discussion_pk = db.query(Discussion.pk).filter(Discussion.id == discussion_id).scalar()
+        current = ThreadSummary(discussion_pk=discussion_pk, replies_covered=0)
+        db.add(current)
+    last = replies[-1]
+    current.summary = text
+    current.last_reply_id = last.id
+    current.last_reply_at = last.created_at
+    current.replies_covered = (current.replies_covered or 0) + len(replies)
+    db.flush()
+    return current
+
+
+async def refresh_summary(db: Session, discussion: Discussion) -> Optional[ThreadSummary]:
+    """增量刷新讨论摘要并提交，没有新回复时直接返回已存摘要（可能为空），不调用模型"""
+    async with summary_lock(discussion.id):
+        previous = load_summary(db, discussion.id)
+        replies = fetch_delta(db, discussion, previous)
+        if not replies:
+            return previous
+
+        text = await chat_completion(
+            build_messages(discussion, previous.summary if previous else "", replies),
+            max_tokens=settings.summary_max_tokens,
+            temperature=0.3,
+            route="thread_summary"
+        )
+        return await run_write(
+            db, lambda session: save_summary(session, discussion.id, previous, text.strip(), replies)
+        )
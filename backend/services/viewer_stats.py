@@ -0,0 +1,111 @@
+"""
+独立访客统计
+每个项目 / 讨论保存一个 HyperLogLog 草图（BLOB 列），由 X-User-Identifier 累积，
+只有在草图寄存器发生变化时才写库，刷新页面等重复浏览不会产生写入
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Header, Request
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from services.hyperloglog import HyperLogLog
+
+settings = get_settings()
+
+# 草图被其他 worker 并发写入时的重试次数
+SKETCH_WRITE_ATTEMPTS = 5
+
+_UNREAD = object()
+
+
+def viewer_identity(
+    request: Request,
+    x_user_identifier: Optional[str] = Header(default=None, alias="X-User-Identifier")
+) -> str:
+    """访客标识依赖：优先使用 X-User-Identifier，缺失时退回客户端 IP"""
+    if x_user_identifier and x_user_identifier != "anonymous":
+        return x_user_identifier
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class ViewerSketches:
+    """
+    进程内草图缓存 (LRU)
+    缓存的是本 worker 最近一次与数据库合并后的草图；新访客使寄存器变化时，
+    读取库中最新草图、逐位取最大值合并后以读到的草图为条件写回 (compare-and-swap)，
+    期间被其他 worker 写入则重读、合并后重试，各 worker 的累积因此不会相互覆盖。
+    浏览记录在后台任务的线程池中执行，锁只保护缓存本身，不在持锁时访问数据库
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._cache: OrderedDict[tuple[str, str], HyperLogLog] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, model, entity_id: str) -> tuple[bool, Optional[bytes]]:
+        """返回 (对象是否存在, 库中的草图)"""
+        row = db.execute(select(model.viewers_sketch).where(model.id == entity_id)).first()
+        return row is not None, row[0] if row else None
+
+    def _forget(self, key: tuple[str, str]):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def _remember(self, key: tuple[str, str], sketch: HyperLogLog):
+        with self._lock:
+            self._cache[key] = sketch
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def record(self, db: Session, model, entity_id: str, viewer: str):
+        """记录一次浏览，调用方负责提交事务"""
+        key = (model.__tablename__, entity_id)
+        with self._lock:
+            cached = self._cache.get(key)
+            # 在副本上累积，其他线程读到的缓存始终是已写入数据库的状态
+            sketch = HyperLogLog(cached.to_bytes()) if cached is not None else None
+
+        stored = _UNREAD
+        if sketch is None:
+            exists, stored = self._load(db, model, entity_id)
+            if not exists:
+                return
+            sketch = HyperLogLog(stored)
+        if not sketch.add(viewer):
+            self._remember(key, sketch)
+            return
+
+        for _ in range(SKETCH_WRITE_ATTEMPTS):
+            if stored is _UNREAD:
+                exists, stored = self._load(db, model, entity_id)
+                if not exists:
+                    return
+            if stored is not None:
+                sketch.merge(HyperLogLog(stored))
+            unchanged = model.viewers_sketch.is_(None) if stored is None else model.viewers_sketch == stored
+            result = db.execute(
+                update(model)
+                .where(model.id == entity_id, unchanged)
+                .values(
+                    viewers_sketch=sketch.to_bytes(),
+                    unique_viewers=sketch.estimate(),
+                    updated_at=model.updated_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                self._remember(key, sketch)
+                return
+            stored = _UNREAD
+        # 重试用尽时放弃本次写入，只影响一个访客的计入；未写入的草图不能留在缓存中，
+        # 否则之后落在相同寄存器的访客会被判定为无变化而不再写入，下次记录时从库中重读
+        self._forget(key)
+
+
+viewer_sketches = ViewerSketches(settings.viewer_sketch_cache_size)
@@ -0,0 +1,154 @@
+"""
+单写者组提交 (group commit) 队列
+写接口把变更封装成函数提交到队列，由唯一的写线程在一个很短的时间窗口内收集多条变更，
+合并到同一个事务中提交，一次 fsync 服务多个请求，SQLite 上不再出现多个写者争抢锁。
+每条变更运行在独立的 SAVEPOINT 中，单条失败（如 404）只回滚它自己。
+"""
+
+import asyncio
+from typing import Any, Callable, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from config import get_settings
+
+settings = get_settings()
+
+WriteFn = Callable[[Session], Any]
+
+
+def _create_writer_engine():
+    """
+    写线程专用引擎
+    pysqlite 默认的隐式事务与 SAVEPOINT 不兼容，这里按 SQLAlchemy 文档的做法
+    关闭驱动的事务管理并显式发出 BEGIN；只影响写线程，不改变普通请求会话的行为
+    """
+    is_sqlite = "sqlite" in settings.database_url
+    writer_engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        pool_size=1,
+        max_overflow=0
+    )
+    if is_sqlite:
+        @event.listens_for(writer_engine, "connect")
+        def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(writer_engine, "begin")
+        def _emit_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return writer_engine
+
+
+class WriteQueue:
+    """组提交写队列"""
+
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._engine = None
+        self._session_factory: Optional[sessionmaker] = None
+        self.batches = 0
+        self.writes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._engine = _create_writer_engine()
+        self._session_factory = sessionmaker(bind=self._engine, autoflush=False, expire_on_commit=False)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="write-queue")
+
+    async def stop(self):
+        """停止接收新写入，提交完队列中已有的变更后退出"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._engine.dispose()
+
+    async def submit(self, fn: WriteFn) -> Any:
+        """提交一条变更并等待其所在批次提交，返回 fn 的返回值或抛出 fn 的异常"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((fn, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            outcomes = await asyncio.to_thread(self._commit_batch, [fn for fn, _ in batch])
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit_batch(self, fns: list[WriteFn]) -> list[tuple[bool, Any]]:
+        """在写线程中执行一批变更，整批一次提交"""
+        outcomes: list[tuple[bool, Any]] = []
+        db = self._session_factory()
+        try:
+            for fn in fns:
+                savepoint = db.begin_nested()
+                try:
+                    result = fn(db)
+                    savepoint.commit()
+                    outcomes.append((True, result))
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((False, e))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            outcomes = [(False, e)] * len(fns)
+        finally:
+            db.close()
+        self.batches += 1
+        self.writes += len(fns)
+        return outcomes
+
+
+write_queue = WriteQueue(settings.write_queue_window_ms, settings.write_queue_max_batch)
+
+
+async def run_write(db: Session, fn: WriteFn) -> Any:
+    """
+    执行一条写操作
+    启用写队列时交给写线程组提交；否则在当前请求的会话中执行并立即提交
+    fn 内不应调用 commit / rollback，失败时直接抛出异常
+    """
+    if settings.write_queue_enabled and write_queue.running:
+        return await write_queue.submit(fn)
+    result = fn(db)
+    db.commit()
+    return result
@@ -153,9 +153,12 @@ export const DiscussionAPI = {
   },
 
   /** 点赞讨论 */
-  async likeDiscussion(id: string): Promise<{ likesCount: number }> {
+  async likeDiscussion(id: string): Promise<{ likesCount: number; isLiked: boolean }> {
     const response = await fetch(`${API_BASE_URL}/discussions/${id}/like`, {
       method: 'POST',
+      headers: {
+        'X-User-Identifier': getUserIdentifier(),
+      },
     });
 
     if (!response.ok) {
@@ -198,9 +201,12 @@ export const DiscussionAPI = {
   },
 
   /** 点赞回复 */
-  async likeReply(discussionId: string, replyId: string): Promise<{ likesCount: number }> {
+  async likeReply(discussionId: string, replyId: string): Promise<{ likesCount: number; isLiked: boolean }> {
     const response = await fetch(`${API_BASE_URL}/discussions/${discussionId}/replies/${replyId}/like`, {
       method: 'POST',
+      headers: {
+        'X-User-Identifier': getUserIdentifier(),
+      },
     });
 
     if (!response.ok) {